@@ -0,0 +1,98 @@
+"""Per-passenger visit aggregates.
+
+``passengers.visit_count``, ``total_stay_seconds``, ``first_visit_at`` and
+``last_visit_at`` are kept current by check-in (``record_visit``) and exit
+(``record_stay``), so the loyalty report and the passenger detail read one row
+per passenger instead of grouping ``lounge_entries``.
+
+The updates are SQL expressions (``visit_count = visit_count + 1``) rather than
+values computed in Python, so concurrent check-ins for the same passenger
+cannot lose an increment. Rows written behind the ORM's back (bulk seeding,
+imports, databases created before these columns) are recomputed with
+``rebuild_passenger_aggregates``.
+"""
+from sqlalchemy import bindparam, case, literal, or_, select, update
+
+from backend.database import db_session
+from backend.models import LoungeEntry, Passenger
+
+DEFAULT_CHUNK_SIZE = 10000
+
+
+def stay_seconds(entry_time, exit_time):
+    return int((exit_time - entry_time).total_seconds())
+
+
+def record_visit(passenger, entry_time):
+    """Count a new entry of ``passenger`` (in the current session, not flushed)."""
+    if passenger.id is None:
+        # Not inserted yet: plain values
+        passenger.visit_count = 1
+        passenger.total_stay_seconds = 0
+        passenger.first_visit_at = entry_time
+        passenger.last_visit_at = entry_time
+        return
+    passenger.visit_count = Passenger.visit_count + 1
+    entry_time = literal(entry_time, Passenger.first_visit_at.type) # Bound as a UTCDateTime, not a plain datetime
+    passenger.first_visit_at = case(
+        (or_(Passenger.first_visit_at.is_(None), Passenger.first_visit_at > entry_time), entry_time),
+        else_=Passenger.first_visit_at
+    )
+    passenger.last_visit_at = case(
+        (or_(Passenger.last_visit_at.is_(None), Passenger.last_visit_at < entry_time), entry_time),
+        else_=Passenger.last_visit_at
+    )
+
+
+def record_stay(passenger_id, seconds):
+    """Add a completed stay of ``seconds`` to the passenger's total (one UPDATE, not committed)."""
+    db_session.execute(
+        update(Passenger)
+        .where(Passenger.id == passenger_id)
+        .values(total_stay_seconds=Passenger.total_stay_seconds + seconds)
+    )
+
+
+def rebuild_passenger_aggregates(connection, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Recompute every passenger's aggregates from lounge_entries; returns passengers updated.
+
+    Streams the entries once and writes the results with executemany in chunks.
+    """
+    totals = {}
+    entries = connection.execution_options(stream_results=True).execute(
+        select(LoungeEntry.passenger_id, LoungeEntry.entry_time, LoungeEntry.stay_seconds))
+    for passenger_id, entry_time, seconds in entries:
+        aggregate = totals.get(passenger_id)
+        if aggregate is None:
+            aggregate = totals[passenger_id] = {
+                'passenger_id': passenger_id, 'visit_count': 0, 'total_stay_seconds': 0,
+                'first_visit_at': entry_time, 'last_visit_at': entry_time,
+            }
+        aggregate['visit_count'] += 1
+        if seconds is not None:
+            aggregate['total_stay_seconds'] += seconds
+        if entry_time < aggregate['first_visit_at']:
+            aggregate['first_visit_at'] = entry_time
+        if entry_time > aggregate['last_visit_at']:
+            aggregate['last_visit_at'] = entry_time
+    return write_passenger_aggregates(connection, totals.values(), chunk_size)
+
+
+def write_passenger_aggregates(connection, aggregates, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Replace every passenger's aggregates with ``aggregates`` (dicts keyed like the columns, plus
+    ``passenger_id``); passengers not in it are reset to no visits. Returns passengers updated."""
+    with connection.begin():
+        connection.execute(update(Passenger).values(
+            visit_count=0, total_stay_seconds=0, first_visit_at=None, last_visit_at=None))
+
+    statement = update(Passenger).where(Passenger.id == bindparam('passenger_id')).values(
+        visit_count=bindparam('visit_count'),
+        total_stay_seconds=bindparam('total_stay_seconds'),
+        first_visit_at=bindparam('first_visit_at'),
+        last_visit_at=bindparam('last_visit_at'),
+    )
+    rows = list(aggregates)
+    for start in range(0, len(rows), chunk_size):
+        with connection.begin():
+            connection.execute(statement, rows[start:start + chunk_size])
+    return len(rows)
@@ -0,0 +1,102 @@
+"""Dwell-time distributions per flight.
+
+The flight report fetches (flight, dwell minutes) for every completed stay in
+the range, sorted by flight, and reduces them here to per-flight statistics
+and histograms. With NumPy installed the whole range is handled as arrays:
+bucket indexes with ``searchsorted``,
+every flight's histogram in a single ``bincount`` and percentiles from one
+``lexsort``. That keeps ranges of hundreds of thousands of entries in the tens
+of milliseconds. Without NumPy the same numbers are computed in plain Python.
+"""
+import bisect
+import math
+
+try:
+    import numpy as np
+except ImportError: # Optional dependency, see requirements.txt
+    np = None
+
+# Upper bounds (minutes) of the dwell histogram buckets; the last bucket is open-ended
+DWELL_BUCKET_MINUTES = (15, 30, 45, 60, 90, 120, 180, 240)
+
+
+def bucket_labels(edges):
+    bounds = (0,) + tuple(edges)
+    labels = [f'{low}-{high}' for low, high in zip(bounds, bounds[1:])]
+    return labels + [f'{bounds[-1]}+']
+
+
+def _rank(fraction, count):
+    # Nearest-rank percentile: index into the sorted values of one flight
+    return max(0, math.ceil(fraction * count) - 1)
+
+
+def _flight_stats(count, total_minutes, median, p90, histogram):
+    # Plain Python numbers: NumPy scalars (np.float64 from np.int64 arithmetic) are not
+    # serializable by every JSON provider, orjson included
+    count = int(count)
+    return {
+        'completed_entries': count,
+        'average_dwell_minutes': round(float(total_minutes) / count, 1),
+        'median_dwell_minutes': round(float(median), 1),
+        'p90_dwell_minutes': round(float(p90), 1),
+        'histogram': [int(n) for n in histogram],
+    }
+
+
+def dwell_distributions(flights, minutes, edges=DWELL_BUCKET_MINUTES):
+    """Per-flight dwell statistics for stays (in minutes) sorted (grouped) by flight.
+
+    Returns ``{flight: stats}``; a stay in histogram bucket ``i`` lasted at
+    least ``edges[i - 1]`` and less than ``edges[i]`` minutes.
+    """
+    if not flights:
+        return {}
+    if np is not None:
+        return _numpy_distributions(flights, minutes, edges)
+    return _python_distributions(flights, minutes, edges)
+
+
+def _numpy_distributions(flights, minutes, edges):
+    count = len(flights)
+    minutes = np.asarray(minutes, dtype=float)
+
+    # Rows are grouped by flight: a group starts wherever the flight changes
+    flight_array = np.array(flights, dtype=object)
+    starts = np.flatnonzero(np.r_[True, flight_array[1:] != flight_array[:-1]])
+    counts = np.diff(np.r_[starts, count])
+    flight_index = np.repeat(np.arange(len(starts)), counts)
+
+    totals = np.add.reduceat(minutes, starts)
+    sorted_minutes = minutes[np.lexsort((minutes, flight_index))] # By flight, then duration
+    medians = sorted_minutes[starts + np.maximum(np.ceil(0.5 * counts).astype(int) - 1, 0)]
+    p90s = sorted_minutes[starts + np.maximum(np.ceil(0.9 * counts).astype(int) - 1, 0)]
+
+    bucket_count = len(edges) + 1
+    buckets = np.searchsorted(np.asarray(edges, dtype=float), minutes, side='right')
+    histograms = np.bincount(flight_index * bucket_count + buckets, minlength=len(starts) * bucket_count)\
+        .reshape(len(starts), bucket_count)
+
+    return {
+        flights[start]: _flight_stats(counts[i], totals[i], medians[i], p90s[i], histograms[i])
+        for i, start in enumerate(starts)
+    }
+
+
+def _python_distributions(flights, minutes, edges):
+    minutes_by_flight = {}
+    for flight, value in zip(flights, minutes):
+        minutes_by_flight.setdefault(flight, []).append(value)
+
+    result = {}
+    for flight, minutes in minutes_by_flight.items():
+        minutes.sort()
+        histogram = [0] * (len(edges) + 1)
+        for value in minutes:
+            histogram[bisect.bisect_right(edges, value)] += 1
+        result[flight] = _flight_stats(
+            len(minutes), sum(minutes),
+            minutes[_rank(0.5, len(minutes))], minutes[_rank(0.9, len(minutes))],
+            histogram
+        )
+    return result
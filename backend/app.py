@@ -1,57 +1,398 @@
-from flask import Flask
+from flask import Flask, current_app, g, request, has_request_context
+import time
+import threading
 import click
 from flask.cli import with_appcontext
-from flask_login import LoginManager
-from backend.database import init_db, db_session
-from backend import models # Import models to ensure they are registered
-from backend.models import User # Ensure User is imported for the user_loader
+from flask_login import LoginManager, current_user
+from sqlalchemy import event, inspect
+from werkzeug.utils import import_string
+from backend.database import init_db, db_session, get_engine, make_engine, DATABASE_URL
+from backend.metrics import MetricsRegistry
+from backend.serialization import make_provider
+from backend.compression import compress_response, DEFAULT_MIMETYPES
+from backend.polling import make_rate_limiter, make_single_flight
+from backend.cache import LRUCache, make_cache
+from backend.report_cache import make_report_cache
+from backend.migrations import DEFAULT_BATCH_SIZE, DEFAULT_PAUSE
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your_secret_key'  # Change this in production!
+# Blueprints are imported by create_app rather than at module import time, so
+# importing this module stays cheap and an app can be built with only the
+# blueprints it serves (set BLUEPRINTS in the config passed to create_app).
+BLUEPRINTS = [
+    'backend.routes.auth:auth_bp',
+    'backend.routes.checkin:checkin_bp',
+    'backend.routes.dashboard:dashboard_bp',
+    'backend.routes.passengers:passengers_bp',
+    'backend.routes.reports:reports_bp',
+    'backend.routes.reservations:reservations_bp',
+    'backend.routes.settings:settings_bp',
+    'backend.routes.profiling:profiling_bp',
+    'backend.routes.events:events_bp',
+]
+
+DEFAULT_CONFIG = {
+    'SECRET_KEY': 'your_secret_key',  # Change this in production!
+    'SQLALCHEMY_DATABASE_URI': DATABASE_URL,
+    # Log statements slower than this many milliseconds (None disables the slow query log)
+    'SLOW_QUERY_MS': None,
+    'BLUEPRINTS': BLUEPRINTS,
+    # Group commit for POST /checkin (see backend/commit_queue.py): check-ins arriving
+    # within the window share one transaction; each is acknowledged after its COMMIT
+    'CHECKIN_GROUP_COMMIT': False,
+    'CHECKIN_GROUP_COMMIT_WINDOW_MS': 5,
+    'CHECKIN_GROUP_COMMIT_MAX_BATCH': 100,
+    'CHECKIN_GROUP_COMMIT_TIMEOUT': 10, # Seconds a request waits for its batch
+    # Encoder for the list endpoints (see backend/serialization.py): 'auto', 'orjson' or 'stdlib'
+    'JSON_PROVIDER': 'auto',
+    # Response compression (see backend/compression.py); opt a view out with @no_compression
+    'COMPRESS_ENABLED': True,
+    'COMPRESS_MIN_SIZE': 1024, # Bytes; smaller bodies are sent as is
+    'COMPRESS_MIMETYPES': DEFAULT_MIMETYPES,
+    'COMPRESS_GZIP_LEVEL': 6,
+    'COMPRESS_BROTLI_QUALITY': 5,
+    # Stays longer than this many minutes are listed by GET /dashboard/overstays (see backend/overstays.py)
+    'OVERSTAY_MINUTES': 180,
+    # Without a shared cache backend, rebuild a lounge's overstay heap this often to pick
+    # up other workers' check-ins and exits (see backend/overstays.py)
+    'OVERSTAYS_RELOAD_SECONDS': 5,
+    # Dashboard polling (see backend/polling.py): identical requests of a lounge share one
+    # result for this long, and each user may poll each endpoint this often (None: no limit)
+    'POLL_COALESCE_WINDOW_MS': 250,
+    'POLL_RATE_PER_MINUTE': 120,
+    'POLL_RATE_BURST': 20,
+    # Cache used by the blueprints (see backend/cache.py): 'lru' (per worker), 'sqlite'
+    # (a file shared by the workers of a host, CACHE_URL is its path) or 'redis' (CACHE_URL)
+    'CACHE_BACKEND': 'lru',
+    'CACHE_URL': None,
+    'CACHE_LRU_SIZE': 10000,
+    'CACHE_DEFAULT_TTL': 300, # Seconds; writes invalidate sooner through table versions
+    'CACHE_LRU_TTL': 2, # Seconds at most with 'lru': other workers' writes don't reach its versions
+    # Per-day lounge usage counts (see backend/report_cache.py): days held in each worker's
+    # LRU (in front of the shared backend, if any) and how long today's count is reused
+    'REPORT_CACHE_SIZE': 10000,
+    'REPORT_CACHE_OPEN_DAY_TTL': 5,
+    'REPORT_CACHE_CLOSED_DAY_TTL': 60, # Past days in a worker's LRU, without a shared backend only
+    # Event log readers (GET /events, flask events export, see backend/events.py) do not see
+    # events recorded in the last this many seconds, so a transaction still committing an
+    # earlier id is not skipped
+    'EVENTS_SETTLE_SECONDS': 2,
+    # Valid manifest rows committed per transaction by POST /reservations/import
+    # and flask import-reservations (see backend/reservation_import.py)
+    'RESERVATION_IMPORT_CHUNK_SIZE': 5000,
+}
 
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'auth.login' # Assuming 'auth' is the name of the auth Blueprint and 'login' is the login route
 
 @login_manager.user_loader
 def load_user(user_id):
+    from backend.models import User
     return User.query.get(int(user_id))
 
 # Ensure the database session is closed after each request or context
-@app.teardown_appcontext
 def shutdown_session(exception=None):
     db_session.remove()
 
+# Per-request instrumentation: query count, DB time and total time.
+# Engine events time every statement; the request hooks aggregate them per request.
+def instrument_engine(app, engine):
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+        if has_request_context() and 'query_count' in g:
+            g.query_count += 1
+            g.db_time += elapsed
+        slow_query_ms = app.config.get('SLOW_QUERY_MS')
+        if slow_query_ms is not None and elapsed * 1000 >= slow_query_ms:
+            app.logger.warning('Slow query (%.1f ms): %s %r', elapsed * 1000, statement, parameters)
+
+def start_request_timer():
+    g.request_start_time = time.perf_counter()
+    g.query_count = 0
+    g.db_time = 0.0
+
+def record_request_timing(response):
+    if 'request_start_time' not in g:
+        return response
+    total_time = time.perf_counter() - g.request_start_time
+    response.headers.add('Server-Timing', f'db;dur={g.db_time * 1000:.2f};desc="{g.query_count} queries"')
+    response.headers.add('Server-Timing', f'total;dur={total_time * 1000:.2f}')
+    current_app.extensions['metrics'].observe_request(
+        request.endpoint or 'unmatched', request.method, response.status_code,
+        total_time, g.query_count, g.db_time
+    )
+    return response
+
+# Profile a single request: an admin sends `X-Profile: 1` and gets the request's
+# collapsed stacks back instead of the normal body (the view's status is kept
+# in X-Profile-Status). Sampled every millisecond since requests are short.
+def start_request_profile():
+    if not request.headers.get('X-Profile'):
+        return
+    if not (current_user.is_authenticated and current_user.role == 'admin'):
+        return
+    from backend.profiling import SamplingProfiler, ProfilerBusy
+    try:
+        g.request_profiler = SamplingProfiler(interval=0.001, thread_ids={threading.get_ident()}).start()
+    except ProfilerBusy:
+        pass # A sampling session is already running; serve the request normally
+
+def finish_request_profile(response):
+    profiler = g.pop('request_profiler', None)
+    if profiler is None:
+        return response
+    profiler.stop()
+    profiled = current_app.response_class(profiler.collapsed(), mimetype='text/plain')
+    profiled.headers['X-Profile-Status'] = str(response.status_code)
+    profiled.headers['X-Profile-Samples'] = str(profiler.samples)
+    return profiled
+
+def stop_request_profile(exception=None):
+    # The view raised, so after_request never ran; don't leave the sampler running
+    profiler = g.pop('request_profiler', None)
+    if profiler is not None:
+        profiler.stop()
+
+def metrics():
+    # Prometheus text exposition format
+    return current_app.extensions['metrics'].render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+def home():
+    return "Hello, World!" # This could later serve the main frontend app
+
 # Define a CLI command to initialize the database
 @click.command('init-db')
 @with_appcontext
 def init_db_command():
-    """Clear existing data and create new tables."""
-    init_db()
+    """Create the tables of a new database, or upgrade an existing one."""
+    init_db(log=click.echo)
     click.echo('Initialized the database.')
 
-app.cli.add_command(init_db_command)
-
-# Import and register blueprints
-from backend.routes.auth import auth_bp
-from backend.routes.checkin import checkin_bp
-from backend.routes.dashboard import dashboard_bp
-from backend.routes.passengers import passengers_bp
-from backend.routes.reports import reports_bp
-from backend.routes.reservations import reservations_bp
-from backend.routes.settings import settings_bp
-
-app.register_blueprint(auth_bp)
-app.register_blueprint(checkin_bp)
-app.register_blueprint(dashboard_bp)
-app.register_blueprint(passengers_bp)
-app.register_blueprint(reports_bp)
-app.register_blueprint(reservations_bp)
-app.register_blueprint(settings_bp)
-
-@app.route('/')
-def home():
-    return "Hello, World!" # This could later serve the main frontend app
+# Define a CLI command to bulk-load synthetic data (staging / performance work)
+@click.command('seed')
+@click.option('--entries', default=0, show_default=True, help='Number of lounge entries to generate.')
+@click.option('--passengers', default=0, show_default=True, help='Number of passengers to generate.')
+@click.option('--reservations', default=0, show_default=True, help='Number of reservations to generate.')
+@click.option('--lounges', default=1, show_default=True, help='Spread new passengers and reservations over this many lounges.')
+@click.option('--days', default=365, show_default=True, help='Spread entries over this many past days.')
+@click.option('--chunk-size', default=10000, show_default=True, help='Rows per INSERT executemany/transaction.')
+@click.option('--seed', 'random_seed', type=int, default=None, help='Random seed for a reproducible dataset.')
+@with_appcontext
+def seed_command(entries, passengers, reservations, lounges, days, chunk_size, random_seed):
+    """Bulk-insert synthetic passengers, lounge entries and reservations."""
+    from backend.migrations import pending_revisions
+    from backend.seed import seed_database # Imported lazily, only this command needs it
+
+    engine = get_engine()
+    if not inspect(engine).get_table_names():
+        init_db()
+    elif pending_revisions(engine):
+        # Rows inserted into an old schema would fail (or be left behind by the revisions)
+        raise click.ClickException('The database schema is not up to date. Run `flask db upgrade` first.')
+    started = time.perf_counter()
+    try:
+        counts = seed_database(engine, entries=entries, passengers=passengers, reservations=reservations,
+                               chunk_size=chunk_size, days=days, seed=random_seed, lounges=lounges)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    current_app.extensions['report_cache'].clear() # Past days just gained entries
+    elapsed = time.perf_counter() - started
+    click.echo(f"Inserted {counts['passengers']} passengers, {counts['lounge_entries']} lounge entries "
+               f"and {counts['reservations']} reservations in {elapsed:.1f}s.")
+
+# Recompute per-passenger visit aggregates (after bulk loads or on old databases)
+@click.command('rebuild-aggregates')
+@with_appcontext
+def rebuild_aggregates_command():
+    """Recompute passengers' visit counts and stay totals from lounge entries."""
+    from backend.aggregates import rebuild_passenger_aggregates
+
+    with get_engine().connect() as connection:
+        updated = rebuild_passenger_aggregates(connection)
+    click.echo(f'Rebuilt visit aggregates for {updated} passengers.')
+
+# Drop cached report days (after loading entries for past days behind the app's back)
+@click.command('clear-report-cache')
+@with_appcontext
+def clear_report_cache_command():
+    """Empty the shared report cache (CACHE_BACKEND 'sqlite' or 'redis')."""
+    current_app.extensions['report_cache'].clear()
+    click.echo('Cleared the report cache. Restart running workers to drop their in-process copies.')
+
+# Schema migrations for existing databases (see backend/migrations)
+@click.group('db')
+def db_cli():
+    """Upgrade the schema of an existing database."""
+
+# Bulk-load reservations from an airline manifest (see backend/reservation_import.py)
+@click.command('import-reservations')
+@click.argument('manifest', type=click.File('rb'))
+@click.option('--format', 'manifest_format_name', type=click.Choice(['csv', 'ndjson', 'json']), default=None,
+              help='Manifest format (default: from the file extension).')
+@click.option('--lounge-id', default=1, show_default=True, help='Lounge the reservations belong to.')
+@click.option('--chunk-size', default=None, type=int, help='Valid rows per transaction (default: RESERVATION_IMPORT_CHUNK_SIZE).')
+@with_appcontext
+def import_reservations_command(manifest, manifest_format_name, lounge_id, chunk_size):
+    """Import reservations from a CSV, JSON Lines or JSON manifest, reporting rows that fail."""
+    from backend.models import Lounge
+    from backend.queries import InvalidParameter
+    from backend.reservation_import import import_reservations, manifest_format, read_manifest
+
+    if db_session.get(Lounge, lounge_id) is None:
+        raise click.ClickException(f'No lounge with id {lounge_id}')
+    try:
+        manifest_format_name = manifest_format(manifest_format_name, filename=manifest.name)
+    except InvalidParameter as e:
+        raise click.ClickException(str(e))
+    started = time.perf_counter()
+    try:
+        result = import_reservations(db_session, read_manifest(manifest, manifest_format_name), lounge_id,
+                                     chunk_size=chunk_size or current_app.config['RESERVATION_IMPORT_CHUNK_SIZE'])
+    except NotImplementedError as e:
+        raise click.ClickException(str(e))
+    for error in result['errors']:
+        click.echo(f"Row {error['row']}: {error['message']}", err=True)
+    if result['errors_truncated']:
+        click.echo('More rows failed than are listed.', err=True)
+    click.echo(f"Imported {result['imported']} reservations in {time.perf_counter() - started:.1f}s; "
+               f"{result['failed']} rows failed.")
+
+# Mark past confirmed reservations as no-shows; run it from cron (see backend/reservation_status.py)
+@click.command('expire-reservations')
+@click.option('--grace-days', default=0, show_default=True, help='Days past the reservation date before it expires.')
+@click.option('--chunk-size', default=1000, show_default=True, help='Reservations per UPDATE transaction.')
+@click.option('--pause', default=0.0, show_default=True, help='Seconds to sleep between chunks.')
+@with_appcontext
+def expire_reservations_command(grace_days, chunk_size, pause):
+    """Mark confirmed reservations whose day has passed as no_show."""
+    from backend.reservation_status import expire_no_shows
+
+    expired = expire_no_shows(db_session, grace_days=grace_days, chunk_size=chunk_size, pause=pause)
+    click.echo(f'Marked {expired} reservations as no_show.')
+
+# Event log segments and replay (see backend/events.py)
+@click.group('events')
+def events_cli():
+    """Export and replay the event log."""
+
+@events_cli.command('export')
+@click.argument('directory', type=click.Path(file_okay=False))
+@click.option('--segment-size', default=100000, show_default=True, help='Events per segment file.')
+@with_appcontext
+def events_export_command(directory, segment_size):
+    """Append the events not exported yet to DIRECTORY as NDJSON segments."""
+    from backend.events import export_segments
+
+    with get_engine().connect() as connection:
+        written, exported = export_segments(connection, directory, segment_size,
+                                            settle_seconds=current_app.config.get('EVENTS_SETTLE_SECONDS', 0))
+    click.echo(f'Wrote {exported} events in {written} segments.')
+
+@events_cli.command('replay')
+@click.argument('directory', required=False, type=click.Path(exists=True, file_okay=False))
+@with_appcontext
+def events_replay_command(directory):
+    """Rebuild visit aggregates and report days from the segments in DIRECTORY (default: the events table)."""
+    from sqlalchemy import func, select
+    from backend.events import iter_events, read_segments, replay_events, segments
+    from backend.models import Event
+
+    with get_engine().connect() as connection:
+        first_id = connection.execute(select(func.min(Event.id))).scalar()
+        found = segments(directory) if directory else None
+        if found is not None and (not found or found[0][0] != first_id):
+            raise click.ClickException('The segments do not start at the first event of the log; nothing rebuilt.')
+        events = read_segments(directory) if directory else iter_events(connection)
+        report_cache = current_app.extensions['report_cache']
+        replay, days = replay_events(connection, events, report_cache if report_cache.shared is not None else None)
+    click.echo(f'Replayed {replay.count} events up to id {replay.last_id}: rebuilt visit aggregates'
+               + (f' and cached {days} report days.' if days else '.'))
+
+@db_cli.command('upgrade')
+@click.option('--target', default=None, help='Stop after this revision (default: the latest).')
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, show_default=True, help='Rows per backfill transaction.')
+@click.option('--pause', default=DEFAULT_PAUSE, show_default=True, help='Seconds to sleep between backfill batches.')
+@with_appcontext
+def db_upgrade_command(target, batch_size, pause):
+    """Apply pending revisions, committing in small steps so the app can keep running."""
+    from backend.migrations import upgrade
+
+    applied = upgrade(get_engine(), target=target, batch_size=batch_size, pause=pause, log=click.echo)
+    click.echo(f'Applied {len(applied)} revisions.' if applied else 'Database is up to date.')
+
+@db_cli.command('current')
+@with_appcontext
+def db_current_command():
+    """Show the latest applied revision."""
+    from backend.migrations import current_revision
+
+    click.echo(current_revision(get_engine()) or 'No revisions applied.')
+
+@db_cli.command('history')
+@with_appcontext
+def db_history_command():
+    """List every revision and whether it is applied."""
+    from backend.migrations import applied_revisions, load_revisions
+
+    applied = applied_revisions(get_engine())
+    for module in load_revisions():
+        marker = 'applied' if module.revision in applied else 'pending'
+        click.echo(f'{module.revision} ({marker}) {module.description}')
+
+def create_app(config=None):
+    """Build an app with its own engine, metrics and blueprints.
+
+    ``config`` (a mapping) overrides DEFAULT_CONFIG, e.g.
+    ``create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})`` for an isolated
+    in-memory database.
+    """
+    app = Flask(__name__)
+    app.config.update(DEFAULT_CONFIG)
+    if config:
+        app.config.update(config)
+
+    engine = make_engine(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.extensions['sqlalchemy_engine'] = engine
+    app.extensions['metrics'] = MetricsRegistry()
+    app.extensions['json_provider'] = make_provider(app.config['JSON_PROVIDER'])
+    app.extensions['single_flight'] = make_single_flight(app.config)
+    app.extensions['rate_limiter'] = make_rate_limiter(app.config)
+    app.extensions['cache'] = cache = make_cache(app.config)
+    app.extensions['report_cache'] = make_report_cache(
+        app.config, shared=None if isinstance(cache.backend, LRUCache) else cache.backend)
+    instrument_engine(app, engine)
+
+    login_manager.init_app(app)
+    app.teardown_appcontext(shutdown_session)
+
+    # after_request hooks run in reverse order: compression is registered first so
+    # it runs last, on the final body (e.g. a profile) with all headers set
+    app.after_request(compress_response)
+    app.before_request(start_request_timer)
+    app.after_request(record_request_timing)
+    app.before_request(start_request_profile)
+    app.after_request(finish_request_profile)
+    app.teardown_request(stop_request_profile)
+
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(rebuild_aggregates_command)
+    app.cli.add_command(clear_report_cache_command)
+    app.cli.add_command(import_reservations_command)
+    app.cli.add_command(expire_reservations_command)
+    app.cli.add_command(db_cli)
+    app.cli.add_command(events_cli)
+
+    for blueprint in app.config['BLUEPRINTS']:
+        app.register_blueprint(import_string(blueprint))
+
+    app.add_url_rule('/', 'home', home)
+    app.add_url_rule('/metrics', 'metrics', metrics)
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
@@ -0,0 +1,245 @@
+"""ASGI serving mode.
+
+The frequently polled, read-only endpoints (dashboard, lounge usage report and
+passenger search) are served by async handlers on an async SQLAlchemy engine
+(aiosqlite for SQLite, asyncpg for PostgreSQL). A request waiting on the
+database then holds a coroutine instead of a worker thread, so one process can
+serve many polling screens. Every other request goes to the regular Flask app
+through asgiref's WSGI adapter, so the API is the same in both modes.
+
+    uvicorn --factory backend.asgi:create_asgi_app
+
+The async handlers run the same statements and payload functions as the Flask
+views (``backend/queries.py``), and the dashboard polls get the same per-user
+rate limits and shared results (``backend/polling.py``). They authenticate from the Flask session cookie
+set by ``POST /auth/login`` and are scoped to the logged-in user's lounge, as
+the views are (``backend/tenancy.py``). Requires the optional ``asgiref`` and ``aiosqlite``
+(or ``asyncpg``) packages.
+"""
+import asyncio
+import math
+from collections import namedtuple
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qsl
+
+from asgiref.wsgi import WsgiToAsgi
+from itsdangerous import BadSignature
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+from werkzeug.datastructures import MultiDict
+
+from backend import queries
+from backend.app import create_app
+from backend.compression import choose_encoding, compress
+from backend.models import Lounge, User
+from backend.polling import TOO_MANY_REQUESTS_MESSAGE
+from backend.timestamps import DEFAULT_TIMEZONE, get_timezone, local_range_bounds
+
+UserLounge = namedtuple('UserLounge', 'id timezone')
+
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+
+def async_database_url(url):
+    """Map a sync database URL onto the matching async driver."""
+    scheme, _, rest = url.partition('://')
+    dialect = scheme.split('+')[0]
+    if dialect not in ASYNC_DRIVERS:
+        raise ValueError(f'No async driver configured for {scheme} URLs')
+    return f'{ASYNC_DRIVERS[dialect]}://{rest}'
+
+
+# --- Async handlers: (ASGI app, connection, lounge, query args) -> (status, payload) ---
+# `lounge` has the user's lounge `id` and `timezone` (a ZoneInfo)
+
+async def dashboard_stats(app, conn, lounge, args):
+    async def query():
+        occupancy_stmt, entries_today_stmt, average_stay_stmt = queries.dashboard_stats_statements(
+            lounge.id, *queries.today_bounds(lounge.timezone))
+        current_occupancy = (await conn.execute(occupancy_stmt)).scalar()
+        total_entries_today = (await conn.execute(entries_today_stmt)).scalar()
+        average_stay_seconds = (await conn.execute(average_stay_stmt)).scalar()
+        return queries.dashboard_stats_payload(current_occupancy, total_entries_today, average_stay_seconds)
+
+    # Same cache entry as the Flask view
+    return 200, await app.cache.get_or_set_async(queries.dashboard_stats_cache_key(lounge.timezone), query,
+                                                 tables=('lounge_entries',), lounge_id=lounge.id)
+
+async def recent_entries(app, conn, lounge, args):
+    rows = (await conn.execute(queries.recent_entries_statement(lounge.id, limit=10))).all()
+    return 200, queries.recent_entries_payload(rows)
+
+async def lounge_usage_report(app, conn, lounge, args):
+    try:
+        start_date, end_date = queries.lounge_usage_range(args, lounge.timezone)
+    except queries.InvalidParameter as e:
+        return 400, {'message': str(e)}
+    # Same per-day cache as the Flask view
+    counts, missing, version = app.report_cache.lookup(lounge.id, lounge.timezone, start_date, end_date)
+    if missing is not None:
+        start, end = local_range_bounds(lounge.timezone, *missing)
+        rows = (await conn.execute(queries.lounge_usage_statement(lounge.id, start, end))).all()
+        computed = queries.lounge_usage_counts(rows, lounge.timezone)
+        app.report_cache.store(lounge.id, lounge.timezone, *missing, computed, version)
+        counts.update(computed)
+    return 200, queries.lounge_usage_payload(start_date, end_date, counts)
+
+async def passenger_search(app, conn, lounge, args):
+    if args.get('view') == 'summary':
+        rows = (await conn.execute(queries.passenger_summaries_statement(lounge.id, args.get('search_query')))).all()
+        return 200, queries.passenger_summaries_payload(rows)
+    passengers_stmt, entries_stmt = queries.passenger_search_statements(lounge.id, args.get('search_query'))
+    passengers = (await conn.execute(passengers_stmt)).all()
+    entries = (await conn.execute(entries_stmt)).all()
+    return 200, queries.passenger_search_payload(passengers, entries)
+
+ASYNC_ROUTES = {
+    '/dashboard/stats': dashboard_stats,
+    '/dashboard/recent-entries': recent_entries,
+    '/reports/lounge-usage': lounge_usage_report,
+    '/passengers': passenger_search,
+}
+
+# Polled by every terminal: rate limited and coalesced under the Flask endpoint's name
+POLLED_ROUTES = {
+    '/dashboard/stats': 'dashboard.get_dashboard_stats',
+    '/dashboard/recent-entries': 'dashboard.get_recent_entries',
+}
+
+
+class LoungeASGIApp:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi_app = WsgiToAsgi(flask_app)
+        self.json_provider = flask_app.extensions['json_provider']
+        self.single_flight = flask_app.extensions['single_flight'] # Shared with the Flask views
+        self.rate_limiter = flask_app.extensions['rate_limiter']
+        self.report_cache = flask_app.extensions['report_cache']
+        self.cache = flask_app.extensions['cache']
+        self.engine = create_async_engine(async_database_url(flask_app.config['SQLALCHEMY_DATABASE_URI']))
+        self._warm_up = None
+
+        session_interface = flask_app.session_interface
+        self.session_serializer = session_interface.get_signing_serializer(flask_app)
+        self.session_cookie_name = session_interface.get_cookie_name(flask_app)
+        self.session_max_age = int(flask_app.permanent_session_lifetime.total_seconds())
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+
+        handler = path = None
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            path = scope['path'].rstrip('/') or '/'
+            handler = ASYNC_ROUTES.get(path)
+        if handler is None:
+            return await self.wsgi_app(scope, receive, send)
+
+        args = MultiDict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+        user_id = self._session_user_id(scope)
+        endpoint = POLLED_ROUTES.get(path)
+        if endpoint is not None and user_id is not None:
+            # Turned away before touching the database
+            retry_after = self.rate_limiter.acquire((user_id, endpoint))
+            if retry_after:
+                return await self._send_json(scope, send, 429, {'message': TOO_MANY_REQUESTS_MESSAGE},
+                                             [(b'retry-after', str(math.ceil(retry_after)).encode('latin-1'))])
+
+        await self.warm_up()
+        async with self.engine.connect() as conn:
+            lounge = await self._current_lounge(user_id, conn)
+            if lounge is None:
+                status, payload = 401, {'message': 'Authentication required'}
+            elif endpoint is not None:
+                # Same key as the Flask views: endpoint and query string
+                key = (endpoint, tuple(sorted(args.items(multi=True))))
+                status, payload = await self.single_flight.do_async(
+                    lounge.id, key, lambda: handler(self, conn, lounge, args))
+            else:
+                status, payload = await handler(self, conn, lounge, args)
+        await self._send_json(scope, send, status, payload)
+
+    async def warm_up(self):
+        # The pool's first connection must be made alone: concurrent first connects
+        # block on the pool's (thread) lock inside the event loop and deadlock
+        if self._warm_up is None:
+            self._warm_up = asyncio.ensure_future(self._connect_once())
+        await asyncio.shield(self._warm_up)
+
+    async def _connect_once(self):
+        async with self.engine.connect():
+            pass
+
+    async def dispose(self):
+        # Connections belong to the event loop that opened them
+        await self.engine.dispose()
+        self._warm_up = None
+
+    def _session_user_id(self, scope):
+        # Same check Flask does: read and verify the signed session cookie
+        cookie_header = b'; '.join(value for name, value in scope.get('headers', []) if name == b'cookie')
+        if not cookie_header or self.session_serializer is None:
+            return None
+        cookie = SimpleCookie()
+        cookie.load(cookie_header.decode('latin-1'))
+        morsel = cookie.get(self.session_cookie_name)
+        if morsel is None:
+            return None
+        try:
+            session = self.session_serializer.loads(morsel.value, max_age=self.session_max_age)
+        except BadSignature:
+            return None
+        return session.get('_user_id') # Written by Flask-Login's login_user()
+
+    async def _current_lounge(self, user_id, conn):
+        if user_id is None:
+            return None
+        # Like the Flask-Login user_loader: the user must still exist (None otherwise)
+        row = (await conn.execute(
+            select(User.lounge_id, Lounge.timezone)
+            .outerjoin(Lounge, User.lounge_id == Lounge.id)
+            .where(User.id == int(user_id))
+        )).first()
+        if row is None:
+            return None
+        return UserLounge(row.lounge_id, get_timezone(row.timezone or DEFAULT_TIMEZONE))
+
+    async def _send_json(self, scope, send, status, payload, extra_headers=()):
+        body = self.json_provider.dumps(payload)
+        headers = [(b'content-type', b'application/json'), (b'vary', b'Accept-Encoding'), *extra_headers]
+
+        # Same rules as the Flask after_request hook (backend/compression.py)
+        config = self.flask_app.config
+        if config['COMPRESS_ENABLED'] and len(body) >= config['COMPRESS_MIN_SIZE']:
+            accept_encoding = b', '.join(value for name, value in scope.get('headers', []) if name == b'accept-encoding')
+            encoding = choose_encoding(accept_encoding.decode('latin-1'))
+            if encoding is not None:
+                body = compress(body, encoding, config['COMPRESS_GZIP_LEVEL'], config['COMPRESS_BROTLI_QUALITY'])
+                headers.append((b'content-encoding', encoding.encode('latin-1')))
+
+        headers.append((b'content-length', str(len(body)).encode('latin-1')))
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': headers,
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await self.warm_up()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def create_asgi_app(config=None, flask_app=None):
+    """ASGI app serving the polled endpoints async and everything else via Flask."""
+    return LoungeASGIApp(flask_app or create_app(config))
@@ -0,0 +1,144 @@
+"""Compare the async (ASGI) read endpoints with the same endpoints under WSGI.
+
+Runs the polled read endpoints against an already seeded database (see
+``run.py``) at increasing concurrency: WSGI through the Flask test client from
+a thread pool, ASGI as that many concurrent asyncio tasks calling
+``backend.asgi`` in-process. Both share one machine and one database file, so
+the numbers show how each mode behaves as concurrency grows, not absolute
+server throughput.
+
+Usage (from the project root):
+
+    python -m backend.benchmarks.run --db bench_lounge.db --requests 1 --output /dev/null
+    python -m backend.benchmarks.asgi_vs_wsgi --db bench_lounge.db --concurrency 8 --concurrency 64
+
+As in ``run.py``, the polled endpoints' rate limit and result reuse are off
+unless ``--polling-protection`` is given.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+
+from backend.benchmarks.run import UNTHROTTLED_POLLING, git_revision, make_client, run_concurrent, summarize
+
+ENDPOINTS = [
+    ('/dashboard/stats', ''),
+    ('/dashboard/recent-entries', ''),
+    ('/passengers', 'search_query=AZ1'),
+    ('/reports/lounge-usage', 'date_range=last_30_days'),
+]
+
+
+def run_asgi(asgi_app, path, query_string, count, concurrency, cookie):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': query_string.encode(), 'root_path': '',
+        'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode('latin-1'))],
+        'server': ('localhost', 80), 'client': ('127.0.0.1', 0),
+    }
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def main():
+        latencies, errors = [], 0
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one():
+            nonlocal errors
+            status = []
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+
+            async with semaphore:
+                t0 = time.perf_counter()
+                try:
+                    await asgi_app(scope, receive, send)
+                except Exception:
+                    status.append(500) # What the server would answer
+                latencies.append(time.perf_counter() - t0)
+            if status[0] >= 400:
+                errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(count)))
+        wall = time.perf_counter() - started
+        await asgi_app.dispose() # The pool is bound to this event loop
+        return summarize(latencies, wall, errors)
+
+    return asyncio.run(main())
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Compare ASGI and WSGI latency on the async read endpoints.')
+    parser.add_argument('--db', default='bench_lounge.db', help='Seeded SQLite file (see run.py)')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint, mode and concurrency')
+    parser.add_argument('--concurrency', type=int, action='append', default=[], help='Concurrent clients (repeatable)')
+    parser.add_argument('--username', default='bench_admin')
+    parser.add_argument('--password', default='bench_password')
+    parser.add_argument('--polling-protection', action='store_true',
+                        help="Keep the dashboard endpoints' rate limit and result reuse (off by default)")
+    parser.add_argument('--output', default='asgi_report.json')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    levels = args.concurrency or [1, 8, 64]
+
+    from backend.app import create_app
+    from backend.asgi import create_asgi_app
+
+    if not os.path.exists(args.db):
+        sys.exit(f'{args.db} does not exist; seed it with backend.benchmarks.run first')
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.abspath(args.db)}',
+        'TESTING': True,
+        'PROPAGATE_EXCEPTIONS': False,
+        **({} if args.polling_protection else UNTHROTTLED_POLLING),
+    })
+    asgi_app = create_asgi_app(flask_app=app)
+    credentials = (args.username, args.password)
+    session_cookie = next(c for c in make_client(app, *credentials).cookie_jar if c.name == 'session')
+    cookie = f'session={session_cookie.value}'
+
+    results = {}
+    for path, query_string in ENDPOINTS:
+        name = f'{path}?{query_string}' if query_string else path
+        print(f'{name} ...', file=sys.stderr)
+        results[name] = {}
+        for level in levels:
+            factory = lambda i: ('GET', name, None)
+            results[name][str(level)] = {
+                'wsgi': run_concurrent(app, factory, args.requests, level, credentials),
+                'asgi': run_asgi(asgi_app, path, query_string, args.requests, level, cookie),
+            }
+
+    report = {
+        'meta': {
+            'git_revision': git_revision(),
+            'timestamp': datetime.datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'requests': args.requests,
+            'concurrency': levels,
+            'polling_protection': args.polling_protection,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as fh:
+        json.dump(report, fh, indent=2, sort_keys=True)
+    print(f'Wrote {args.output}', file=sys.stderr)
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Compare two benchmark reports written by ``run.py``.
+
+    python -m backend.benchmarks.compare before.json after.json
+"""
+import argparse
+import json
+
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps')
+
+
+def compare(before, after):
+    rows = []
+    for name in sorted(set(before['results']) | set(after['results'])):
+        for mode in ('serial', 'concurrent'):
+            old = before['results'].get(name, {}).get(mode)
+            new = after['results'].get(name, {}).get(mode)
+            if not old or not new:
+                continue
+            for metric in METRICS:
+                delta = ((new[metric] - old[metric]) / old[metric] * 100.0) if old[metric] else 0.0
+                rows.append((name, mode, metric, old[metric], new[metric], delta))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Diff two benchmark JSON reports.')
+    parser.add_argument('before')
+    parser.add_argument('after')
+    args = parser.parse_args(argv)
+
+    with open(args.before) as fh:
+        before = json.load(fh)
+    with open(args.after) as fh:
+        after = json.load(fh)
+
+    print(f"{'endpoint':45} {'mode':10} {'metric':15} {'before':>10} {'after':>10} {'delta':>8}")
+    for name, mode, metric, old, new, delta in compare(before, after):
+        print(f'{name:45} {mode:10} {metric:15} {old:10.2f} {new:10.2f} {delta:+7.1f}%')
+
+
+if __name__ == '__main__':
+    main()
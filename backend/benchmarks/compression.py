@@ -0,0 +1,96 @@
+"""Measure response compression on the fetches the HTML pages make.
+
+Seeds an in-memory database and requests every GET the frontend pages issue
+(dashboard, passenger record, reservations, report, settings) with no
+compression, gzip and (if installed) brotli. Reports the body size on the wire
+and the server time for each, so the CPU cost can be weighed against the
+bytes saved for terminals on slow links.
+
+    python -m backend.benchmarks.compression --entries 20000 --output compression.json
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+
+# (page, fetch) pairs from the *.html pages at the project root
+PAGE_FETCHES = [
+    ('dashboard.html', '/dashboard/stats'),
+    ('dashboard.html', '/dashboard/recent-entries'),
+    ('passengerrecord.html', '/passengers?search_query=AZ1'),
+    ('passengerrecord.html', '/passengers?search_query='),
+    ('reservation.html', '/reservations?status_filter=upcoming'),
+    ('reservation.html', '/reservations?status_filter='),
+    ('report.html', '/reports/lounge-usage?date_range=last_30_days'),
+    ('settings.html', '/settings/lounge'),
+    ('settings.html', '/settings/users'),
+    ('login.html', '/auth/status'),
+]
+
+
+def measure(client, path, accept_encoding, repeat):
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        response = client.get(path, headers={'Accept-Encoding': accept_encoding})
+        body = response.get_data()
+        timings.append(time.perf_counter() - t0)
+    return {
+        'status': response.status_code,
+        'encoding': response.headers.get('Content-Encoding', 'identity'),
+        'bytes': len(body),
+        'median_ms': round(statistics.median(timings) * 1000, 2),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Measure compression on the HTML pages\' API fetches.')
+    parser.add_argument('--entries', type=int, default=20000)
+    parser.add_argument('--passengers', type=int, default=2000)
+    parser.add_argument('--reservations', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default='compression.json')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    from backend.app import create_app
+    from backend.compression import available_encodings
+    from backend.database import db_session, get_engine, init_db
+    from backend.models import User
+    from backend.seed import seed_database
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True, 'PROPAGATE_EXCEPTIONS': False})
+    with app.app_context():
+        init_db()
+        seed_database(get_engine(), entries=args.entries, passengers=args.passengers,
+                      reservations=args.reservations, days=30, seed=1)
+        admin = User(username='bench_gzip', role='admin')
+        admin.set_password('bench_gzip')
+        db_session.add(admin)
+        db_session.commit()
+        db_session.remove()
+
+    client = app.test_client()
+    client.post('/auth/login', json={'username': 'bench_gzip', 'password': 'bench_gzip'})
+
+    results = []
+    for page, path in PAGE_FETCHES:
+        row = {'page': page, 'fetch': path, 'identity': measure(client, path, 'identity', args.repeat)}
+        for encoding in available_encodings():
+            row[encoding] = measure(client, path, encoding, args.repeat)
+        results.append(row)
+        summary = ', '.join(f"{key} {row[key]['bytes']}B/{row[key]['median_ms']}ms"
+                            for key in ('identity',) + available_encodings())
+        print(f'{path}: {summary}', file=sys.stderr)
+
+    with open(args.output, 'w') as fh:
+        json.dump({'min_size': app.config['COMPRESS_MIN_SIZE'], 'results': results}, fh, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,346 @@
+"""API load test and latency benchmark.
+
+Seeds a database with realistic volumes through ``backend.seed`` and drives
+every blueprint endpoint through the Flask test client, first serially and then
+from a pool of threads. Results are written as a JSON report so two runs (for
+example before and after a change) can be compared with ``compare.py``.
+
+Usage (from the project root):
+
+    python -m backend.benchmarks.run --db /tmp/bench.db --output bench.json
+    python -m backend.benchmarks.run --db /tmp/bench.db --skip-seed --threads 16
+
+Besides the endpoints, the scheduled jobs (no-show expiry, event log export)
+are timed once each, after the endpoints, on the data the endpoints left.
+
+Every request comes from one user, so the polled endpoints' rate limit and
+result reuse (backend/polling.py) are switched off unless ``--polling-protection``
+is given: otherwise most dashboard requests would be answered 429, or from a
+result another request computed, rather than by the database.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+# App config for runs without the polled endpoints' rate limit and result reuse
+UNTHROTTLED_POLLING = {'POLL_RATE_PER_MINUTE': None, 'POLL_COALESCE_WINDOW_MS': 0}
+
+BATCH_SIZE = 100 # Reservations per batch status request
+MANIFEST_ROWS = 1000 # Rows per imported manifest
+EVENTS_PAGE = 1000 # Events per GET /events page
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile on an already sorted list
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, wall_seconds, errors):
+    latencies_ms = sorted(l * 1000.0 for l in latencies)
+    return {
+        'requests': len(latencies_ms),
+        'errors': errors,
+        'mean_ms': round(statistics.mean(latencies_ms), 3) if latencies_ms else 0.0,
+        'p50_ms': round(percentile(latencies_ms, 50), 3),
+        'p95_ms': round(percentile(latencies_ms, 95), 3),
+        'p99_ms': round(percentile(latencies_ms, 99), 3),
+        'max_ms': round(latencies_ms[-1], 3) if latencies_ms else 0.0,
+        'throughput_rps': round(len(latencies_ms) / wall_seconds, 2) if wall_seconds else 0.0,
+    }
+
+
+class IdPool:
+    """Hands out ids from a query, loaded on first use so earlier scenarios can add rows."""
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.lock = threading.Lock()
+        self.ids = None
+
+    def next(self):
+        with self.lock:
+            if self.ids is None:
+                self.ids = iter(self.loader())
+            return next(self.ids, 0)
+
+    def take(self, count):
+        # Several ids at once, for batch requests; [0] once the pool is used up
+        with self.lock:
+            if self.ids is None:
+                self.ids = iter(self.loader())
+            return [id_ for _, id_ in zip(range(count), self.ids)] or [0]
+
+
+def manifest_csv(i, rows=MANIFEST_ROWS):
+    """A CSV airline manifest of ``rows`` reservations on one flight, as bytes."""
+    day = (datetime.date.today() + datetime.timedelta(days=1 + i % 30)).isoformat()
+    lines = ['passenger_name,flight_number,reservation_date,reservation_time,number_of_guests']
+    lines.extend(f'Manifest Guest {i}-{row},BM{i % 500},{day},{8 + row % 12:02d}:30,1' for row in range(rows))
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def build_scenarios(exit_ids, status_ids, batch_ids, event_cursors):
+    """Return (name, request factory) pairs covering every blueprint endpoint.
+
+    A request factory takes the sequence number of the request and returns
+    ``(method, path, body)``; the body is JSON, or a CSV manifest as bytes.
+    Exits and status updates consume ids, so they take them from the given
+    ``IdPool`` instances, and the event tail pages through ``event_cursors``.
+    """
+    today = datetime.date.today()
+
+    return [
+        ('auth.status', lambda i: ('GET', '/auth/status', None)),
+        ('checkin.check_in_passenger', lambda i: ('POST', '/checkin', {
+            'passenger_name': f'Bench Passenger {i}', 'flight_number': f'BN{i % 500}'})),
+        ('dashboard.get_dashboard_stats', lambda i: ('GET', '/dashboard/stats', None)),
+        ('dashboard.get_recent_entries', lambda i: ('GET', '/dashboard/recent-entries', None)),
+        ('dashboard.get_overstays', lambda i: ('GET', '/dashboard/overstays', None)),
+        ('events.tail_events', lambda i: ('GET', f'/events?after={event_cursors.next()}&limit={EVENTS_PAGE}', None)),
+        ('passengers.get_passengers', lambda i: ('GET', f'/passengers?search_query=AZ{100 + i % 900}', None)),
+        ('passengers.get_passengers_summary', lambda i: (
+            'GET', f'/passengers?view=summary&search_query=AZ{100 + i % 900}', None)),
+        ('passengers.get_passenger', lambda i: ('GET', f'/passengers/{1 + i % 1000}', None)),
+        ('passengers.get_passenger_entries', lambda i: ('GET', f'/passengers/{1 + i % 1000}/entries', None)),
+        ('passengers.exit_passenger', lambda i: ('POST', f'/passengers/{exit_ids.next()}/exit', {})),
+        ('reports.get_lounge_usage_report', lambda i: ('GET', '/reports/lounge-usage?date_range=last_30_days', None)),
+        ('reports.get_flights_report', lambda i: ('GET', '/reports/flights?date_range=last_30_days', None)),
+        ('reports.get_top_passengers_report', lambda i: ('GET', '/reports/top-passengers?limit=20', None)),
+        ('reservations.create_reservation', lambda i: ('POST', '/reservations', {
+            'passenger_name': f'Bench Guest {i}', 'flight_number': f'BR{i % 500}',
+            'reservation_date': (today + datetime.timedelta(days=i % 30)).isoformat(),
+            'reservation_time': '10:30'})),
+        ('reservations.get_reservations', lambda i: ('GET', '/reservations?status_filter=upcoming', None)),
+        ('reservations.update_reservation_status', lambda i: (
+            'PUT', f'/reservations/{status_ids.next()}/status', {'new_status': 'completed'})),
+        ('reservations.update_reservation_statuses', lambda i: (
+            'PUT', '/reservations/status', {'ids': batch_ids.take(BATCH_SIZE), 'new_status': 'completed'})),
+        ('reservations.update_reservation_statuses_by_date', lambda i: ('PUT', '/reservations/status', {
+            'reservation_date': (today + datetime.timedelta(days=i % 30)).isoformat(), 'status': 'confirmed',
+            'new_status': 'cancelled'})),
+        ('reservations.import_reservations_manifest', lambda i: ('POST', '/reservations/import', manifest_csv(i))),
+        ('settings.get_lounge_settings', lambda i: ('GET', '/settings/lounge', None)),
+        ('settings.update_lounge_settings', lambda i: ('POST', '/settings/lounge', {'lounge_capacity': 100 + i % 50})),
+        ('settings.get_users', lambda i: ('GET', '/settings/users', None)),
+    ]
+
+
+def build_jobs(export_dir):
+    """Return (name, job) pairs for the scheduled jobs; a job takes the app and runs in its context."""
+    from backend.database import db_session, get_engine
+    from backend.events import export_segments
+    from backend.reservation_status import expire_no_shows
+
+    def events_export(app):
+        with get_engine().connect() as connection:
+            export_segments(connection, export_dir, 100000)
+
+    return [
+        ('jobs.expire_no_shows', lambda app: expire_no_shows(db_session, chunk_size=1000)),
+        ('jobs.events_export', events_export),
+    ]
+
+
+def run_job(app, job):
+    # Scheduled jobs run once, so only the serial mode has a (single) sample
+    from backend.database import db_session
+
+    with app.app_context():
+        try:
+            t0 = time.perf_counter()
+            job(app)
+            elapsed = time.perf_counter() - t0
+        finally:
+            db_session.remove()
+    return {'serial': summarize([elapsed], elapsed, 0)}
+
+
+def send(client, method, path, body):
+    if isinstance(body, bytes):
+        return client.open(path, method=method, data=body, content_type='text/csv')
+    return client.open(path, method=method, json=body)
+
+
+def make_client(app, username, password):
+    client = app.test_client()
+    response = client.post('/auth/login', json={'username': username, 'password': password})
+    if response.status_code != 200:
+        raise RuntimeError(f'Benchmark login failed: {response.get_data(as_text=True)}')
+    return client
+
+
+def run_serial(app, factory, count, credentials):
+    client = make_client(app, *credentials)
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    for i in range(count):
+        method, path, body = factory(i)
+        t0 = time.perf_counter()
+        response = send(client, method, path, body)
+        latencies.append(time.perf_counter() - t0)
+        if response.status_code >= 400:
+            errors += 1
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+def run_concurrent(app, factory, count, threads, credentials):
+    local = threading.local()
+    lock = threading.Lock()
+    latencies, errors = [], [0]
+
+    def one(i):
+        # One logged-in client per worker thread, like one desk terminal each
+        if not hasattr(local, 'client'):
+            local.client = make_client(app, *credentials)
+        method, path, body = factory(i)
+        t0 = time.perf_counter()
+        response = send(local.client, method, path, body)
+        elapsed = time.perf_counter() - t0
+        with lock:
+            latencies.append(elapsed)
+            if response.status_code >= 400:
+                errors[0] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(count)))
+    return summarize(latencies, time.perf_counter() - started, errors[0])
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Seed a database and benchmark every API endpoint.')
+    parser.add_argument('--db', default='bench_lounge.db', help='SQLite file to seed and benchmark against')
+    parser.add_argument('--entries', type=int, default=2000000)
+    parser.add_argument('--passengers', type=int, default=300000)
+    parser.add_argument('--reservations', type=int, default=200000)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--skip-seed', action='store_true', help='Reuse an already seeded --db file')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and mode')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--only', action='append', default=[], help='Only run endpoints containing this string')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the synthetic data')
+    parser.add_argument('--group-commit', action='store_true', help='Enable CHECKIN_GROUP_COMMIT for the run')
+    parser.add_argument('--polling-protection', action='store_true',
+                        help="Keep the dashboard endpoints' rate limit and result reuse (off by default)")
+    parser.add_argument('--output', default='bench_report.json')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    from sqlalchemy import func, select
+    from backend.app import create_app
+    from backend.database import get_engine, init_db, db_session
+    from backend.models import Event, LoungeEntry, Reservation, User
+    from backend.seed import seed_database
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.abspath(args.db)}',
+        # Errors are counted per endpoint instead of aborting the whole run
+        'TESTING': True,
+        'PROPAGATE_EXCEPTIONS': False,
+        'CHECKIN_GROUP_COMMIT': args.group_commit,
+        **({} if args.polling_protection else UNTHROTTLED_POLLING),
+    })
+    dataset = None
+    with app.app_context():
+        if not args.skip_seed:
+            if os.path.exists(args.db):
+                os.unlink(args.db)
+            init_db()
+            t0 = time.perf_counter()
+            dataset = seed_database(get_engine(), entries=args.entries, passengers=args.passengers,
+                                    reservations=args.reservations, chunk_size=args.chunk_size, seed=args.seed)
+            dataset['seconds'] = round(time.perf_counter() - t0, 2)
+            print(f"Seeded {dataset}", file=sys.stderr)
+
+        credentials = ('bench_admin', 'bench_password')
+        if not User.query.filter_by(username=credentials[0]).first():
+            admin = User(username=credentials[0], role='admin')
+            admin.set_password(credentials[1])
+            db_session.add(admin)
+            db_session.commit()
+
+        db_session.remove()
+
+    def load_ids(column, status, per_request=1):
+        # Enough ids for both the serial and the concurrent pass
+        with app.app_context():
+            try:
+                return db_session.execute(select(column).filter(column.class_.status == status)
+                                          .limit(args.requests * 2 * per_request)).scalars().all()
+            finally:
+                db_session.remove()
+
+    def event_pages():
+        # One cursor per page of the log, from the start; past the end the tail restarts at 0
+        with app.app_context():
+            try:
+                return range(0, db_session.execute(select(func.max(Event.id))).scalar() or 0, EVENTS_PAGE)
+            finally:
+                db_session.remove()
+
+    exit_ids = IdPool(lambda: load_ids(LoungeEntry.id, 'active'))
+    status_ids = IdPool(lambda: load_ids(Reservation.id, 'confirmed'))
+    batch_ids = IdPool(lambda: load_ids(Reservation.id, 'confirmed', BATCH_SIZE))
+    event_cursors = IdPool(event_pages)
+
+    results = {}
+    for name, factory in build_scenarios(exit_ids, status_ids, batch_ids, event_cursors):
+        if args.only and not any(fragment in name for fragment in args.only):
+            continue
+        print(f'{name} ...', file=sys.stderr)
+        results[name] = {
+            'serial': run_serial(app, factory, args.requests, credentials),
+            'concurrent': run_concurrent(app, factory, args.requests, args.threads, credentials),
+        }
+    with tempfile.TemporaryDirectory() as export_dir:
+        for name, job in build_jobs(export_dir):
+            if args.only and not any(fragment in name for fragment in args.only):
+                continue
+            print(f'{name} ...', file=sys.stderr)
+            results[name] = run_job(app, job)
+
+    report = {
+        'meta': {
+            'git_revision': git_revision(),
+            'timestamp': datetime.datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'requests_per_endpoint': args.requests,
+            'threads': args.threads,
+            'group_commit': args.group_commit,
+            'polling_protection': args.polling_protection,
+            'dataset': dataset,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as fh:
+        json.dump(report, fh, indent=2, sort_keys=True)
+    print(f'Wrote {args.output}', file=sys.stderr)
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Benchmark JSON encoding of large list responses.
+
+Seeds an in-memory database with ``--rows`` reservations and lounge entries
+and times, for each JSON provider, (1) encoding only: turning already fetched
+rows into the response body, and (2) the whole ``GET /reservations`` and
+``GET /passengers`` requests through the test client. The ``legacy`` encoder
+is the previous approach (a hand-built dict per row with ``isoformat()`` per
+date field, then ``jsonify``) for reference.
+
+    python -m backend.benchmarks.serialization --rows 50000 --output json_bench.json
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+
+from flask import jsonify
+
+
+def legacy_reservations(rows):
+    return jsonify([
+        {
+            'id': r.id,
+            'passenger_name': r.passenger_name,
+            'flight_number': r.flight_number,
+            'reservation_date': r.reservation_date.isoformat(),
+            'reservation_time': r.reservation_time.isoformat(),
+            'number_of_guests': r.number_of_guests,
+            'status': r.status
+        } for r in rows
+    ]).get_data()
+
+
+def legacy_entries(rows):
+    return jsonify([
+        {
+            'id': e.id,
+            'entry_time': e.entry_time.isoformat() if e.entry_time else None,
+            'exit_time': e.exit_time.isoformat() if e.exit_time else None,
+            'status': e.status
+        } for e in rows
+    ]).get_data()
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        body = fn()
+        timings.append(time.perf_counter() - t0)
+    return {'best_ms': round(min(timings) * 1000, 2), 'median_ms': round(statistics.median(timings) * 1000, 2),
+            'bytes': len(body)}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark JSON encoding of large list responses.')
+    parser.add_argument('--rows', type=int, default=50000, help='Reservations and lounge entries to seed')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default='json_bench.json')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    from sqlalchemy import select
+    from backend.app import create_app
+    from backend.database import db_session, get_engine, init_db
+    from backend.models import LoungeEntry, Reservation, User
+    from backend.seed import seed_database
+    from backend.serialization import RowSerializer, make_provider, orjson
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True})
+    with app.app_context():
+        init_db()
+        # Few passengers, so one search matches thousands of entries
+        seed_database(get_engine(), passengers=max(1, args.rows // 100), entries=args.rows,
+                      reservations=args.rows, seed=1)
+        admin = User(username='bench_json', role='admin')
+        admin.set_password('bench_json')
+        db_session.add(admin)
+        db_session.commit()
+
+        reservation_stmt = select(
+            Reservation.id, Reservation.passenger_name, Reservation.flight_number, Reservation.reservation_date,
+            Reservation.reservation_time, Reservation.number_of_guests, Reservation.status)
+        entry_stmt = select(LoungeEntry.id, LoungeEntry.entry_time, LoungeEntry.exit_time, LoungeEntry.status)
+        reservation_rows = db_session.execute(reservation_stmt).all()
+        entry_rows = db_session.execute(entry_stmt).all()
+
+        providers = ['stdlib'] + (['orjson'] if orjson is not None else [])
+        encoding = {
+            'legacy': {
+                'reservations': best_of(lambda: legacy_reservations(reservation_rows), args.repeat),
+                'lounge_entries': best_of(lambda: legacy_entries(entry_rows), args.repeat),
+            }
+        }
+        for name in providers:
+            provider = make_provider(name)
+            to_reservations = RowSerializer.for_statement(reservation_stmt)
+            to_entries = RowSerializer.for_statement(entry_stmt)
+            encoding[name] = {
+                'reservations': best_of(lambda: provider.dumps(to_reservations(reservation_rows)), args.repeat),
+                'lounge_entries': best_of(lambda: provider.dumps(to_entries(entry_rows)), args.repeat),
+            }
+        db_session.remove()
+
+    client = app.test_client()
+    client.post('/auth/login', json={'username': 'bench_json', 'password': 'bench_json'})
+    endpoints = {}
+    for name in providers:
+        app.extensions['json_provider'] = make_provider(name)
+        endpoints[name] = {
+            path: best_of(lambda: client.get(path).get_data(), args.repeat)
+            for path in ('/reservations', '/passengers')
+        }
+
+    report = {'rows': args.rows, 'encoding': encoding, 'endpoints': endpoints}
+    with open(args.output, 'w') as fh:
+        json.dump(report, fh, indent=2, sort_keys=True)
+    print(json.dumps(report, indent=2, sort_keys=True), file=sys.stderr)
+    return report
+
+
+if __name__ == '__main__':
+    main()
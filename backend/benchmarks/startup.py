@@ -0,0 +1,76 @@
+"""Measure application startup cost.
+
+Each measurement runs in a fresh interpreter so module caches don't hide import
+cost. Reports the time to import ``backend.app``, the time for ``create_app()``
+and the slowest imports according to ``python -X importtime``.
+
+    python -m backend.benchmarks.startup --runs 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Printed by the child interpreter: import seconds, create_app seconds
+CHILD = '''
+import time
+t0 = time.perf_counter()
+from backend.app import create_app
+t1 = time.perf_counter()
+create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://"})
+t2 = time.perf_counter()
+print(t1 - t0, t2 - t1)
+'''
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run_child(extra_args=()):
+    return subprocess.run([sys.executable, *extra_args, '-c', CHILD], cwd=PROJECT_ROOT,
+                          capture_output=True, text=True, check=True)
+
+
+def slowest_imports(limit):
+    # -X importtime writes "import time: self [us] | cumulative | imported package" to stderr
+    result = run_child(['-X', 'importtime'])
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace('import time:', '|', 1).split('|')]
+        rows.append({'module': name.strip(), 'self_us': int(self_us), 'cumulative_us': int(cumulative_us)})
+    rows.sort(key=lambda row: row['cumulative_us'], reverse=True)
+    return rows[:limit]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure import and create_app() time.')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='Number of slowest imports to report')
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args(argv)
+
+    imports, factories = [], []
+    for _ in range(args.runs):
+        import_seconds, factory_seconds = map(float, run_child().stdout.split())
+        imports.append(import_seconds * 1000)
+        factories.append(factory_seconds * 1000)
+
+    report = {
+        'runs': args.runs,
+        'import_ms': round(statistics.median(imports), 2),
+        'create_app_ms': round(statistics.median(factories), 2),
+        'slowest_imports': slowest_imports(args.top),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            fh.write(text)
+    print(text)
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,393 @@
+"""Caches for computed data, shared between workers when the backend allows.
+
+Under gunicorn every worker has its own memory, so a cache kept in the process
+is duplicated per worker, and a write handled by one worker does not reach
+the others' copies. ``Cache`` is what the blueprints use. It sits on one of
+three backends, chosen with ``CACHE_BACKEND``:
+
+- ``'lru'``: ``LRUCache``, in the process. A dict lookup, no I/O, one copy per worker.
+- ``'sqlite'``: ``SQLiteCache``, a local SQLite file in WAL mode (the readers
+  share its memory-mapped index) at ``CACHE_URL``. It is shared by every
+  worker on the host and survives restarts.
+- ``'redis'``: ``RedisCache``, any server speaking the Redis protocol at
+  ``CACHE_URL`` (``redis://[:password@]host:port/db``). It is shared by every
+  host. It talks the protocol itself, so no client library is needed.
+
+Backends store JSON values and have the same interface (``get_many``,
+``set_many``, ``delete_many``, ``clear``, ``versions``, ``bump``). A backend
+failure never fails a request: it is logged and behaves as a miss.
+
+Invalidation is by version: every table has a version counter in the backend
+(per lounge for tenant data). A cached value's key includes the versions of
+the tables it was computed from, and a write bumps the version of the table it
+changed (``Cache.invalidate``). Old entries are never read again and age out
+through their TTL. A value computed while a write commits is stored under the
+old version, so it cannot hide the write.
+
+Versions only reach every worker through a shared backend. An ``LRUCache``
+bumps them only in the worker that handled the write, so values cached there
+are kept for at most ``local_ttl`` seconds (``CACHE_LRU_TTL``): other workers'
+writes show after that long at most.
+"""
+import json
+import logging
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import unquote, urlsplit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 300
+DEFAULT_LOCAL_TTL = 2
+
+
+class LRUCache:
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data = OrderedDict() # key -> (value, expires), least recently used first
+        self._versions = {} # Kept apart: an evicted version would restart at 0 and revive old entries
+
+    def get_many(self, keys):
+        """The entries found for ``keys``, as a dict."""
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                item = self._data.get(key)
+                if item is None:
+                    continue
+                value, expires = item
+                if expires is not None and expires <= now:
+                    del self._data[key]
+                    continue
+                self._data.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set_many(self, items, ttl=None):
+        if self.maxsize <= 0:
+            return
+        expires = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            for key, value in items.items():
+                self._data[key] = (value, expires)
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._versions.clear()
+
+    def versions(self, names):
+        with self._lock:
+            return {name: self._versions.get(name, 0) for name in names}
+
+    def bump(self, name):
+        with self._lock:
+            self._versions[name] = self._versions.get(name, 0) + 1
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache:
+    # Keys per statement, below SQLite's bound parameter limit
+    CHUNK_SIZE = 500
+
+    def __init__(self, path, timeout=1.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local() # One connection per thread
+        self._initialized = False
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(self.path, timeout=self.timeout)
+            if not self._initialized:
+                connection.execute('PRAGMA journal_mode=WAL') # Readers never wait for a writer
+                connection.execute('CREATE TABLE IF NOT EXISTS cache_entries '
+                                   '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)')
+                connection.execute('CREATE TABLE IF NOT EXISTS cache_versions '
+                                   '(name TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+                connection.commit()
+                self._initialized = True
+        return connection
+
+    def _select(self, statement, keys, *params):
+        rows = []
+        connection = self._connection()
+        for start in range(0, len(keys), self.CHUNK_SIZE):
+            chunk = keys[start:start + self.CHUNK_SIZE]
+            rows.extend(connection.execute(statement.format(', '.join('?' * len(chunk))), (*chunk, *params)))
+        return rows
+
+    def get_many(self, keys):
+        try:
+            rows = self._select('SELECT key, value FROM cache_entries WHERE key IN ({}) '
+                                'AND (expires IS NULL OR expires > ?)',
+                                list(keys), time.time()) # Wall clock: expiry times are shared between processes
+        except sqlite3.Error:
+            logger.warning('Cache read from %s failed', self.path, exc_info=True)
+            return {}
+        return {key: json.loads(value) for key, value in rows}
+
+    def set_many(self, items, ttl=None):
+        expires = time.time() + ttl if ttl is not None else None
+        rows = [(key, json.dumps(value), expires) for key, value in items.items()]
+        self._write('INSERT OR REPLACE INTO cache_entries (key, value, expires) VALUES (?, ?, ?)', rows)
+
+    def delete_many(self, keys):
+        self._write('DELETE FROM cache_entries WHERE key = ?', [(key,) for key in keys])
+
+    def clear(self):
+        self._write('DELETE FROM cache_entries', [()])
+
+    def versions(self, names):
+        names = list(names)
+        try:
+            rows = self._select('SELECT name, version FROM cache_versions WHERE name IN ({})', names)
+        except sqlite3.Error:
+            logger.warning('Cache read from %s failed', self.path, exc_info=True)
+            return None
+        return {name: 0 for name in names} | dict(rows)
+
+    def bump(self, name):
+        self._write('INSERT INTO cache_versions (name, version) VALUES (?, 1) '
+                    'ON CONFLICT (name) DO UPDATE SET version = version + 1', [(name,)])
+
+    def _write(self, statement, rows):
+        if not rows:
+            return
+        try:
+            connection = self._connection()
+            with connection: # One transaction
+                connection.executemany(statement, rows)
+        except sqlite3.Error:
+            logger.warning('Cache write to %s failed', self.path, exc_info=True)
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisCache:
+    """Keys live under ``prefix`` so the server can be shared; ``clear`` only removes those."""
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='loungecrm:', timeout=1.0):
+        parts = urlsplit(url)
+        self.host = parts.hostname or 'localhost'
+        self.port = parts.port or 6379
+        self.password = unquote(parts.password) if parts.password else None
+        self.db = int(parts.path.lstrip('/') or 0)
+        self.prefix = prefix
+        self.timeout = timeout
+        self._local = threading.local() # One connection per thread
+
+    # --- Protocol (RESP2) ---
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._local.sock, self._local.reader = sock, sock.makefile('rb')
+        if self.password:
+            self._call(('AUTH', self.password))
+        if self.db:
+            self._call(('SELECT', self.db))
+
+    def _disconnect(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            self._local.reader.close()
+            sock.close()
+        self._local.sock = self._local.reader = None
+
+    @staticmethod
+    def _encode(command):
+        parts = [b'*%d\r\n' % len(command)]
+        for arg in command:
+            arg = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(parts)
+
+    def _read_reply(self):
+        line = self._local.reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError('Connection closed by the cache server')
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode('utf-8')
+        if kind == b'-':
+            raise RedisError(rest.decode('utf-8'))
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._local.reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            length = int(rest)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise RedisError(f'Unexpected reply {line!r}')
+
+    def _call(self, *commands):
+        # Pipelined: every command is sent in one write, then the replies are read in order
+        self._local.sock.sendall(b''.join(self._encode(command) for command in commands))
+        replies = [self._read_reply() for _ in commands]
+        return replies[0] if len(commands) == 1 else replies
+
+    def _execute(self, *commands):
+        """Run commands on this thread's connection (reconnecting once); None if the server is unavailable."""
+        for attempt in (1, 2):
+            try:
+                if getattr(self._local, 'sock', None) is None:
+                    self._connect()
+                return self._call(*commands)
+            except (OSError, ConnectionError) as e:
+                self._disconnect()
+                if attempt == 2:
+                    logger.warning('Cache server %s:%s unavailable: %s', self.host, self.port, e)
+            except RedisError:
+                self._disconnect() # Replies of the rest of the pipeline are still unread
+                logger.warning('Cache command failed', exc_info=True)
+                return None
+        return None
+
+    # --- Backend interface ---
+
+    def get_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self._execute(('MGET', *(self.prefix + key for key in keys)))
+        if values is None:
+            return {}
+        return {key: json.loads(value) for key, value in zip(keys, values) if value is not None}
+
+    def set_many(self, items, ttl=None):
+        expiry = ('PX', int(ttl * 1000)) if ttl is not None else ()
+        commands = [('SET', self.prefix + key, json.dumps(value), *expiry) for key, value in items.items()]
+        if commands:
+            self._execute(*commands)
+
+    def delete_many(self, keys):
+        keys = [self.prefix + key for key in keys]
+        if keys:
+            self._execute(('DEL', *keys))
+
+    def clear(self):
+        cursor = b'0'
+        while True:
+            reply = self._execute(('SCAN', cursor, 'MATCH', self.prefix + '*', 'COUNT', 500))
+            if reply is None:
+                return
+            cursor, keys = reply
+            if keys:
+                self._execute(('DEL', *keys))
+            if cursor in (b'0', '0'):
+                return
+
+    def versions(self, names):
+        names = list(names)
+        values = self._execute(('MGET', *(self.prefix + 'version:' + name for name in names)))
+        if values is None:
+            return None
+        return {name: int(value) if value is not None else 0 for name, value in zip(names, values)}
+
+    def bump(self, name):
+        self._execute(('INCR', self.prefix + 'version:' + name))
+
+
+class Cache:
+    """Get-or-compute over a backend, with values keyed on the versions of the tables they read."""
+
+    def __init__(self, backend, default_ttl=DEFAULT_TTL, local_ttl=DEFAULT_LOCAL_TTL):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        # Other workers' writes never bump an in-process backend's versions
+        self.max_ttl = local_ttl if isinstance(backend, LRUCache) else None
+
+    @staticmethod
+    def _version_name(table, lounge_id):
+        return table if lounge_id is None else f'{table}:{lounge_id}'
+
+    def _lookup(self, key, tables, lounge_id):
+        # (versioned key, found, value); the key is None when the backend is unavailable
+        names = [self._version_name(table, lounge_id) for table in tables]
+        versions = self.backend.versions(names) if names else {}
+        if versions is None:
+            return None, False, None
+        versioned_key = '|'.join([key if lounge_id is None else f'{key}:{lounge_id}',
+                                  *(f'{name}={versions[name]}' for name in names)])
+        found = self.backend.get_many([versioned_key])
+        return versioned_key, versioned_key in found, found.get(versioned_key)
+
+    def _store(self, versioned_key, value, ttl):
+        if versioned_key is None:
+            return
+        ttl = self.default_ttl if ttl is None else ttl
+        if self.max_ttl is not None:
+            ttl = min(ttl, self.max_ttl)
+        self.backend.set_many({versioned_key: value}, ttl=ttl)
+
+    def get_or_set(self, key, compute, tables=(), lounge_id=None, ttl=None):
+        """The cached value of ``key``, or ``compute()`` stored under the tables' current versions.
+
+        ``tables`` are the tables the value is computed from, scoped to
+        ``lounge_id`` when given. Values must be JSON serializable.
+        """
+        versioned_key, found, value = self._lookup(key, tables, lounge_id)
+        if not found:
+            value = compute()
+            self._store(versioned_key, value, ttl)
+        return value
+
+    async def get_or_set_async(self, key, compute, tables=(), lounge_id=None, ttl=None):
+        """``get_or_set`` with a coroutine function; the backend calls themselves are short and blocking."""
+        versioned_key, found, value = self._lookup(key, tables, lounge_id)
+        if not found:
+            value = await compute()
+            self._store(versioned_key, value, ttl)
+        return value
+
+    def version(self, table, lounge_id=None):
+        """The current version of ``table`` (scoped to ``lounge_id``), or None when the backend is unavailable."""
+        name = self._version_name(table, lounge_id)
+        versions = self.backend.versions([name])
+        return None if versions is None else versions[name]
+
+    def invalidate(self, *tables, lounge_id=None):
+        """Call after committing a write to ``tables``: values computed from them are recomputed."""
+        for table in tables:
+            self.backend.bump(self._version_name(table, lounge_id))
+
+    def clear(self):
+        self.backend.clear()
+
+
+def make_backend(config):
+    name = config.get('CACHE_BACKEND', 'lru')
+    if name == 'lru':
+        return LRUCache(config.get('CACHE_LRU_SIZE', 10000))
+    if name == 'sqlite':
+        return SQLiteCache(config['CACHE_URL'])
+    if name == 'redis':
+        return RedisCache(config['CACHE_URL'])
+    raise ValueError(f'Unknown CACHE_BACKEND {name!r} (expected "lru", "sqlite" or "redis")')
+
+
+def make_cache(config):
+    return Cache(make_backend(config), default_ttl=config.get('CACHE_DEFAULT_TTL', DEFAULT_TTL),
+                 local_ttl=config.get('CACHE_LRU_TTL', DEFAULT_LOCAL_TTL))
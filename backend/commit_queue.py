@@ -0,0 +1,141 @@
+"""Group commit: coalesce writes from concurrent requests into one transaction.
+
+On SQLite every COMMIT is an fsync, so committing each check-in on its own caps
+throughput at the disk's fsyncs per second. With group commit, request threads
+hand their write to a single writer thread as a job and wait on a future. The
+writer collects every job that arrives within a short window (or until the
+batch is full), runs them in one transaction and commits once.
+
+Durability is unchanged: a future is resolved only after the COMMIT of the
+batch containing its job has returned. A request acknowledged with success is
+on disk exactly as with a per-request commit. Batching only lets several
+requests share one fsync, at the cost of up to one window of extra latency.
+
+A job's ``on_commit`` callback runs in the writer right after the commit and
+before its future resolves, whether or not anyone is still waiting on it. Work
+that must follow every committed write (cache invalidation) goes there, so a
+request that stopped waiting does not skip it.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from backend.database import db_session
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class GroupCommitQueue:
+    def __init__(self, app, window=0.005, max_batch=100):
+        self.app = app
+        self.window = window
+        self.max_batch = max_batch
+        self._jobs = queue.Queue()
+        self.batches_committed = 0
+        self._thread = threading.Thread(target=self._run, name='group-commit-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, job, on_commit=None):
+        """Queue ``job`` (a callable run in the writer thread) and return a Future.
+
+        The job adds its changes to ``db_session`` and returns the value the
+        future resolves to. It must not commit; the writer commits the batch.
+        ``on_commit(result)`` is called in the writer once the job's changes
+        are committed, before the future resolves.
+        """
+        future = Future()
+        self._jobs.put((job, on_commit, future))
+        return future
+
+    def close(self):
+        self._jobs.put(_STOP)
+        self._thread.join()
+
+    def _collect(self, first):
+        # Wait up to `window` after the first job for more to arrive
+        batch = [first]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._jobs.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._jobs.put(_STOP) # Finish this batch, stop on the next loop
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._jobs.get()
+            if first is _STOP:
+                return
+            batch = self._collect(first)
+            # A fresh app context (and so a fresh session) per batch
+            with self.app.app_context():
+                self._commit_batch(batch)
+
+    def _commit_batch(self, batch):
+        try:
+            results = [job() for job, _, _ in batch]
+            db_session.commit()
+            self.batches_committed += 1
+        except Exception:
+            db_session.rollback()
+            # One bad job must not fail the others: retry each in its own transaction
+            for job, on_commit, future in batch:
+                self._commit_one(job, on_commit, future)
+            return
+        for (_, on_commit, future), result in zip(batch, results):
+            self._committed(on_commit, future, result)
+
+    def _commit_one(self, job, on_commit, future):
+        try:
+            result = job()
+            db_session.commit()
+        except Exception as e:
+            db_session.rollback()
+            future.set_exception(e)
+        else:
+            self._committed(on_commit, future, result)
+
+    def _committed(self, on_commit, future, result):
+        if on_commit is not None:
+            try:
+                on_commit(result)
+            except Exception:
+                # The write is committed: report it as such, whatever the callback did
+                logger.exception('on_commit callback of a committed job failed')
+        future.set_result(result)
+
+
+_create_lock = threading.Lock()
+
+
+def get_queue(app, name):
+    """The app's queue called ``name``, started on first use.
+
+    Window and batch size come from ``<NAME>_WINDOW_MS`` and ``<NAME>_MAX_BATCH``
+    in the app config.
+    """
+    key = f'group_commit.{name}'
+    commit_queue = app.extensions.get(key)
+    if commit_queue is None:
+        with _create_lock:
+            commit_queue = app.extensions.get(key)
+            if commit_queue is None:
+                prefix = name.upper()
+                commit_queue = app.extensions[key] = GroupCommitQueue(
+                    app,
+                    window=app.config.get(f'{prefix}_WINDOW_MS', 5) / 1000,
+                    max_batch=app.config.get(f'{prefix}_MAX_BATCH', 100),
+                )
+    return commit_queue
@@ -0,0 +1,130 @@
+"""Response compression (brotli or gzip) for JSON and text responses.
+
+Passenger history and reservation listings run to hundreds of KB of JSON that
+every desk terminal fetches repeatedly; JSON compresses 5-10x. The after-request
+hook compresses a response when:
+
+- the client accepts ``br`` or ``gzip`` (brotli is preferred when the optional
+  ``brotli`` package is installed),
+- its mimetype is in ``COMPRESS_MIMETYPES``,
+- the body is at least ``COMPRESS_MIN_SIZE`` bytes (below that the headers and
+  CPU cost more than they save), and
+- the view is not decorated with ``@no_compression``.
+
+Streamed responses (a generator body) are compressed chunk by chunk, flushing
+after each chunk so the client still receives data as it is produced; the size
+threshold does not apply to them since their size is not known up front.
+"""
+import zlib
+from functools import wraps
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError: # Optional dependency, see requirements.txt
+    brotli = None
+
+DEFAULT_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/plain', 'text/html', 'text/css', 'text/csv',
+                     'application/javascript')
+
+
+def no_compression(view):
+    """Opt a view out of response compression (e.g. already compressed payloads)."""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        return view(*args, **kwargs)
+    wrapped.no_compression = True
+    return wrapped
+
+
+def available_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encoding):
+    """Pick the best encoding we support from an Accept-Encoding header, or None."""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    wildcard = accepted.get('*', 0.0)
+    for encoding in available_encodings():
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding, gzip_level=6, brotli_quality=5):
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31) # wbits 31: gzip container
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(chunks, encoding, gzip_level=6, brotli_quality=5):
+    """Compress an iterable of byte chunks, flushing after each so none is held back."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=brotli_quality)
+        for chunk in chunks:
+            if chunk:
+                yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            if chunk:
+                yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+def _view_opted_out():
+    view = current_app.view_functions.get(request.endpoint) if request.endpoint else None
+    return getattr(view, 'no_compression', False)
+
+
+def compress_response(response):
+    config = current_app.config
+    if not config.get('COMPRESS_ENABLED', True):
+        return response
+    if response.mimetype not in config.get('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES):
+        return response
+    if response.status_code < 200 or response.status_code in (204, 304) or 'Content-Encoding' in response.headers:
+        return response
+    if request.method == 'HEAD' or _view_opted_out():
+        return response
+
+    # The body depends on Accept-Encoding from here on, so caches must key on it
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    if encoding is None:
+        return response
+
+    options = {
+        'gzip_level': config.get('COMPRESS_GZIP_LEVEL', 6),
+        'brotli_quality': config.get('COMPRESS_BROTLI_QUALITY', 5),
+    }
+    if response.is_streamed:
+        body = response.response
+        if hasattr(body, 'close'):
+            response.call_on_close(body.close) # Werkzeug would only close our wrapper
+        response.response = compress_stream(response.iter_encoded(), encoding, **options)
+        response.direct_passthrough = False
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config.get('COMPRESS_MIN_SIZE', 1024):
+            return response
+        response.set_data(compress(data, encoding, **options))
+    response.headers['Content-Encoding'] = encoding
+    return response
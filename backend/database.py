@@ -1,17 +1,63 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import scoped_session, sessionmaker
+import os
+from flask import current_app
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import scoped_session, sessionmaker, Session
+from sqlalchemy.pool import StaticPool
 from sqlalchemy.ext.declarative import declarative_base
 
-engine = create_engine('sqlite:///lounge.db')
-db_session = scoped_session(sessionmaker(autocommit=False,
-                                         autoflush=False,
-                                         bind=engine))
+# Default database, overridable (e.g. for a benchmark or staging copy) without code changes
+DATABASE_URL = os.environ.get('LOUNGE_DATABASE_URL', 'sqlite:///lounge.db')
+
+
+def make_engine(url):
+    if url in ('sqlite://', 'sqlite:///:memory:'):
+        # Every new connection to :memory: is a new, empty database, so all
+        # sessions (and threads) of the app have to share a single connection
+        return create_engine(url, connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    return create_engine(url)
+
+
+def get_engine():
+    """The engine of the app handling the current request / app context."""
+    return current_app.extensions['sqlalchemy_engine']
+
+
+class AppSession(Session):
+    # Engines belong to apps (see create_app), so an unbound session resolves
+    # its engine from the current app instead of a module-level global
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.bind is None:
+            return get_engine()
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+
+db_session = scoped_session(sessionmaker(class_=AppSession,
+                                         autocommit=False,
+                                         autoflush=False))
 Base = declarative_base()
 Base.query = db_session.query_property()
 
-def init_db():
+def init_db(engine=None, log=None):
+    """Create a new database from the models, or bring an existing one up to date.
+
+    Only a database without any tables is created straight from the models and
+    recorded as at the latest revision. Any other database goes through the
+    pending revisions (backend/migrations), so its rows are migrated rather than
+    marked as migrated.
+    """
     # import all modules here that might define models so that
     # they will be registered properly on the metadata.  Otherwise
     # you will have to import them first before calling init_db()
     import backend.models
-    Base.metadata.create_all(bind=engine)
+    from backend.tenancy import ensure_default_lounge
+    from backend.migrations import stamp, upgrade
+    engine = engine or get_engine()
+    if inspect(engine).get_table_names():
+        upgrade(engine, log=log)
+    else:
+        # The tables and their record as up to date are committed together
+        with engine.begin() as connection:
+            Base.metadata.create_all(bind=connection)
+            stamp(connection)
+    with engine.begin() as connection:
+        ensure_default_lounge(connection)
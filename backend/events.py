@@ -0,0 +1,329 @@
+"""Append-only event log of check-ins, exits and reservation status changes.
+
+Every write that changes a lounge entry or a reservation's status also adds a
+row to ``events`` in the same transaction (``record_event``), so the log holds
+exactly the committed changes: a rolled-back check-in leaves no event, and a
+committed one cannot be missing from it. Events are never updated or deleted.
+
+- ``check_in``: ``entity_id`` is the lounge entry, ``occurred_at`` its entry time,
+  ``data`` ``{"flight_number": ...}``.
+- ``exit``: ``occurred_at`` is the exit time, ``data`` ``{"stay_seconds": ...}``.
+- ``reservation_status``: ``entity_id`` is the reservation, ``data``
+  ``{"from": ..., "to": ...}`` (``from`` is null when it was created).
+
+Consumers read the log in ``id`` order and resume after the last id they saw,
+either from ``GET /events?after=<id>`` or from NDJSON segment files written by
+``flask events export``. One event per line, timestamps as epoch milliseconds::
+
+    {"id":7,"lounge_id":1,"type":"exit","entity_id":3,"passenger_id":2,"occurred_at":1704106800000,"data":{"stay_seconds":3600}}
+
+Segments are named after the first and last id they hold and are written to a
+temporary name first, so a reader listing the directory only ever sees
+complete segments. On PostgreSQL a transaction can commit after another one
+that took a later id; events recorded in the last ``EVENTS_SETTLE_SECONDS``
+are held back from readers so a cursor never skips past one still in flight.
+
+Replaying the log (``Replay``) rebuilds the passenger visit aggregates and the
+lounge usage report's per-day counts without reading the live tables
+(``flask events replay``). History written before the log existed, and rows
+written by ``flask seed``, are logged in id order rather than time order.
+"""
+import json
+import os
+from collections import Counter
+from datetime import timedelta
+
+from sqlalchemy import func, insert, select
+
+from backend.aggregates import DEFAULT_CHUNK_SIZE, write_passenger_aggregates
+from backend.database import db_session
+from backend.models import Event, Lounge, LoungeEntry, Passenger, Reservation
+from backend.queries import InvalidParameter
+from backend.timestamps import (
+    DEFAULT_TIMEZONE, LOCAL_DAY_BUCKET_MS, epoch_ms, from_epoch_ms, get_timezone,
+    local_date_of_bucket, local_today, utc_now,
+)
+
+EVENT_TYPES = ('check_in', 'exit', 'reservation_status')
+DEFAULT_SEGMENT_SIZE = 100000
+TAIL_LIMIT = 1000
+MAX_TAIL_LIMIT = 10000
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+SEGMENT_PREFIX = 'events-'
+SEGMENT_SUFFIX = '.ndjson'
+
+
+def _encode_data(data):
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False) if data else None
+
+
+def record_event(type, lounge_id, entity_id, occurred_at, passenger_id=None, data=None):
+    """Add an event to the current session; it is written by the caller's commit, or not at all."""
+    db_session.add(Event(
+        type=type, lounge_id=lounge_id, entity_id=entity_id, passenger_id=passenger_id,
+        occurred_at=occurred_at, data=_encode_data(data),
+    ))
+
+
+def status_events(changes, new_status, occurred_at):
+    """Event rows (for a Core executemany insert) of reservations moved to ``new_status``;
+    ``changes`` are (reservation id, lounge id, previous status or None) triples."""
+    return [{
+        'type': 'reservation_status', 'lounge_id': lounge_id, 'entity_id': reservation_id,
+        'occurred_at': occurred_at, 'recorded_at': occurred_at,
+        'data': _encode_data({'from': previous, 'to': new_status}),
+    } for reservation_id, lounge_id, previous in changes]
+
+
+# --- Reading the log ---
+
+def _columns():
+    return (Event.id, Event.lounge_id, Event.type, Event.entity_id, Event.passenger_id, Event.occurred_at, Event.data)
+
+
+def events_statement(after_id, limit, lounge_id=None, settle_seconds=0):
+    """Up to ``limit`` events after ``after_id`` in log order, stopping before any recorded in the
+    last ``settle_seconds`` (one statement)."""
+    scope = [Event.id > after_id]
+    if lounge_id is not None:
+        scope.append(Event.lounge_id == lounge_id) # Leading column of ix_events_lounge_id_id
+    query = select(*_columns()).where(*scope)
+    if settle_seconds:
+        unsettled = select(func.min(Event.id)).where(
+            *scope, Event.recorded_at > utc_now() - timedelta(seconds=settle_seconds)).scalar_subquery()
+        query = query.where(Event.id < func.coalesce(unsettled, after_id + 2**62))
+    return query.order_by(Event.id).limit(limit)
+
+
+def tail_params(args):
+    """(after id, limit) from the query string. Raises InvalidParameter."""
+    try:
+        after = int(args.get('after', 0))
+        limit = int(args.get('limit', TAIL_LIMIT))
+    except ValueError:
+        raise InvalidParameter('Invalid after or limit. Use whole numbers.')
+    if after < 0:
+        raise InvalidParameter('after must not be negative.')
+    if not 1 <= limit <= MAX_TAIL_LIMIT:
+        raise InvalidParameter(f'limit must be between 1 and {MAX_TAIL_LIMIT}.')
+    return after, limit
+
+
+def event_line(row):
+    """One NDJSON line (bytes); ``data`` is copied as stored, already compact JSON."""
+    return b'{"id":%d,"lounge_id":%d,"type":"%s","entity_id":%d,"passenger_id":%s,"occurred_at":%d,"data":%s}\n' % (
+        row.id, row.lounge_id, row.type.encode(), row.entity_id,
+        b'null' if row.passenger_id is None else b'%d' % row.passenger_id,
+        epoch_ms(row.occurred_at), (row.data or 'null').encode('utf-8'),
+    )
+
+
+def _event_dict(row):
+    return {
+        'id': row.id, 'lounge_id': row.lounge_id, 'type': row.type, 'entity_id': row.entity_id,
+        'passenger_id': row.passenger_id, 'occurred_at': epoch_ms(row.occurred_at),
+        'data': json.loads(row.data) if row.data else None,
+    }
+
+
+def iter_events(connection, after_id=0, batch_size=DEFAULT_CHUNK_SIZE):
+    """Every event after ``after_id`` from the table, as the dicts segment lines decode to."""
+    while True:
+        rows = connection.execute(events_statement(after_id, batch_size)).all()
+        for row in rows:
+            yield _event_dict(row)
+        if len(rows) < batch_size:
+            return
+        after_id = rows[-1].id
+
+
+# --- Segment files ---
+
+def segment_name(first_id, last_id):
+    return f'{SEGMENT_PREFIX}{first_id:012d}-{last_id:012d}{SEGMENT_SUFFIX}'
+
+
+def segments(directory, after_id=0):
+    """(first id, last id, path) of the segments in ``directory`` holding events after ``after_id``, in order."""
+    found = []
+    for name in os.listdir(directory):
+        if not (name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)):
+            continue # Other files, and segments still being written (.tmp)
+        first_id, last_id = map(int, name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)].split('-'))
+        if last_id > after_id:
+            found.append((first_id, last_id, os.path.join(directory, name)))
+    return sorted(found)
+
+
+def last_exported_id(directory):
+    found = segments(directory)
+    return found[-1][1] if found else 0
+
+
+def export_segments(connection, directory, segment_size=DEFAULT_SEGMENT_SIZE, settle_seconds=0):
+    """Write the events not exported to ``directory`` yet as new segments of up to ``segment_size``
+    events. Returns (segments written, events written)."""
+    os.makedirs(directory, exist_ok=True)
+    after_id = last_exported_id(directory)
+    written = exported = 0
+    while True:
+        rows = connection.execute(events_statement(after_id, segment_size, settle_seconds=settle_seconds)).all()
+        if not rows:
+            break
+        path = os.path.join(directory, segment_name(rows[0].id, rows[-1].id))
+        with open(path + '.tmp', 'wb') as f:
+            f.writelines(event_line(row) for row in rows)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        written += 1
+        exported += len(rows)
+        after_id = rows[-1].id
+        if len(rows) < segment_size:
+            break
+    return written, exported
+
+
+def read_segments(directory, after_id=0):
+    """Every event after ``after_id`` in the segments of ``directory``, in log order."""
+    for _, _, path in segments(directory, after_id):
+        with open(path, 'rb') as f:
+            for line in f:
+                event = json.loads(line)
+                if event['id'] > after_id:
+                    yield event
+
+
+# --- Bulk-written rows ---
+
+def _insert_chunked(connection, rows, chunk_size):
+    for start in range(0, len(rows), chunk_size):
+        with connection.begin():
+            connection.execute(insert(Event), rows[start:start + chunk_size])
+
+
+def log_entries(connection, first_id, last_id, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Log the check-ins and exits of lounge entries written in bulk (ids ``first_id`` to ``last_id``).
+
+    Returns the events written. Each chunk logs its check-ins before its exits.
+    """
+    recorded_at = utc_now()
+    statement = select(
+        LoungeEntry.id, LoungeEntry.lounge_id, LoungeEntry.passenger_id, LoungeEntry.entry_time,
+        LoungeEntry.exit_time, LoungeEntry.stay_seconds, Passenger.flight_number
+    ).join(Passenger, LoungeEntry.passenger_id == Passenger.id)\
+    .where(LoungeEntry.id.between(first_id, last_id)).order_by(LoungeEntry.id)
+    written = 0
+    while True:
+        rows = connection.execute(statement.where(LoungeEntry.id >= first_id).limit(chunk_size)).all()
+        if not rows:
+            return written
+        events = [{
+            'type': 'check_in', 'lounge_id': row.lounge_id, 'entity_id': row.id, 'passenger_id': row.passenger_id,
+            'occurred_at': row.entry_time, 'recorded_at': recorded_at,
+            'data': _encode_data({'flight_number': row.flight_number}),
+        } for row in rows]
+        events.extend({
+            'type': 'exit', 'lounge_id': row.lounge_id, 'entity_id': row.id, 'passenger_id': row.passenger_id,
+            'occurred_at': row.exit_time, 'recorded_at': recorded_at,
+            'data': _encode_data({'stay_seconds': row.stay_seconds}),
+        } for row in rows if row.exit_time is not None)
+        _insert_chunked(connection, events, chunk_size)
+        written += len(events)
+        first_id = rows[-1].id + 1
+
+
+def log_reservations(connection, first_id, last_id, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Log the current status of reservations written in bulk as their creation; returns the events written."""
+    recorded_at = utc_now()
+    rows = connection.execute(
+        select(Reservation.id, Reservation.lounge_id, Reservation.status)
+        .where(Reservation.id.between(first_id, last_id)).order_by(Reservation.id)).all()
+    _insert_chunked(connection, [{
+        'type': 'reservation_status', 'lounge_id': row.lounge_id, 'entity_id': row.id,
+        'occurred_at': recorded_at, 'recorded_at': recorded_at,
+        'data': _encode_data({'from': None, 'to': row.status}),
+    } for row in rows], chunk_size)
+    return len(rows)
+
+
+# --- Replay ---
+
+class Replay:
+    """State rebuilt by applying the log from its first event, in order."""
+
+    def __init__(self):
+        self.entries = {} # Entry id -> [lounge id, passenger id, entry time (epoch ms), stay seconds]
+        self.reservations = {} # Reservation id -> (lounge id, status)
+        self.last_id = 0
+        self.count = 0
+
+    def apply(self, event):
+        kind = event['type']
+        if kind == 'check_in':
+            self.entries[event['entity_id']] = [event['lounge_id'], event['passenger_id'], event['occurred_at'], None]
+        elif kind == 'exit':
+            entry = self.entries.get(event['entity_id'])
+            if entry is not None:
+                entry[3] = event['data']['stay_seconds']
+        elif kind == 'reservation_status':
+            self.reservations[event['entity_id']] = (event['lounge_id'], event['data']['to'])
+        self.last_id = event['id']
+        self.count += 1
+
+    def lounge_ids(self):
+        return {entry[0] for entry in self.entries.values()}
+
+    def passenger_aggregates(self):
+        """Visit aggregates of every passenger with an entry, shaped for write_passenger_aggregates."""
+        totals = {}
+        for _, passenger_id, entry_ms, seconds in self.entries.values():
+            aggregate = totals.get(passenger_id)
+            if aggregate is None:
+                aggregate = totals[passenger_id] = [0, 0, entry_ms, entry_ms]
+            aggregate[0] += 1
+            aggregate[1] += seconds or 0
+            aggregate[2] = min(aggregate[2], entry_ms)
+            aggregate[3] = max(aggregate[3], entry_ms)
+        return [{
+            'passenger_id': passenger_id, 'visit_count': visits, 'total_stay_seconds': total,
+            'first_visit_at': from_epoch_ms(first), 'last_visit_at': from_epoch_ms(last),
+        } for passenger_id, (visits, total, first, last) in totals.items()]
+
+    def usage_counts(self, lounge_id, timezone):
+        """{local date: entries} of the lounge, like queries.lounge_usage_counts."""
+        buckets = Counter(
+            entry_ms // LOCAL_DAY_BUCKET_MS for lounge, _, entry_ms, _ in self.entries.values() if lounge == lounge_id)
+        counts = Counter()
+        for bucket, count in buckets.items():
+            counts[local_date_of_bucket(bucket, timezone)] += count
+        return counts
+
+
+def replay_events(connection, events, report_cache=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Replay the whole log (``events``, from its first event) and rebuild what derives from it.
+
+    Rewrites every passenger's visit aggregates and, given a report cache,
+    stores the usage count of every closed day of each lounge. Returns the
+    Replay and the number of days stored.
+    """
+    replay = Replay()
+    for event in events:
+        replay.apply(event)
+    if not replay.count:
+        return replay, 0 # Nothing to rebuild from; keep what is there
+    write_passenger_aggregates(connection, replay.passenger_aggregates(), chunk_size)
+
+    days = 0
+    if report_cache is not None:
+        timezones = dict(connection.execute(select(Lounge.id, Lounge.timezone)).all())
+        for lounge_id in replay.lounge_ids():
+            timezone = get_timezone(timezones.get(lounge_id, DEFAULT_TIMEZONE))
+            yesterday = local_today(timezone) - timedelta(days=1)
+            counts = {day: count for day, count in replay.usage_counts(lounge_id, timezone).items() if day <= yesterday}
+            if counts:
+                first = min(counts)
+                report_cache.store(lounge_id, timezone, first, yesterday, counts, report_cache.version(lounge_id))
+                days += (yesterday - first).days + 1
+    return replay, days
@@ -0,0 +1,86 @@
+"""In-process request and database metrics, rendered in Prometheus text format.
+
+The hooks that feed this registry live in ``backend/app.py`` and each app gets
+its own registry (``app.extensions['metrics']``); this module only keeps the
+numbers. Values are per process, so under a multi-worker server each worker
+reports its own series.
+"""
+import threading
+
+# Upper bounds (seconds) of the request duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(**labels):
+    return ','.join(f'{key}="{value}"' for key, value in labels.items())
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {} # (endpoint, method, status) -> count
+        self.endpoints = {} # endpoint -> per-endpoint duration and db aggregates
+
+    def observe_request(self, endpoint, method, status, duration, query_count, db_time):
+        with self._lock:
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = {
+                    'buckets': [0] * len(DURATION_BUCKETS),
+                    'count': 0,
+                    'duration_sum': 0.0,
+                    'queries': 0,
+                    'db_time': 0.0,
+                }
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    stats['buckets'][i] += 1
+            stats['count'] += 1
+            stats['duration_sum'] += duration
+            stats['queries'] += query_count
+            stats['db_time'] += db_time
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+            self.endpoints.clear()
+
+    def render(self):
+        with self._lock:
+            lines = [
+                '# HELP lounge_http_requests_total HTTP requests handled.',
+                '# TYPE lounge_http_requests_total counter',
+            ]
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'lounge_http_requests_total{{{_labels(endpoint=endpoint, method=method, status=status)}}} {count}')
+
+            lines += [
+                '# HELP lounge_http_request_duration_seconds Time spent handling HTTP requests.',
+                '# TYPE lounge_http_request_duration_seconds histogram',
+            ]
+            for endpoint, stats in sorted(self.endpoints.items()):
+                for bound, count in zip(DURATION_BUCKETS, stats['buckets']):
+                    lines.append(f'lounge_http_request_duration_seconds_bucket{{{_labels(endpoint=endpoint, le=bound)}}} {count}')
+                lines.append(f'lounge_http_request_duration_seconds_bucket{{{_labels(endpoint=endpoint, le="+Inf")}}} {stats["count"]}')
+                lines.append(f'lounge_http_request_duration_seconds_sum{{{_labels(endpoint=endpoint)}}} {stats["duration_sum"]:.6f}')
+                lines.append(f'lounge_http_request_duration_seconds_count{{{_labels(endpoint=endpoint)}}} {stats["count"]}')
+
+            lines += [
+                '# HELP lounge_db_queries_total SQL statements executed while handling requests.',
+                '# TYPE lounge_db_queries_total counter',
+            ]
+            for endpoint, stats in sorted(self.endpoints.items()):
+                lines.append(f'lounge_db_queries_total{{{_labels(endpoint=endpoint)}}} {stats["queries"]}')
+
+            lines += [
+                '# HELP lounge_db_duration_seconds_total Time spent executing SQL while handling requests.',
+                '# TYPE lounge_db_duration_seconds_total counter',
+            ]
+            for endpoint, stats in sorted(self.endpoints.items()):
+                lines.append(f'lounge_db_duration_seconds_total{{{_labels(endpoint=endpoint)}}} {stats["db_time"]:.6f}')
+
+        return '\n'.join(lines) + '\n'
+
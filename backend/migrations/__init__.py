@@ -0,0 +1,227 @@
+"""Versioned schema migrations.
+
+``init_db`` creates a new, empty database straight from the models (and records
+it as up to date). A database that already has tables is brought forward with
+revisions instead, never just recorded as up to date:
+
+    flask db upgrade     # apply pending revisions
+    flask db current     # the latest applied revision
+    flask db history     # every revision, applied or pending
+
+Revisions are modules in ``backend/migrations/versions/`` named
+``NNNN_description.py``, defining ``revision``, ``description`` and
+``upgrade(ctx)``. They describe tables with their own lightweight ``Table`` /
+``table()`` objects rather than the models, so an old revision keeps meaning
+what it meant when it was written. Applied revisions are recorded in
+``schema_migrations``.
+
+The database stays online while a revision runs, except where the revision's
+docstring says the app must be stopped (0005, which changes how timestamps are
+stored). Every ``MigrationContext`` operation is idempotent and commits on its own, instead of holding one
+transaction (and SQLite's write lock) for the whole revision; an interrupted
+revision is simply run again.
+
+- ``create_index`` uses ``CREATE INDEX CONCURRENTLY`` on PostgreSQL, so writes
+  continue during the build. SQLite has no online build: writers wait for that
+  one statement, not for the rest of the revision.
+- ``backfill`` walks a table in primary key order, ``batch_size`` rows per
+  transaction, sleeping ``pause`` seconds between batches so check-ins get the
+  write lock in between. The last key done is committed with each batch and
+  an interrupted backfill resumes after it.
+"""
+import datetime
+import importlib
+import pkgutil
+import time
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, delete, inspect, insert, select
+from sqlalchemy.schema import CreateColumn
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_PAUSE = 0.05 # Seconds between backfill batches
+
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    'schema_migrations', migration_metadata,
+    Column('revision', String(32), primary_key=True),
+    Column('description', String(200)),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+# Last primary key done by each unfinished backfill (the row goes when it completes)
+migration_progress = Table(
+    'schema_migration_progress', migration_metadata,
+    Column('revision', String(32), primary_key=True),
+    Column('step', String(100), primary_key=True),
+    Column('last_key', Integer, nullable=False),
+)
+
+
+def load_revisions():
+    """Revision modules in order."""
+    from backend.migrations import versions
+    modules = [
+        importlib.import_module(f'{versions.__name__}.{info.name}')
+        for info in pkgutil.iter_modules(versions.__path__)
+    ]
+    return sorted(modules, key=lambda module: module.revision)
+
+
+def head_revision():
+    revisions = load_revisions()
+    return revisions[-1].revision if revisions else None
+
+
+def _applied(connection):
+    migration_metadata.create_all(connection)
+    return set(connection.execute(select(schema_migrations.c.revision)).scalars())
+
+
+def applied_revisions(engine):
+    with engine.begin() as connection:
+        return _applied(connection)
+
+
+def current_revision(engine):
+    applied = applied_revisions(engine)
+    return max(applied) if applied else None
+
+
+def _record(connection, module):
+    connection.execute(insert(schema_migrations).values(
+        revision=module.revision, description=module.description, applied_at=datetime.datetime.utcnow()))
+
+
+def upgrade(engine, target=None, batch_size=DEFAULT_BATCH_SIZE, pause=DEFAULT_PAUSE, log=None):
+    """Apply pending revisions up to ``target`` (all by default); returns the revisions applied."""
+    applied = applied_revisions(engine)
+    done = []
+    for module in load_revisions():
+        if target is not None and module.revision > target:
+            break
+        if module.revision in applied:
+            continue
+        if log:
+            log(f'Applying {module.revision}: {module.description}')
+        module.upgrade(MigrationContext(engine, module.revision, batch_size=batch_size, pause=pause, log=log))
+        with engine.begin() as connection:
+            _record(connection, module)
+        done.append(module.revision)
+    return done
+
+
+def pending_revisions(engine):
+    """Revisions not applied yet, in order."""
+    applied = applied_revisions(engine)
+    return [module.revision for module in load_revisions() if module.revision not in applied]
+
+
+def stamp(connection):
+    """Record every revision as applied without running it, in the transaction
+    that just created the schema from the models (see init_db)."""
+    applied = _applied(connection)
+    for module in load_revisions():
+        if module.revision not in applied:
+            _record(connection, module)
+
+
+class MigrationContext:
+    """Idempotent schema operations for a revision, each committed on its own."""
+
+    def __init__(self, engine, revision, batch_size=DEFAULT_BATCH_SIZE, pause=DEFAULT_PAUSE, log=None):
+        self.engine = engine
+        self.revision = revision
+        self.batch_size = batch_size
+        self.pause = pause
+        self.log = log
+        self.quote = engine.dialect.identifier_preparer.quote
+
+    def begin(self):
+        """A short transaction for a revision's own statements."""
+        return self.engine.begin()
+
+    def has_table(self, table_name):
+        return inspect(self.engine).has_table(table_name)
+
+    def has_column(self, table_name, column_name):
+        return any(column['name'] == column_name for column in inspect(self.engine).get_columns(table_name))
+
+    def has_index(self, table_name, index_name):
+        return any(index['name'] == index_name for index in inspect(self.engine).get_indexes(table_name))
+
+    def create_table(self, table):
+        with self.begin() as connection:
+            table.create(connection, checkfirst=True)
+
+    def add_column(self, table_name, column):
+        if self.has_column(table_name, column.name):
+            return
+        Table(table_name, MetaData(), column) # CreateColumn needs the column attached to a table
+        column_ddl = CreateColumn(column).compile(dialect=self.engine.dialect)
+        with self.begin() as connection:
+            connection.exec_driver_sql(f'ALTER TABLE {self.quote(table_name)} ADD COLUMN {column_ddl}')
+
+    def create_index(self, index_name, table_name, columns, unique=False):
+        if self.has_index(table_name, index_name):
+            return
+        concurrently = self.engine.dialect.name == 'postgresql'
+        ddl = 'CREATE {}INDEX {}{} ON {} ({})'.format(
+            'UNIQUE ' if unique else '', 'CONCURRENTLY ' if concurrently else '',
+            self.quote(index_name), self.quote(table_name), ', '.join(self.quote(column) for column in columns)
+        )
+        if concurrently:
+            # CONCURRENTLY cannot run inside a transaction block
+            with self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                connection.exec_driver_sql(ddl)
+        else:
+            with self.begin() as connection:
+                connection.exec_driver_sql(ddl)
+
+    def drop_index(self, table_name, index_name):
+        if not self.has_index(table_name, index_name):
+            return
+        with self.begin() as connection:
+            connection.exec_driver_sql(f'DROP INDEX {self.quote(index_name)}')
+
+    def _progress(self, step):
+        with self.engine.connect() as connection:
+            return connection.execute(select(migration_progress.c.last_key).where(
+                migration_progress.c.revision == self.revision, migration_progress.c.step == step)).scalar()
+
+    def _save_progress(self, connection, step, last_key):
+        connection.execute(delete(migration_progress).where(
+            migration_progress.c.revision == self.revision, migration_progress.c.step == step))
+        if last_key is not None:
+            connection.execute(insert(migration_progress).values(revision=self.revision, step=step, last_key=last_key))
+
+    def backfill(self, step, key, apply, batch_size=None):
+        """Call ``apply(connection, first_key, last_key)`` over ``key``'s table in batches.
+
+        ``key`` is the table's integer primary key column. Each batch is one
+        transaction that also records its last key, so a backfill that stops
+        part way resumes after the last committed batch. Returns the rows visited.
+        """
+        batch_size = batch_size or self.batch_size
+        last_key = self._progress(step)
+        visited = 0
+        while True:
+            keys = select(key).order_by(key).limit(batch_size)
+            if last_key is not None:
+                keys = keys.where(key > last_key)
+            with self.engine.connect() as connection:
+                batch = connection.execute(keys).scalars().all()
+            if not batch:
+                break
+            with self.begin() as connection:
+                apply(connection, batch[0], batch[-1])
+                self._save_progress(connection, step, batch[-1])
+            last_key = batch[-1]
+            visited += len(batch)
+            if self.pause:
+                time.sleep(self.pause) # Let writers in between batches
+        with self.begin() as connection:
+            self._save_progress(connection, step, None)
+        if self.log:
+            self.log(f'  {step}: {visited} rows')
+        return visited
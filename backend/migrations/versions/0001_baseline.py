@@ -0,0 +1,55 @@
+"""The schema as first released: users, passengers, lounge entries, reservations, settings."""
+from sqlalchemy import Column, Date, DateTime, ForeignKey, Integer, MetaData, String, Table, Time
+
+revision = '0001'
+description = 'Baseline schema'
+
+metadata = MetaData()
+
+TABLES = [
+    Table(
+        'users', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('username', String(50), unique=True, nullable=False),
+        Column('password_hash', String(128), nullable=False),
+        Column('role', String(50)),
+    ),
+    Table(
+        'passengers', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('name', String(100), nullable=False),
+        Column('flight_number', String(50)),
+    ),
+    Table(
+        'lounge_entries', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('passenger_id', Integer, ForeignKey('passengers.id'), nullable=False),
+        Column('entry_time', DateTime, nullable=False),
+        Column('exit_time', DateTime),
+        Column('status', String(50)),
+    ),
+    Table(
+        'reservations', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('passenger_name', String(100), nullable=False),
+        Column('flight_number', String(50)),
+        Column('reservation_date', Date, nullable=False),
+        Column('reservation_time', Time, nullable=False),
+        Column('number_of_guests', Integer),
+        Column('status', String(50)),
+    ),
+    Table(
+        'lounge_settings', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('lounge_name', String(100)),
+        Column('lounge_address', String(200)),
+        Column('lounge_capacity', Integer),
+        Column('entry_tracking_method', String(50)),
+    ),
+]
+
+
+def upgrade(ctx):
+    # Databases created before migrations already have these; a new one gets them here
+    for table in TABLES:
+        ctx.create_table(table)
@@ -0,0 +1,7 @@
+"""Index for a passenger's history in entry order (detail page, keyset paging)."""
+revision = '0002'
+description = 'Index lounge_entries on (passenger_id, entry_time)'
+
+
+def upgrade(ctx):
+    ctx.create_index('ix_lounge_entries_passenger_entry_time', 'lounge_entries', ['passenger_id', 'entry_time'])
@@ -0,0 +1,56 @@
+"""Per-passenger visit aggregates (see backend/aggregates.py), backfilled from lounge_entries."""
+from sqlalchemy import Column, DateTime, Integer, bindparam, select, update
+from sqlalchemy.sql import column, table
+
+from backend.aggregates import stay_seconds
+
+revision = '0003'
+description = 'Add passenger visit aggregates'
+
+passengers = table(
+    'passengers', column('id', Integer), column('visit_count', Integer), column('total_stay_seconds', Integer),
+    column('first_visit_at', DateTime), column('last_visit_at', DateTime),
+)
+lounge_entries = table(
+    'lounge_entries', column('passenger_id', Integer), column('entry_time', DateTime), column('exit_time', DateTime),
+)
+
+
+def upgrade(ctx):
+    ctx.add_column('passengers', Column('visit_count', Integer, nullable=False, server_default='0'))
+    ctx.add_column('passengers', Column('total_stay_seconds', Integer, nullable=False, server_default='0'))
+    ctx.add_column('passengers', Column('first_visit_at', DateTime))
+    ctx.add_column('passengers', Column('last_visit_at', DateTime))
+    ctx.backfill('passenger_aggregates', passengers.c.id, recompute_aggregates)
+
+
+def recompute_aggregates(connection, first_id, last_id):
+    # One batch of passengers; their entries come off ix_lounge_entries_passenger_entry_time (0002)
+    in_batch = passengers.c.id.between(first_id, last_id)
+    totals = {}
+    entries = connection.execute(
+        select(lounge_entries.c.passenger_id, lounge_entries.c.entry_time, lounge_entries.c.exit_time)
+        .where(lounge_entries.c.passenger_id.between(first_id, last_id)))
+    for passenger_id, entry_time, exit_time in entries:
+        aggregate = totals.setdefault(passenger_id, {
+            'passenger_id': passenger_id, 'visit_count': 0, 'total_stay_seconds': 0,
+            'first_visit_at': entry_time, 'last_visit_at': entry_time,
+        })
+        aggregate['visit_count'] += 1
+        if exit_time is not None:
+            aggregate['total_stay_seconds'] += stay_seconds(entry_time, exit_time)
+        aggregate['first_visit_at'] = min(aggregate['first_visit_at'], entry_time)
+        aggregate['last_visit_at'] = max(aggregate['last_visit_at'], entry_time)
+
+    connection.execute(update(passengers).where(in_batch).values(
+        visit_count=0, total_stay_seconds=0, first_visit_at=None, last_visit_at=None))
+    if totals:
+        connection.execute(
+            update(passengers).where(passengers.c.id == bindparam('passenger_id')).values(
+                visit_count=bindparam('visit_count'),
+                total_stay_seconds=bindparam('total_stay_seconds'),
+                first_visit_at=bindparam('first_visit_at'),
+                last_visit_at=bindparam('last_visit_at'),
+            ),
+            list(totals.values())
+        )
@@ -0,0 +1,60 @@
+"""Multi-lounge tenancy (see backend/tenancy.py): lounges, lounge_id columns, lounge-leading indexes."""
+from sqlalchemy import Column, Integer, MetaData, String, Table, delete, func, insert, select
+from sqlalchemy.sql import column, table
+
+from backend.tenancy import DEFAULT_LOUNGE_CODE, DEFAULT_LOUNGE_NAME
+
+revision = '0004'
+description = 'Add lounges and scope data by lounge_id'
+
+DEFAULT_LOUNGE_ID = 1
+
+lounges = Table(
+    'lounges', MetaData(),
+    Column('id', Integer, primary_key=True),
+    Column('code', String(20), unique=True, nullable=False),
+    Column('name', String(100), nullable=False),
+)
+lounge_settings = table('lounge_settings', column('id', Integer))
+
+TENANT_TABLES = ('users', 'passengers', 'lounge_entries', 'reservations', 'lounge_settings')
+
+INDEXES = [
+    ('ix_users_lounge_id', 'users', ['lounge_id']),
+    ('ix_passengers_lounge_visit_count', 'passengers', ['lounge_id', 'visit_count', 'total_stay_seconds']),
+    ('ix_passengers_lounge_name', 'passengers', ['lounge_id', 'name', 'flight_number']),
+    ('ix_lounge_entries_lounge_entry_time', 'lounge_entries', ['lounge_id', 'entry_time']),
+    ('ix_lounge_entries_lounge_status', 'lounge_entries', ['lounge_id', 'status']),
+    ('ix_reservations_lounge_date', 'reservations', ['lounge_id', 'reservation_date', 'reservation_time']),
+]
+
+# Indexes the lounge-leading ones replace (databases created by init_db in between)
+SUPERSEDED_INDEXES = [
+    ('passengers', 'ix_passengers_visit_count'),
+    ('lounge_entries', 'ix_lounge_entries_entry_time'),
+]
+
+
+def upgrade(ctx):
+    ctx.create_table(lounges)
+    with ctx.begin() as connection:
+        if connection.execute(select(lounges.c.id).where(lounges.c.id == DEFAULT_LOUNGE_ID)).first() is None:
+            connection.execute(insert(lounges).values(
+                id=DEFAULT_LOUNGE_ID, code=DEFAULT_LOUNGE_CODE, name=DEFAULT_LOUNGE_NAME))
+
+    # Existing rows all belong to the default lounge, so the server default fills
+    # them in without rewriting the tables. No FOREIGN KEY: SQLite cannot add one
+    # to an existing table.
+    for table_name in TENANT_TABLES:
+        ctx.add_column(table_name, Column('lounge_id', Integer, nullable=False, server_default=str(DEFAULT_LOUNGE_ID)))
+
+    for index_name, table_name, columns in INDEXES:
+        ctx.create_index(index_name, table_name, columns)
+    for table_name, index_name in SUPERSEDED_INDEXES:
+        ctx.drop_index(table_name, index_name)
+
+    # One settings row per lounge; the app only ever read the first one
+    with ctx.begin() as connection:
+        connection.execute(delete(lounge_settings).where(
+            lounge_settings.c.id != select(func.min(lounge_settings.c.id)).scalar_subquery()))
+    ctx.create_index('ix_lounge_settings_lounge_id', 'lounge_settings', ['lounge_id'], unique=True)
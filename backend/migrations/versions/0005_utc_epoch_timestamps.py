@@ -0,0 +1,56 @@
+"""UTC timestamps (see backend/timestamps.py) and a timezone per lounge.
+
+On SQLite, entry/exit and first/last visit times were ISO text; they become
+integer epoch milliseconds, converted in primary key batches. SQLite keeps the
+columns' declared DATETIME type, which stores integers unchanged. On
+PostgreSQL the columns become timestamptz, reading the old values as UTC.
+
+Unlike the other revisions, this one needs the app stopped while it runs. The
+conversion rewrites the stored values in place, and neither version of the code
+reads the other's format: code from before this revision fails on converted
+rows, and later code fails on rows not converted yet. Stop every worker, run
+``flask db upgrade`` up to this revision, and then start the new code. On
+PostgreSQL each ALTER also holds an exclusive lock on its table.
+"""
+from sqlalchemy import Column, Integer, String, text
+from sqlalchemy.sql import column, table
+
+revision = '0005'
+description = 'Store timestamps as UTC epoch milliseconds; add lounges.timezone'
+
+TIMESTAMP_COLUMNS = {
+    'lounge_entries': ('entry_time', 'exit_time'),
+    'passengers': ('first_visit_at', 'last_visit_at'),
+}
+
+
+def upgrade(ctx):
+    ctx.add_column('lounges', Column('timezone', String(64), nullable=False, server_default='UTC'))
+
+    if ctx.engine.dialect.name == 'postgresql':
+        # A table rewrite under an exclusive lock; PostgreSQL cannot change a type online
+        for table_name, columns in TIMESTAMP_COLUMNS.items():
+            for column_name in columns:
+                with ctx.begin() as connection:
+                    connection.exec_driver_sql(
+                        f'ALTER TABLE {table_name} ALTER COLUMN {column_name} '
+                        f"TYPE TIMESTAMP WITH TIME ZONE USING {column_name} AT TIME ZONE 'UTC'")
+        return
+
+    for table_name, columns in TIMESTAMP_COLUMNS.items():
+        key = table(table_name, column('id', Integer)).c.id
+        ctx.backfill(f'{table_name}_epoch_ms', key, _epoch_ms_converter(table_name, columns))
+
+
+def _epoch_ms_converter(table_name, columns):
+    # Only text values are converted, so a batch that is run twice is harmless
+    assignments = ', '.join(
+        f"{name} = CASE WHEN typeof({name}) = 'text' "
+        f"THEN CAST(round((julianday({name}) - 2440587.5) * 86400000) AS INTEGER) ELSE {name} END"
+        for name in columns
+    )
+    statement = text(f'UPDATE {table_name} SET {assignments} WHERE id BETWEEN :first_id AND :last_id')
+
+    def convert(connection, first_id, last_id):
+        connection.execute(statement, {'first_id': first_id, 'last_id': last_id})
+    return convert
@@ -0,0 +1,29 @@
+"""Stored stay durations: lounge_entries.stay_seconds, set on exit and backfilled for history."""
+from sqlalchemy import Column, Integer, text
+from sqlalchemy.sql import column, table
+
+revision = '0006'
+description = 'Add lounge_entries.stay_seconds'
+
+lounge_entries = table('lounge_entries', column('id', Integer))
+
+# Whole seconds from entry to exit, truncated like backend/aggregates.py stay_seconds
+ELAPSED_SECONDS = {
+    'sqlite': '(exit_time - entry_time) / 1000', # Epoch milliseconds (revision 0005)
+    'postgresql': 'CAST(trunc(extract(epoch from exit_time - entry_time)) AS INTEGER)',
+}
+
+
+def upgrade(ctx):
+    ctx.add_column('lounge_entries', Column('stay_seconds', Integer))
+    statement = text(
+        f'UPDATE lounge_entries SET stay_seconds = {ELAPSED_SECONDS[ctx.engine.dialect.name]} '
+        'WHERE id BETWEEN :first_id AND :last_id AND exit_time IS NOT NULL AND stay_seconds IS NULL'
+    )
+
+    def backfill(connection, first_id, last_id):
+        connection.execute(statement, {'first_id': first_id, 'last_id': last_id})
+
+    ctx.backfill('stay_seconds', lounge_entries.c.id, backfill)
+    # Built after the backfill so the batches do not also maintain the index
+    ctx.create_index('ix_lounge_entries_lounge_exit_time', 'lounge_entries', ['lounge_id', 'exit_time', 'stay_seconds'])
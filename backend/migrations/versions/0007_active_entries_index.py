@@ -0,0 +1,7 @@
+"""Index the active entries in entry order, read when the overstay tracker loads."""
+revision = '0007'
+description = 'Index lounge_entries on (status, entry_time)'
+
+
+def upgrade(ctx):
+    ctx.create_index('ix_lounge_entries_status_entry_time', 'lounge_entries', ['status', 'entry_time'])
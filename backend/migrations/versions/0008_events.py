@@ -0,0 +1,75 @@
+"""Event log (see backend/events.py): the events table, with the existing history logged into it.
+
+Every lounge entry gets its check-in event (and its exit event once exited),
+every reservation one event with its current status. Events of a batch are
+written in the batch's transaction, so an interrupted upgrade resumes without
+logging anything twice. Like every revision it runs before the code that
+writes events is deployed.
+"""
+import json
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, Text, insert, select
+from sqlalchemy.sql import column, table
+
+from backend.timestamps import UTCDateTime, utc_now
+
+revision = '0008'
+description = 'Add the events log and log existing entries and reservations'
+
+DEFAULT_LOUNGE_ID = 1
+
+events = Table(
+    'events', MetaData(),
+    Column('id', Integer, primary_key=True),
+    Column('lounge_id', Integer, nullable=False, server_default=str(DEFAULT_LOUNGE_ID)),
+    Column('type', String(30), nullable=False),
+    Column('entity_id', Integer, nullable=False),
+    Column('passenger_id', Integer),
+    Column('occurred_at', UTCDateTime, nullable=False),
+    Column('recorded_at', UTCDateTime, nullable=False),
+    Column('data', Text),
+)
+lounge_entries = table(
+    'lounge_entries', column('id', Integer), column('lounge_id', Integer), column('passenger_id', Integer),
+    column('entry_time', UTCDateTime), column('exit_time', UTCDateTime), column('stay_seconds', Integer),
+)
+passengers = table('passengers', column('id', Integer), column('flight_number', String))
+reservations = table('reservations', column('id', Integer), column('lounge_id', Integer), column('status', String))
+
+
+def _data(value):
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+def _log_entries(connection, first_id, last_id):
+    rows = connection.execute(
+        select(lounge_entries, passengers.c.flight_number)
+        .select_from(lounge_entries.join(passengers, lounge_entries.c.passenger_id == passengers.c.id))
+        .where(lounge_entries.c.id.between(first_id, last_id)).order_by(lounge_entries.c.id)).all()
+    now = utc_now()
+    logged = [dict(type='check_in', lounge_id=row.lounge_id, entity_id=row.id, passenger_id=row.passenger_id,
+                   occurred_at=row.entry_time, recorded_at=now, data=_data({'flight_number': row.flight_number}))
+              for row in rows]
+    logged.extend(dict(type='exit', lounge_id=row.lounge_id, entity_id=row.id, passenger_id=row.passenger_id,
+                       occurred_at=row.exit_time, recorded_at=now, data=_data({'stay_seconds': row.stay_seconds}))
+                  for row in rows if row.exit_time is not None)
+    if logged:
+        connection.execute(insert(events), logged)
+
+
+def _log_reservations(connection, first_id, last_id):
+    rows = connection.execute(select(reservations).where(reservations.c.id.between(first_id, last_id))).all()
+    now = utc_now()
+    if rows:
+        connection.execute(insert(events), [
+            dict(type='reservation_status', lounge_id=row.lounge_id, entity_id=row.id, occurred_at=now,
+                 recorded_at=now, data=_data({'from': None, 'to': row.status}))
+            for row in rows
+        ])
+
+
+def upgrade(ctx):
+    ctx.create_table(events)
+    ctx.backfill('events_lounge_entries', lounge_entries.c.id, _log_entries)
+    ctx.backfill('events_reservations', reservations.c.id, _log_reservations)
+    ctx.create_index('ix_events_lounge_id_id', 'events', ['lounge_id', 'id'])
@@ -0,0 +1,7 @@
+"""Index reservations by lounge, status and date, read by the upcoming listing and the no-show expiry."""
+revision = '0009'
+description = 'Index reservations on (lounge_id, status, reservation_date)'
+
+
+def upgrade(ctx):
+    ctx.create_index('ix_reservations_lounge_status_date', 'reservations', ['lounge_id', 'status', 'reservation_date'])
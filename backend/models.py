@@ -1,16 +1,39 @@
-from sqlalchemy import Column, Integer, String, DateTime, Date, Time, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Date, Time, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from backend.database import Base
-import datetime
+from backend.timestamps import UTCDateTime, utc_now, DEFAULT_TIMEZONE
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 
+# Lounge that rows belong to when none is given (single-lounge installs, old databases)
+DEFAULT_LOUNGE_ID = 1
+
+
+def lounge_id_column(**kwargs):
+    # Every tenant-owned table carries lounge_id, and its hot indexes lead on it
+    return Column(Integer, ForeignKey('lounges.id'), nullable=False,
+                  default=DEFAULT_LOUNGE_ID, server_default=str(DEFAULT_LOUNGE_ID), **kwargs)
+
+
+class Lounge(Base):
+    __tablename__ = 'lounges'
+    id = Column(Integer, primary_key=True)
+    code = Column(String(20), unique=True, nullable=False) # e.g. 'MXP-T1'
+    name = Column(String(100), nullable=False)
+    # IANA name; "today" on the dashboard and report days are local to the lounge
+    timezone = Column(String(64), nullable=False, default=DEFAULT_TIMEZONE, server_default=DEFAULT_TIMEZONE)
+
+    def __repr__(self):
+        return f'<Lounge {self.code}>'
+
 class User(Base, UserMixin):
     __tablename__ = 'users'
     id = Column(Integer, primary_key=True)
     username = Column(String(50), unique=True, nullable=False)
     password_hash = Column(String(128), nullable=False) # Consider making this longer, e.g. String(256)
     role = Column(String(50)) # e.g., 'admin', 'staff'
+    lounge_id = lounge_id_column(index=True) # Staff only see and write their own lounge
+    lounge = relationship('Lounge', lazy='joined') # Loaded with the user: its timezone is needed per request
 
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -26,8 +49,21 @@ class Passenger(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)
     flight_number = Column(String(50))
+    lounge_id = lounge_id_column() # Passengers are registered per lounge, so are their aggregates
+    # Visit aggregates, maintained on check-in and exit (see backend/aggregates.py)
+    visit_count = Column(Integer, nullable=False, default=0, server_default='0')
+    total_stay_seconds = Column(Integer, nullable=False, default=0, server_default='0')
+    first_visit_at = Column(UTCDateTime)
+    last_visit_at = Column(UTCDateTime)
     lounge_entries = relationship("LoungeEntry", back_populates="passenger")
 
+    __table_args__ = (
+        # Top-N frequent visitors straight off the index (/reports/top-passengers)
+        Index('ix_passengers_lounge_visit_count', 'lounge_id', 'visit_count', 'total_stay_seconds'),
+        # Passenger search and check-in lookups by name / flight
+        Index('ix_passengers_lounge_name', 'lounge_id', 'name', 'flight_number'),
+    )
+
     def __repr__(self):
         return f'<Passenger {self.name}>'
 
@@ -35,11 +71,27 @@ class LoungeEntry(Base):
     __tablename__ = 'lounge_entries'
     id = Column(Integer, primary_key=True)
     passenger_id = Column(Integer, ForeignKey('passengers.id'), nullable=False)
-    entry_time = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
-    exit_time = Column(DateTime)
+    lounge_id = lounge_id_column() # Copied from the passenger so range scans need no join
+    entry_time = Column(UTCDateTime, nullable=False, default=utc_now)
+    exit_time = Column(UTCDateTime)
+    # exit_time - entry_time in whole seconds, set on exit (backend/aggregates.py stay_seconds)
+    stay_seconds = Column(Integer)
     status = Column(String(50), default='active')  # e.g., 'active', 'exited'
     passenger = relationship("Passenger", back_populates="lounge_entries")
 
+    __table_args__ = (
+        # A passenger's history and visit aggregates (detail page, keyset paging)
+        Index('ix_lounge_entries_passenger_entry_time', 'passenger_id', 'entry_time'),
+        # Date range scans (reports, dashboard, recent entries)
+        Index('ix_lounge_entries_lounge_entry_time', 'lounge_id', 'entry_time'),
+        # Current occupancy
+        Index('ix_lounge_entries_lounge_status', 'lounge_id', 'status'),
+        # Every lounge's active entries in entry order (overstay tracker, loaded once per process)
+        Index('ix_lounge_entries_status_entry_time', 'status', 'entry_time'),
+        # Stays that ended in a range, with their durations read from the index alone
+        Index('ix_lounge_entries_lounge_exit_time', 'lounge_id', 'exit_time', 'stay_seconds'),
+    )
+
     def __repr__(self):
         return f'<LoungeEntry {self.id} for Passenger {self.passenger_id}>'
 
@@ -51,7 +103,15 @@ class Reservation(Base):
     reservation_date = Column(Date, nullable=False)
     reservation_time = Column(Time, nullable=False)
     number_of_guests = Column(Integer, default=1)
-    status = Column(String(50), default='confirmed')  # e.g., 'confirmed', 'cancelled', 'completed'
+    status = Column(String(50), default='confirmed')  # e.g., 'confirmed', 'cancelled', 'completed', 'no_show'
+    lounge_id = lounge_id_column()
+
+    __table_args__ = (
+        # A lounge's reservations in date order (listing, upcoming)
+        Index('ix_reservations_lounge_date', 'lounge_id', 'reservation_date', 'reservation_time'),
+        # A lounge's reservations in one status by date (upcoming listing, no-show expiry)
+        Index('ix_reservations_lounge_status_date', 'lounge_id', 'status', 'reservation_date'),
+    )
 
     def __repr__(self):
         return f'<Reservation {self.id} for {self.passenger_name}>'
@@ -59,6 +119,7 @@ class Reservation(Base):
 class LoungeSetting(Base): # Renamed from LoungeSettings to singular to follow convention
     __tablename__ = 'lounge_settings'
     id = Column(Integer, primary_key=True)
+    lounge_id = lounge_id_column(index=True, unique=True) # One settings row per lounge
     lounge_name = Column(String(100), default='Prima Vista Lounge')
     lounge_address = Column(String(200))
     lounge_capacity = Column(Integer)
@@ -66,3 +127,23 @@ class LoungeSetting(Base): # Renamed from LoungeSettings to singular to follow c
 
     def __repr__(self):
         return f'<LoungeSetting {self.lounge_name}>'
+
+class Event(Base):
+    """Append-only log of check-ins, exits and reservation status changes (see backend/events.py)."""
+    __tablename__ = 'events'
+    id = Column(Integer, primary_key=True) # Position in the log: readers resume after the last id they saw
+    lounge_id = lounge_id_column()
+    type = Column(String(30), nullable=False) # 'check_in', 'exit', 'reservation_status'
+    entity_id = Column(Integer, nullable=False) # The lounge entry or reservation the event is about
+    passenger_id = Column(Integer)
+    occurred_at = Column(UTCDateTime, nullable=False)
+    recorded_at = Column(UTCDateTime, nullable=False, default=utc_now) # When the row was written
+    data = Column(Text) # The type's own fields as a compact JSON object
+
+    __table_args__ = (
+        # A lounge's events in log order (GET /events)
+        Index('ix_events_lounge_id_id', 'lounge_id', 'id'),
+    )
+
+    def __repr__(self):
+        return f'<Event {self.id} {self.type}>'
@@ -0,0 +1,270 @@
+"""Active lounge entries ordered by entry time, for overstay alerts.
+
+``GET /dashboard/overstays`` lists who has been in the lounge longer than a
+threshold. Rather than scanning ``lounge_entries`` on every poll, each app
+keeps its lounges' active entries in memory: a min-heap per lounge ordered by
+``entry_time``, plus a dict of the live entries by id.
+
+- Check-in adds the entry and exit removes it, once their transaction has
+  committed (a rolled-back write never reaches the tracker).
+- Exit does not search the heap: the entry is dropped from the dict and its
+  heap item is skipped when met later. Heaps are compacted once stale items
+  outnumber live ones.
+- Listing the ``k`` longest stays walks the heap in order with a small
+  frontier heap, so it costs O(k log k) however many people are in the lounge.
+
+The heaps are built from the active entries (``ix_lounge_entries_status_entry_time``)
+the first time an app needs them. Entries checked in or out while that load
+runs are merged in, so nothing is missed or resurrected.
+
+The tracker belongs to one process, and other workers' check-ins and exits
+reach it by rebuilding a lounge's heap from its active entries
+(``tracked_entries``):
+
+- With a shared cache backend (see backend/cache.py), every write bumps the
+  lounge's ``lounge_entries`` version there. The heap is rebuilt when that
+  version differs from the one it was built at. The version is read before
+  the rebuild, so a write committed during the rebuild makes the next poll
+  rebuild again.
+- With the in-process ``lru`` backend other workers' writes leave no trace
+  here, so the heap is rebuilt once it is ``OVERSTAYS_RELOAD_SECONDS`` old:
+  alerts lag other workers' check-ins and exits by at most that long.
+"""
+import heapq
+import threading
+import time
+
+from sqlalchemy import select
+
+from backend.cache import LRUCache
+from backend.models import LoungeEntry, Passenger
+from backend.queries import InvalidParameter
+from backend.timestamps import utc_now
+
+DEFAULT_OVERSTAY_MINUTES = 180
+DEFAULT_RELOAD_SECONDS = 5
+OVERSTAYS_LIMIT = 50
+MAX_OVERSTAYS_LIMIT = 500
+
+# Heaps smaller than this are never compacted, it would not be worth the rebuild
+_COMPACT_MIN_SIZE = 64
+
+
+def active_entries_statement():
+    """Every active entry of every lounge, with the passenger shown in the alert."""
+    return select(
+        LoungeEntry.id, LoungeEntry.lounge_id, LoungeEntry.entry_time,
+        LoungeEntry.passenger_id, Passenger.name, Passenger.flight_number
+    ).join(Passenger, LoungeEntry.passenger_id == Passenger.id)\
+    .where(LoungeEntry.status == 'active')
+
+
+class ActiveEntry:
+    __slots__ = ('id', 'lounge_id', 'entry_time', 'passenger_id', 'passenger_name', 'flight_number')
+
+    def __init__(self, id, lounge_id, entry_time, passenger_id, passenger_name, flight_number):
+        self.id = id
+        self.lounge_id = lounge_id
+        self.entry_time = entry_time
+        self.passenger_id = passenger_id
+        self.passenger_name = passenger_name
+        self.flight_number = flight_number
+
+
+class OverstayTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._loaded = False
+        self._loading = False
+        self._exited_while_loading = set()
+        self._entries = {} # Entry id -> ActiveEntry, live entries only
+        self._heaps = {} # Lounge id -> [(entry_time, entry id)], may hold exited entries
+        self._stale = {} # Lounge id -> number of exited entries still in its heap
+        self._versions = {} # Lounge id -> lounge_entries version its heap reflects (shared caches only)
+        self._built_at = {} # Lounge id -> time.monotonic() of its last (re)build
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def load(self, connection):
+        """Build the heaps from the database, unless already done."""
+        with self._load_lock:
+            if self._loaded:
+                return
+            with self._lock:
+                self._loading = True
+            try:
+                rows = connection.execute(active_entries_statement()).all()
+            except Exception:
+                with self._lock:
+                    self._loading = False
+                    self._exited_while_loading.clear()
+                raise
+            with self._lock:
+                for row in rows:
+                    # Skip entries that exited after the SELECT read them, and the
+                    # ones checked in meanwhile (already tracked by checked_in)
+                    if row.id not in self._exited_while_loading and row.id not in self._entries:
+                        self._add(ActiveEntry(*row))
+                for heap in self._heaps.values():
+                    heapq.heapify(heap)
+                self._exited_while_loading.clear()
+                self._loading = False
+                self._loaded = True
+
+    def version(self, lounge_id):
+        """The ``lounge_entries`` version the lounge's heap was last built at, if any."""
+        return self._versions.get(lounge_id)
+
+    def age(self, lounge_id):
+        """Seconds since the lounge's heap was last built from the database (infinite if never)."""
+        built_at = self._built_at.get(lounge_id)
+        return float('inf') if built_at is None else time.monotonic() - built_at
+
+    def seen(self, lounge_id, version, built_at=None):
+        """Record that the lounge's heap reflects ``version`` of its entries, as read at ``built_at``."""
+        with self._lock:
+            self._versions[lounge_id] = version
+            self._built_at[lounge_id] = time.monotonic() if built_at is None else built_at
+
+    def reload_lounge(self, connection, lounge_id, version):
+        """Rebuild one lounge's heap from its active entries, read after ``version`` was."""
+        started = time.monotonic()
+        rows = connection.execute(active_entries_statement().where(LoungeEntry.lounge_id == lounge_id)).all()
+        with self._lock:
+            for _, entry_id in self._heaps.get(lounge_id, ()):
+                self._entries.pop(entry_id, None)
+            heap = self._heaps[lounge_id] = []
+            for row in rows:
+                self._entries[row.id] = ActiveEntry(*row)
+                heap.append((row.entry_time, row.id))
+            heapq.heapify(heap)
+            self._stale[lounge_id] = 0
+            self._versions[lounge_id] = version
+            self._built_at[lounge_id] = started
+
+    def checked_in(self, entry):
+        """Track a committed check-in (an ActiveEntry)."""
+        with self._lock:
+            if not (self._loaded or self._loading):
+                return # The load will read it from the database
+            self._add(entry)
+
+    def exited(self, entry_id):
+        """Stop tracking a committed exit."""
+        with self._lock:
+            if self._loading:
+                self._exited_while_loading.add(entry_id)
+            entry = self._entries.pop(entry_id, None)
+            if entry is not None and entry.lounge_id in self._heaps:
+                self._stale[entry.lounge_id] = self._stale.get(entry.lounge_id, 0) + 1
+                self._maybe_compact(entry.lounge_id)
+
+    def longest_stays(self, lounge_id, entered_before, limit):
+        """Up to ``limit`` active entries of the lounge that entered before ``entered_before``, oldest first."""
+        result = []
+        with self._lock:
+            heap = self._heaps.get(lounge_id)
+            if not heap:
+                return result
+            # The heap's order is visited lazily: the frontier holds the children
+            # of every item returned so far, smallest first
+            frontier = [(heap[0], 0)]
+            while frontier and len(result) < limit:
+                (entry_time, entry_id), index = heapq.heappop(frontier)
+                if entry_time >= entered_before:
+                    break # Everything left entered later
+                entry = self._entries.get(entry_id)
+                if entry is not None:
+                    result.append(entry)
+                for child in (2 * index + 1, 2 * index + 2):
+                    if child < len(heap):
+                        heapq.heappush(frontier, (heap[child], child))
+        return result
+
+    def _add(self, entry):
+        self._entries[entry.id] = entry
+        heap = self._heaps.setdefault(entry.lounge_id, [])
+        if self._loaded:
+            heapq.heappush(heap, (entry.entry_time, entry.id))
+        else:
+            heap.append((entry.entry_time, entry.id)) # Heapified at the end of the load
+
+    def _maybe_compact(self, lounge_id):
+        # Rebuilding costs O(n), so only once half the heap is stale: O(1) amortized per exit
+        heap = self._heaps[lounge_id]
+        if not self._loaded or len(heap) < _COMPACT_MIN_SIZE or self._stale[lounge_id] * 2 < len(heap):
+            return
+        live = [item for item in heap if item[1] in self._entries]
+        heapq.heapify(live)
+        self._heaps[lounge_id] = live
+        self._stale[lounge_id] = 0
+
+
+_create_lock = threading.Lock()
+
+
+def get_tracker(app):
+    """The app's tracker, created on first use (its heaps are loaded by ``load``)."""
+    tracker = app.extensions.get('overstays')
+    if tracker is None:
+        with _create_lock:
+            tracker = app.extensions.get('overstays')
+            if tracker is None:
+                tracker = app.extensions['overstays'] = OverstayTracker()
+    return tracker
+
+
+def tracked_entries(app, connection, lounge_id):
+    """The app's tracker, loaded, and with the lounge's heap rebuilt if other workers may have written to it."""
+    tracker = get_tracker(app)
+    cache = app.extensions['cache']
+    if isinstance(cache.backend, LRUCache):
+        # Not shared: writes through other workers are only picked up by rebuilding
+        if not tracker.loaded:
+            started = time.monotonic()
+            tracker.load(connection)
+            tracker.seen(lounge_id, None, started)
+        elif tracker.age(lounge_id) >= app.config.get('OVERSTAYS_RELOAD_SECONDS', DEFAULT_RELOAD_SECONDS):
+            tracker.reload_lounge(connection, lounge_id, None)
+        return tracker
+    version = cache.version('lounge_entries', lounge_id)
+    if not tracker.loaded:
+        tracker.load(connection)
+        tracker.seen(lounge_id, version)
+    elif version is not None and version != tracker.version(lounge_id):
+        tracker.reload_lounge(connection, lounge_id, version)
+    return tracker
+
+
+def overstay_params(args, default_minutes=DEFAULT_OVERSTAY_MINUTES):
+    """(threshold minutes, limit) from the query string. Raises InvalidParameter."""
+    try:
+        minutes = int(args.get('minutes', default_minutes))
+        limit = int(args.get('limit', OVERSTAYS_LIMIT))
+    except ValueError:
+        raise InvalidParameter('Invalid minutes or limit. Use whole numbers.')
+    if minutes < 0:
+        raise InvalidParameter('minutes must not be negative.')
+    if not 1 <= limit <= MAX_OVERSTAYS_LIMIT:
+        raise InvalidParameter(f'limit must be between 1 and {MAX_OVERSTAYS_LIMIT}.')
+    return minutes, limit
+
+
+def overstays_payload(entries, minutes, now=None):
+    now = now or utc_now()
+    return {
+        'threshold_minutes': minutes,
+        'data': [
+            {
+                'entry_id': entry.id,
+                'passenger_id': entry.passenger_id,
+                'passenger_name': entry.passenger_name,
+                'flight_number': entry.flight_number,
+                'entry_time': entry.entry_time,
+                'minutes_in_lounge': int((now - entry.entry_time).total_seconds() // 60),
+            } for entry in entries
+        ]
+    }
@@ -0,0 +1,206 @@
+"""Request coalescing and rate limiting for the polled dashboard endpoints.
+
+Every desk terminal polls ``/dashboard/stats`` and ``/dashboard/recent-entries``
+every few seconds, and all terminals of a lounge ask for the same numbers.
+Two things keep the database load flat as terminals are added:
+
+- Single flight: identical requests (same lounge, endpoint and query string)
+  share one computation. A request arriving while another computes the result
+  waits for it; one arriving within ``POLL_COALESCE_WINDOW_MS`` after it
+  finished reuses it. Check-in and exit bump the lounge's version
+  (``invalidate``), so results computed before a write are never handed out
+  after it.
+- Rate limiting: a token bucket per user and endpoint, ``POLL_RATE_PER_MINUTE``
+  on average with bursts of up to ``POLL_RATE_BURST``. Requests beyond that get
+  ``429 Too Many Requests`` with a ``Retry-After`` header.
+
+Both work per process. The Flask views use ``@polling_endpoint`` and
+``coalesce``; the ASGI app (``backend/asgi.py``) uses the same objects through
+``do_async``, so a terminal gets the same limits in either mode.
+"""
+import asyncio
+import math
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, jsonify, request
+from flask_login import current_user
+
+TOO_MANY_REQUESTS_MESSAGE = 'Too many requests. Poll less often.'
+
+# Above this many remembered results, finished ones are dropped when a new one starts
+_MAX_CALLS = 1024
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'expires')
+
+    def __init__(self, done):
+        self.done = done # threading.Event or asyncio.Future
+        self.result = None
+        self.error = None
+        self.expires = None # Set when the result is ready
+
+    def reusable(self, now):
+        return self.expires is None or now < self.expires
+
+
+class SingleFlight:
+    def __init__(self, window=0.0):
+        self.window = window
+        self._lock = threading.Lock()
+        self._calls = {} # Threads (Flask views)
+        self._async_calls = {} # Event loop (ASGI handlers), only touched from the loop
+        self._versions = {} # Lounge id -> bumped on every write to the lounge
+        self.computations = 0
+        self.shared = 0
+
+    def invalidate(self, lounge_id):
+        """Results computed so far for the lounge are not handed out any more."""
+        with self._lock:
+            self._versions[lounge_id] = self._versions.get(lounge_id, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._calls.clear()
+            self._async_calls.clear()
+            self._versions.clear()
+            self.computations = self.shared = 0
+
+    def _key(self, lounge_id, key):
+        return (lounge_id, self._versions.get(lounge_id, 0), key)
+
+    def _join(self, calls, key, make_done):
+        # (call, leader): the call to wait on, or a new one this caller computes
+        now = time.monotonic()
+        with self._lock:
+            key = self._key(*key)
+            call = calls.get(key)
+            if call is not None and call.reusable(now):
+                self.shared += 1
+                return call, False
+            if len(calls) >= _MAX_CALLS:
+                for old_key in [k for k, c in calls.items() if not c.reusable(now)]:
+                    del calls[old_key]
+            call = calls[key] = _Call(make_done())
+            self.computations += 1
+            return call, True
+
+    def _finish(self, calls, call, result=None, error=None):
+        with self._lock:
+            call.result, call.error = result, error
+            call.expires = time.monotonic() + self.window
+            if error is not None or self.window <= 0:
+                # Failures are only shared with the requests already waiting
+                for k in [k for k, c in calls.items() if c is call]:
+                    del calls[k]
+
+    def do(self, lounge_id, key, compute):
+        """``compute()``, or the result of an identical call in flight or just finished."""
+        call, leader = self._join(self._calls, (lounge_id, key), threading.Event)
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                result = compute()
+            except Exception as e:
+                self._finish(self._calls, call, error=e)
+                raise
+            else:
+                self._finish(self._calls, call, result=result)
+            finally:
+                call.done.set()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    async def do_async(self, lounge_id, key, compute):
+        """``await compute()``, shared the same way as ``do``."""
+        loop = asyncio.get_running_loop()
+        call, leader = self._join(self._async_calls, (lounge_id, key), loop.create_future)
+        if not leader:
+            await asyncio.shield(call.done)
+        else:
+            try:
+                result = await compute()
+            except BaseException as e: # Cancelled included: waiters must not hang
+                self._finish(self._async_calls, call, error=e)
+                raise
+            else:
+                self._finish(self._async_calls, call, result=result)
+            finally:
+                call.done.set_result(None)
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+class RateLimiter:
+    """Token bucket per key: ``rate`` requests per second on average, bursts of up to ``burst``."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._buckets = {} # key -> (tokens, last refill)
+
+    def acquire(self, key):
+        """Take a token for ``key``; returns 0 if granted, else the seconds until one is available."""
+        if not self.rate:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return 0
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / self.rate
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+def make_single_flight(config):
+    return SingleFlight(window=(config.get('POLL_COALESCE_WINDOW_MS') or 0) / 1000)
+
+
+def make_rate_limiter(config):
+    per_minute = config.get('POLL_RATE_PER_MINUTE')
+    return RateLimiter(rate=per_minute / 60 if per_minute else None, burst=config.get('POLL_RATE_BURST', 10))
+
+
+def too_many_requests(retry_after):
+    response = jsonify({'message': TOO_MANY_REQUESTS_MESSAGE})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(math.ceil(retry_after))
+    return response
+
+
+def polling_endpoint(view):
+    """Rate limit a polled view per user and endpoint (use below ``@login_required``)."""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        retry_after = current_app.extensions['rate_limiter'].acquire((current_user.get_id(), request.endpoint))
+        if retry_after:
+            return too_many_requests(retry_after)
+        return view(*args, **kwargs)
+    return wrapped
+
+
+def request_key():
+    # Identical requests: same endpoint and query string (in any order)
+    return (request.endpoint, tuple(sorted(request.args.items(multi=True))))
+
+
+def coalesce(lounge_id, compute):
+    """The payload of the current request, shared with identical requests of the lounge."""
+    return current_app.extensions['single_flight'].do(lounge_id, request_key(), compute)
+
+
+def invalidate(lounge_id):
+    """Call after committing a write to the lounge: polls see it from now on."""
+    current_app.extensions['single_flight'].invalidate(lounge_id)
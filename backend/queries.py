@@ -0,0 +1,409 @@
+"""Statements and response shaping for the read-heavy endpoints.
+
+The dashboard, reports and passenger search are served both by the Flask
+blueprints and by the async ASGI app (``backend/asgi.py``). The two share these
+Core ``select()`` builders and payload functions, so the only difference
+between them is how a statement gets executed. Payloads keep dates and times
+as native values; the JSON provider (``backend/serialization.py``) encodes them.
+
+Every statement is scoped to one lounge (``lounge_id`` first), and every index
+the statements rely on leads on ``lounge_id`` (see ``backend/models.py``), so
+a lounge's queries never scan another lounge's rows.
+
+Timestamps are compared as UTC instants (``backend/timestamps.py``). Callers
+turn lounge-local days into a ``[start, end)`` instant range once per request
+and pass that in; the payloads map results back onto local dates.
+"""
+import base64
+import binascii
+from datetime import datetime, timedelta
+from sqlalchemy import select, func, or_, and_
+from backend.models import LoungeEntry, Passenger
+from backend.serialization import RowSerializer
+from backend.analytics import DWELL_BUCKET_MINUTES, bucket_labels, dwell_distributions
+from backend.timestamps import (
+    epoch_bucket, local_date_of_bucket, local_day_bounds, local_today, parse_timestamp
+)
+
+
+class InvalidParameter(ValueError):
+    pass
+
+
+# --- Dashboard ---
+
+def today_bounds(timezone):
+    """[start, end) in UTC of the lounge's current local day."""
+    return local_day_bounds(timezone)
+
+def dashboard_stats_statements(lounge_id, today_start, today_end):
+    """Current occupancy, entries today, and the average length of stays that ended today."""
+    current_occupancy = select(func.count(LoungeEntry.id)).where(
+        LoungeEntry.lounge_id == lounge_id,
+        LoungeEntry.status == 'active'
+    )
+    total_entries_today = select(func.count(LoungeEntry.id)).where(
+        LoungeEntry.lounge_id == lounge_id,
+        LoungeEntry.entry_time >= today_start,
+        LoungeEntry.entry_time < today_end
+    )
+    # Average stay duration (simplified: for entries that ended today), aggregated
+    # straight off ix_lounge_entries_lounge_exit_time, which covers stay_seconds
+    average_stay_today = select(func.avg(LoungeEntry.stay_seconds)).where(
+        LoungeEntry.lounge_id == lounge_id,
+        LoungeEntry.exit_time >= today_start,
+        LoungeEntry.exit_time < today_end,
+        LoungeEntry.stay_seconds.isnot(None)
+    )
+    return current_occupancy, total_entries_today, average_stay_today
+
+def dashboard_stats_cache_key(timezone):
+    # The stats are per lounge-local day; cached (per lounge) until the lounge's entries change
+    return f'dashboard.stats:{timezone.key}:{local_today(timezone).isoformat()}'
+
+def dashboard_stats_payload(current_occupancy, total_entries_today, average_stay_seconds):
+    average_stay_duration_minutes = average_stay_seconds / 60 if average_stay_seconds is not None else 0
+
+    return {
+        'current_occupancy': current_occupancy,
+        'total_entries_today': total_entries_today,
+        'average_stay_duration_minutes': round(average_stay_duration_minutes, 2)
+    }
+
+def recent_entries_statement(lounge_id, limit=10):
+    # Latest entries, joined with Passenger to get names
+    return select(
+        LoungeEntry.id,
+        Passenger.name.label('passenger_name'),
+        Passenger.flight_number,
+        LoungeEntry.entry_time,
+        LoungeEntry.status
+    ).join(Passenger, LoungeEntry.passenger_id == Passenger.id)\
+    .where(LoungeEntry.lounge_id == lounge_id)\
+    .order_by(LoungeEntry.entry_time.desc())\
+    .limit(limit)
+
+recent_entries_payload = RowSerializer(('id', 'passenger_name', 'flight_number', 'entry_time', 'status'))
+
+
+# --- Reports ---
+
+def lounge_usage_range(args, timezone):
+    """Resolve the (start_date, end_date) of a usage report from request args, in the lounge's days.
+
+    Raises InvalidParameter with a user-facing message on bad input.
+    """
+    date_range_param = args.get('date_range', 'last_7_days') # Default to last 7 days
+    start_date_str = args.get('start_date')
+    end_date_str = args.get('end_date')
+
+    end_date = local_today(timezone)
+    if end_date_str:
+        try:
+            end_date = datetime.fromisoformat(end_date_str).date()
+        except ValueError:
+            raise InvalidParameter('Invalid end_date format. Use YYYY-MM-DD.')
+
+    if start_date_str:
+        try:
+            start_date = datetime.fromisoformat(start_date_str).date()
+        except ValueError:
+            raise InvalidParameter('Invalid start_date format. Use YYYY-MM-DD.')
+    elif date_range_param == 'last_7_days':
+        start_date = end_date - timedelta(days=6) # 7 days including today
+    elif date_range_param == 'last_30_days':
+        start_date = end_date - timedelta(days=29) # 30 days including today
+    elif date_range_param == 'specific_month': # Example, you might need year and month params
+        # This would need year and month parameters. For simplicity, not fully implemented.
+        raise InvalidParameter('Specific month not fully implemented, use start/end dates or other ranges.')
+    else: # Default to last 7 days if invalid range_param and no start_date
+        start_date = end_date - timedelta(days=6)
+
+    return start_date, end_date
+
+def lounge_usage_statement(lounge_id, start, end):
+    # Entries per quarter hour of the [start, end) instant range; the payload sums
+    # them into the lounge's local days (a UTC date cast would split days at UTC midnight)
+    bucket = epoch_bucket(LoungeEntry.entry_time)
+    return select(
+            bucket.label('bucket'),
+            func.count(LoungeEntry.id).label('total_entries')
+        ).where(
+            LoungeEntry.lounge_id == lounge_id,
+            LoungeEntry.entry_time >= start,
+            LoungeEntry.entry_time < end
+        ).group_by(bucket)
+
+def lounge_usage_counts(rows, timezone):
+    """Entries per local date from the quarter-hour rows of lounge_usage_statement."""
+    data_map = {}
+    for row in rows:
+        entry_date = local_date_of_bucket(row.bucket, timezone)
+        data_map[entry_date] = data_map.get(entry_date, 0) + row.total_entries
+    return data_map
+
+def lounge_usage_payload(start_date, end_date, data_map):
+    # Fill in missing dates with 0 entries so the frontend chart is consistent
+    current_date = start_date
+    final_report = []
+    while current_date <= end_date:
+        final_report.append({
+            'date': current_date,
+            'total_entries': data_map.get(current_date, 0) # Get count or 0 if not present
+        })
+        current_date += timedelta(days=1)
+
+    return {
+        'report_name': 'Lounge Usage Over Time',
+        'start_date': start_date,
+        'end_date': end_date,
+        'data': final_report
+    }
+
+
+MAX_DWELL_BUCKETS = 20
+
+def dwell_bucket_edges(args):
+    """Histogram bucket upper bounds (minutes) from `buckets=15,30,60`, or the defaults."""
+    buckets = args.get('buckets')
+    if not buckets:
+        return DWELL_BUCKET_MINUTES
+    try:
+        edges = sorted({int(value) for value in buckets.split(',')})
+    except ValueError:
+        raise InvalidParameter('Invalid buckets. Use comma-separated minutes, e.g. 15,30,60.')
+    if edges[0] <= 0 or len(edges) > MAX_DWELL_BUCKETS:
+        raise InvalidParameter(f'buckets must be up to {MAX_DWELL_BUCKETS} positive minute values.')
+    return tuple(edges)
+
+def _entries_in_range(lounge_id, start, end):
+    return (
+        LoungeEntry.lounge_id == lounge_id,
+        LoungeEntry.entry_time >= start,
+        LoungeEntry.entry_time < end,
+        Passenger.flight_number.isnot(None),
+    )
+
+def flight_counts_statement(lounge_id, start, end):
+    """Passengers and entries per flight for entries in the range."""
+    return select(
+        Passenger.flight_number,
+        func.count(func.distinct(LoungeEntry.passenger_id)).label('passengers'),
+        func.count(LoungeEntry.id).label('entries')
+    ).join(Passenger, LoungeEntry.passenger_id == Passenger.id)\
+    .where(*_entries_in_range(lounge_id, start, end))\
+    .group_by(Passenger.flight_number)\
+    .order_by(Passenger.flight_number)
+
+def flight_dwell_statement(lounge_id, start, end):
+    """(flight, dwell minutes) of every completed stay in the range, grouped by flight."""
+    # Durations come from the stored stay_seconds, not per-row timestamp arithmetic
+    return select(Passenger.flight_number, (LoungeEntry.stay_seconds / 60.0).label('dwell_minutes'))\
+        .join(Passenger, LoungeEntry.passenger_id == Passenger.id)\
+        .where(*_entries_in_range(lounge_id, start, end), LoungeEntry.stay_seconds.isnot(None))\
+        .order_by(Passenger.flight_number)
+
+def flight_report_payload(start_date, end_date, count_rows, dwell_rows, edges=DWELL_BUCKET_MINUTES):
+    flights, minutes = zip(*dwell_rows) if dwell_rows else ((), ())
+    distributions = dwell_distributions(flights, minutes, edges)
+    no_stays = {'completed_entries': 0, 'average_dwell_minutes': None, 'median_dwell_minutes': None,
+                'p90_dwell_minutes': None, 'histogram': [0] * (len(edges) + 1)}
+
+    return {
+        'report_name': 'Flights',
+        'start_date': start_date,
+        'end_date': end_date,
+        'buckets': bucket_labels(edges),
+        'data': [
+            {
+                'flight_number': row.flight_number,
+                'passengers': row.passengers,
+                'entries': row.entries,
+                **distributions.get(row.flight_number, no_stays)
+            } for row in count_rows
+        ]
+    }
+
+TOP_PASSENGERS_LIMIT = 10
+MAX_TOP_PASSENGERS_LIMIT = 100
+
+def top_passengers_limit(args):
+    try:
+        limit = int(args.get('limit', TOP_PASSENGERS_LIMIT))
+    except ValueError:
+        raise InvalidParameter('Invalid limit. Use a whole number.')
+    if not 1 <= limit <= MAX_TOP_PASSENGERS_LIMIT:
+        raise InvalidParameter(f'limit must be between 1 and {MAX_TOP_PASSENGERS_LIMIT}.')
+    return limit
+
+def top_passengers_statement(lounge_id, limit=TOP_PASSENGERS_LIMIT):
+    # Reads the first `limit` entries of ix_passengers_lounge_visit_count backwards; no grouping of lounge_entries
+    return select(
+        Passenger.id, Passenger.name, Passenger.flight_number, Passenger.visit_count,
+        Passenger.total_stay_seconds, Passenger.first_visit_at, Passenger.last_visit_at
+    ).where(Passenger.lounge_id == lounge_id, Passenger.visit_count > 0)\
+    .order_by(Passenger.visit_count.desc(), Passenger.total_stay_seconds.desc())\
+    .limit(limit)
+
+def top_passengers_payload(rows):
+    return {
+        'report_name': 'Top Passengers by Visits',
+        'data': [
+            {
+                'id': row.id,
+                'name': row.name,
+                'flight_number': row.flight_number,
+                'visit_count': row.visit_count,
+                'total_stay_minutes': round(row.total_stay_seconds / 60, 1),
+                'first_visit': row.first_visit_at,
+                'last_visit': row.last_visit_at
+            } for row in rows
+        ]
+    }
+
+
+# --- Passenger search ---
+
+def _passenger_search_filter(search_query):
+    return or_(
+        Passenger.name.ilike(f"%{search_query}%"),
+        Passenger.flight_number.ilike(f"%{search_query}%")
+    )
+
+def passenger_search_statements(lounge_id, search_query=None):
+    """Passengers with at least one lounge entry, and all of those passengers' entries.
+
+    Two statements regardless of the number of passengers (no per-passenger loading).
+    """
+    passengers = select(Passenger.id, Passenger.name, Passenger.flight_number)\
+        .where(Passenger.lounge_id == lounge_id, Passenger.lounge_entries.any())\
+        .order_by(Passenger.name)
+    entries = select(
+        LoungeEntry.id, LoungeEntry.passenger_id, LoungeEntry.entry_time, LoungeEntry.exit_time, LoungeEntry.status
+    ).join(Passenger, LoungeEntry.passenger_id == Passenger.id)\
+    .where(LoungeEntry.lounge_id == lounge_id)\
+    .order_by(LoungeEntry.entry_time.desc()) # Most recent first
+
+    if search_query:
+        passengers = passengers.where(_passenger_search_filter(search_query))
+        entries = entries.where(_passenger_search_filter(search_query))
+    return passengers, entries
+
+def passenger_search_payload(passenger_rows, entry_rows):
+    entries_by_passenger = {}
+    for entry_id, passenger_id, entry_time, exit_time, status in entry_rows:
+        entries_by_passenger.setdefault(passenger_id, []).append({
+            'id': entry_id,
+            'entry_time': entry_time,
+            'exit_time': exit_time,
+            'status': status
+        })
+    return [
+        {
+            'id': p.id,
+            'name': p.name,
+            'flight_number': p.flight_number,
+            'lounge_entries': entries_by_passenger.get(p.id, [])
+        } for p in passenger_rows
+    ]
+
+
+# --- Passenger detail ---
+
+ENTRY_PAGE_SIZE = 20
+MAX_ENTRY_PAGE_SIZE = 100
+
+def _active_entry_id():
+    # The passenger's open entry, if any (ix_lounge_entries_passenger_entry_time)
+    return select(func.max(LoungeEntry.id)).where(
+        LoungeEntry.passenger_id == Passenger.id,
+        LoungeEntry.status == 'active'
+    ).scalar_subquery().label('active_entry_id')
+
+def _passenger_summary_columns():
+    # Visit aggregates are columns on passengers (see backend/aggregates.py)
+    return (
+        Passenger.id, Passenger.name, Passenger.flight_number,
+        Passenger.visit_count,
+        Passenger.first_visit_at.label('first_visit'),
+        Passenger.last_visit_at.label('last_visit'),
+        _active_entry_id(),
+    )
+
+def passenger_summaries_statement(lounge_id, search_query=None):
+    """One slim row per passenger with entries: visit count, last visit, open entry. No history."""
+    stmt = select(*_passenger_summary_columns())\
+        .where(Passenger.lounge_id == lounge_id, Passenger.visit_count > 0)\
+        .order_by(Passenger.name)
+    if search_query:
+        stmt = stmt.where(_passenger_search_filter(search_query))
+    return stmt
+
+passenger_summaries_payload = RowSerializer(
+    ('id', 'name', 'flight_number', 'visit_count', 'first_visit', 'last_visit', 'active_entry_id'))
+
+def passenger_detail_statement(lounge_id, passenger_id):
+    return select(*_passenger_summary_columns(), Passenger.total_stay_seconds)\
+        .where(Passenger.id == passenger_id, Passenger.lounge_id == lounge_id)
+
+_passenger_detail_serializer = RowSerializer(
+    ('id', 'name', 'flight_number', 'visit_count', 'first_visit', 'last_visit', 'active_entry_id',
+     'total_stay_seconds'))
+
+def passenger_detail_payload(row):
+    return _passenger_detail_serializer([row])[0]
+
+def encode_entry_cursor(entry_time, entry_id):
+    raw = f'{entry_time.isoformat()}|{entry_id}'.encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_entry_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        entry_time, entry_id = raw.split('|')
+        return parse_timestamp(entry_time), int(entry_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidParameter('Invalid cursor.')
+
+def passenger_entries_page(args):
+    """Resolve (after, limit) of an entry history page from request args.
+
+    Raises InvalidParameter with a user-facing message on bad input.
+    """
+    try:
+        limit = int(args.get('limit', ENTRY_PAGE_SIZE))
+    except ValueError:
+        raise InvalidParameter('Invalid limit. Use a whole number.')
+    if not 1 <= limit <= MAX_ENTRY_PAGE_SIZE:
+        raise InvalidParameter(f'limit must be between 1 and {MAX_ENTRY_PAGE_SIZE}.')
+    cursor = args.get('cursor')
+    return (decode_entry_cursor(cursor) if cursor else None), limit
+
+def passenger_entries_statement(lounge_id, passenger_id, after=None, limit=ENTRY_PAGE_SIZE):
+    """One page of a passenger's entries, most recent first, after the cursor position.
+
+    Keyset pagination on (entry_time, id): each page is an index range scan no
+    matter how deep the history goes. One extra row is fetched to tell whether
+    another page follows.
+    """
+    stmt = select(LoungeEntry.id, LoungeEntry.entry_time, LoungeEntry.exit_time, LoungeEntry.status)\
+        .where(LoungeEntry.passenger_id == passenger_id, LoungeEntry.lounge_id == lounge_id)\
+        .order_by(LoungeEntry.entry_time.desc(), LoungeEntry.id.desc())\
+        .limit(limit + 1)
+    if after is not None:
+        entry_time, entry_id = after
+        stmt = stmt.where(or_(
+            LoungeEntry.entry_time < entry_time,
+            and_(LoungeEntry.entry_time == entry_time, LoungeEntry.id < entry_id)
+        ))
+    return stmt
+
+_entry_serializer = RowSerializer(('id', 'entry_time', 'exit_time', 'status'))
+
+def passenger_entries_payload(rows, limit):
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1]
+        next_cursor = encode_entry_cursor(last.entry_time, last.id)
+    return {'entries': _entry_serializer(page), 'next_cursor': next_cursor}
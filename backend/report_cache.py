@@ -0,0 +1,136 @@
+"""Per-day cache for the lounge usage report.
+
+``/reports/lounge-usage`` counts entries per lounge-local day. A day that has
+ended can only change if an entry is checked in with a back-dated
+``entry_time``, so instead of caching whole responses (keyed on a range that
+shifts every day) the cache holds one entry per (lounge, timezone, day):
+
+- Closed days (before the lounge's today) are kept indefinitely, except in the
+  LRU of a worker without a shared backend (see below).
+- Open days (today, and any later day in the range) are kept for
+  ``REPORT_CACHE_OPEN_DAY_TTL`` seconds.
+- Every key includes the lounge's ``lounge_usage`` version. A back-dated
+  check-in bumps it (``invalidate``). A check-in for today only deletes
+  today's entry, in both tiers.
+
+A report looks its days up in the in-process LRU first, then in the app's
+shared cache backend when it has one (``CACHE_BACKEND`` ``'sqlite'`` or
+``'redis'``, see ``backend/cache.py``), and queries only the span between the first and last day still missing. A
+historical range that any worker has served before costs no query at all.
+How far a back-dated check-in reaches depends on the backend:
+
+- Shared (``'sqlite'``, ``'redis'``): the versions live there, so every worker
+  stops reading the lounge's cached days at once. Each report reads the
+  lounge's version from the backend once, even when every day is in the LRU.
+- In-process (``'lru'``, the default): the version is bumped only in the
+  worker that handled the check-in. Other workers keep their closed days for
+  at most ``REPORT_CACHE_CLOSED_DAY_TTL`` seconds, and show the new count after that.
+
+``lookup`` returns the version it read, and ``store`` files the counts under
+that version. A report that read its days before a back-dated check-in
+committed therefore stores them under the old version, where no later
+report looks.
+
+Another worker's LRU only sees a check-in for today once its copy of the day
+expires, so open days lag by up to the TTL there. Closed days that change
+behind the app's back (``flask seed``, manual loads) need
+``flask clear-report-cache`` and a restart of the workers.
+"""
+from datetime import timedelta
+
+from backend.cache import LRUCache
+from backend.timestamps import local_today
+
+
+class LoungeUsageCache:
+    def __init__(self, local, shared=None, open_day_ttl=5, closed_day_ttl=60):
+        self.local = local
+        self.shared = shared
+        self.open_day_ttl = open_day_ttl
+        # Without a shared backend, other workers' invalidations never reach the LRU
+        self.local_closed_day_ttl = closed_day_ttl if shared is None else None
+        # The per-lounge versions live where every worker sees them
+        self.versions = shared if shared is not None else local
+
+    @staticmethod
+    def _key(lounge_id, version, timezone, day):
+        return f'lounge-usage:{lounge_id}:{version}:{timezone.key}:{day.isoformat()}'
+
+    def version(self, lounge_id):
+        """The lounge's current version, or None when the shared backend is unavailable."""
+        name = f'lounge_usage:{lounge_id}'
+        versions = self.versions.versions([name])
+        return None if versions is None else versions[name]
+
+    def lookup(self, lounge_id, timezone, start_date, end_date):
+        """Cached counts of the days in the range, the (first, last) days still to query (or None),
+        and the version to ``store`` the queried days under."""
+        version = self.version(lounge_id)
+        if version is None:
+            return {}, (start_date, end_date), None
+        keys = {}
+        day = start_date
+        while day <= end_date:
+            keys[self._key(lounge_id, version, timezone, day)] = day
+            day += timedelta(days=1)
+
+        found = self.local.get_many(keys)
+        if self.shared is not None and len(found) < len(keys):
+            from_shared = self.shared.get_many(key for key in keys if key not in found)
+            self._set(self.local, {keys[key]: (key, count) for key, count in from_shared.items()}, timezone)
+            found.update(from_shared)
+
+        counts = {keys[key]: count for key, count in found.items()}
+        missing = [day for key, day in keys.items() if key not in found]
+        return counts, (missing[0], missing[-1]) if missing else None, version
+
+    def store(self, lounge_id, timezone, first, last, counts, version):
+        """Cache the counts of every day from ``first`` to ``last`` (days absent from ``counts`` had none)
+        under ``version``, read before the counts were."""
+        if version is None:
+            return # The backend was unavailable when the days were looked up
+        items = {}
+        day = first
+        while day <= last:
+            items[day] = (self._key(lounge_id, version, timezone, day), counts.get(day, 0))
+            day += timedelta(days=1)
+        for tier in (self.local, self.shared):
+            if tier is not None:
+                self._set(tier, items, timezone)
+
+    def _set(self, tier, items, timezone):
+        # items: {day: (key, count)}; closed days never expire (except in an unshared
+        # LRU), open ones after the TTL
+        today = local_today(timezone)
+        closed_ttl = self.local_closed_day_ttl if tier is self.local else None
+        tier.set_many({key: count for day, (key, count) in items.items() if day < today}, ttl=closed_ttl)
+        tier.set_many({key: count for day, (key, count) in items.items() if day >= today}, ttl=self.open_day_ttl)
+
+    def invalidate(self, lounge_id, timezone, day):
+        """Forget the count of a day that gained an entry."""
+        if day < local_today(timezone):
+            # Closed days never expire: every worker has to stop reading them
+            self.versions.bump(f'lounge_usage:{lounge_id}')
+            return
+        version = self.version(lounge_id)
+        if version is None:
+            return
+        key = self._key(lounge_id, version, timezone, day)
+        for tier in (self.local, self.shared):
+            if tier is not None:
+                tier.delete_many([key])
+
+    def clear(self):
+        for tier in (self.local, self.shared):
+            if tier is not None:
+                tier.clear()
+
+
+def make_report_cache(config, shared=None):
+    """``shared``: a cross-worker backend (SQLiteCache, RedisCache) for the second tier."""
+    return LoungeUsageCache(
+        LRUCache(config.get('REPORT_CACHE_SIZE', 10000)),
+        shared,
+        open_day_ttl=config.get('REPORT_CACHE_OPEN_DAY_TTL', 5),
+        closed_day_ttl=config.get('REPORT_CACHE_CLOSED_DAY_TTL', 60),
+    )
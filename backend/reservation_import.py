@@ -0,0 +1,217 @@
+"""Bulk reservation import from airline manifest files.
+
+``POST /reservations/import`` and ``flask import-reservations`` read a manifest
+one row at a time and validate each row with the same rules as
+``POST /reservations`` (``parse_reservation``). Manifests are CSV with a header
+row, JSON Lines (one object per line) or a JSON array. The first two are
+streamed; an array is parsed whole.
+
+Valid rows are collected into chunks of ``RESERVATION_IMPORT_CHUNK_SIZE``. Each
+chunk is one transaction: an executemany INSERT of its reservations plus their
+creation events (backend/events.py). An invalid row is reported with its row
+number (1 for the first row after a CSV header) and skipped, and the rest of
+the manifest is still imported. A chunk whose transaction fails is rolled back
+and each of its rows reported; chunks committed before it stay imported.
+
+Flights put many passengers on the same date and time, so date and time
+parsing is memoized.
+"""
+import csv
+import io
+import json
+from datetime import date, time
+from functools import lru_cache
+
+from sqlalchemy import func, insert, select
+
+from backend.events import status_events
+from backend.models import Event, Reservation
+from backend.queries import InvalidParameter
+from backend.timestamps import utc_now
+
+FORMATS = ('csv', 'ndjson', 'json')
+DEFAULT_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+
+_MIMETYPE_FORMATS = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'application/json': 'json',
+}
+_EXTENSION_FORMATS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson', '.json': 'json'}
+
+# Databases the new reservations' ids can be read back from, for their events: RETURNING,
+# or max(id) under SQLite's write lock. Elsewhere ids need not be the newest or
+# contiguous, and the events would point at the wrong reservations
+SUPPORTED_DIALECTS = ('postgresql', 'sqlite')
+UNSUPPORTED_DATABASE_MESSAGE = 'Reservation import supports PostgreSQL and SQLite, not {}.'
+
+MISSING_FIELDS_MESSAGE = 'Missing required fields (passenger_name, flight_number, reservation_date, reservation_time)'
+INVALID_DATE_TIME_MESSAGE = 'Invalid date or time format. Use YYYY-MM-DD for date and HH:MM for time.'
+
+
+class ManifestError(InvalidParameter):
+    """The manifest cannot be read any further (bad encoding, malformed CSV or JSON array)."""
+
+
+@lru_cache(maxsize=4096)
+def _parse_date(text):
+    return date.fromisoformat(text)
+
+
+@lru_cache(maxsize=4096)
+def _parse_time(text):
+    hour, minute = map(int, text.split(':')[:2]) # HH:MM, seconds (if any) are dropped
+    return time(hour, minute)
+
+
+def parse_reservation(data):
+    """Column values of a reservation from a request or manifest row. Raises InvalidParameter."""
+    passenger_name = data.get('passenger_name')
+    flight_number = data.get('flight_number')
+    reservation_date = data.get('reservation_date')
+    reservation_time = data.get('reservation_time')
+    if not all([passenger_name, flight_number, reservation_date, reservation_time]):
+        raise InvalidParameter(MISSING_FIELDS_MESSAGE)
+    try:
+        values = {
+            'passenger_name': passenger_name,
+            'flight_number': flight_number,
+            'reservation_date': _parse_date(reservation_date),
+            'reservation_time': _parse_time(reservation_time),
+        }
+    except (ValueError, TypeError, AttributeError): # Not a string, or not a valid date/time
+        raise InvalidParameter(INVALID_DATE_TIME_MESSAGE)
+
+    number_of_guests = data.get('number_of_guests')
+    if number_of_guests in (None, ''):
+        number_of_guests = 1 # Default to 1 guest
+    elif isinstance(number_of_guests, str) and number_of_guests.strip().isdigit():
+        number_of_guests = int(number_of_guests) # CSV cells are strings
+    if isinstance(number_of_guests, bool) or not isinstance(number_of_guests, int) or number_of_guests < 1:
+        raise InvalidParameter('number_of_guests must be a whole number of at least 1.')
+    values['number_of_guests'] = number_of_guests
+    return values
+
+
+def manifest_format(requested=None, mimetype=None, filename=None):
+    """The manifest format from ``?format=``, else the upload's file name, else the Content-Type.
+    Raises InvalidParameter."""
+    if requested:
+        if requested not in FORMATS:
+            raise InvalidParameter(f'Unknown format {requested!r}. Use one of: {", ".join(FORMATS)}.')
+        return requested
+    if filename:
+        for extension, name in _EXTENSION_FORMATS.items():
+            if filename.lower().endswith(extension):
+                return name
+    if mimetype in _MIMETYPE_FORMATS:
+        return _MIMETYPE_FORMATS[mimetype]
+    raise InvalidParameter(f'Cannot tell the manifest format. Pass format= one of: {", ".join(FORMATS)}.')
+
+
+def read_manifest(stream, format):
+    """(row number, row) for every row of a binary stream; a row that is not an object is None.
+
+    Raises ManifestError when the rest of the manifest cannot be read.
+    """
+    if format == 'json':
+        try:
+            rows = json.load(io.TextIOWrapper(stream, encoding='utf-8-sig'))
+        except ValueError as e: # UnicodeDecodeError included
+            raise ManifestError(f'Invalid JSON: {e}')
+        if not isinstance(rows, list):
+            raise ManifestError('A JSON manifest must be an array of reservations.')
+        for number, row in enumerate(rows, 1):
+            yield number, row if isinstance(row, dict) else None
+        return
+
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='' if format == 'csv' else None)
+    try:
+        if format == 'csv':
+            yield from enumerate(csv.DictReader(text), 1)
+            return
+        number = 0
+        for line in text:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield number, row if isinstance(row, dict) else None
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ManifestError(f'Manifest unreadable: {e}')
+
+
+def _insert_chunk(session, lounge_id, chunk):
+    # One transaction: the chunk's reservations (one executemany) and their creation events
+    rows = [dict(values, lounge_id=lounge_id, status='confirmed') for _, values in chunk]
+    dialect = session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        ids = session.execute(insert(Reservation).returning(Reservation.id), rows).scalars().all()
+    elif dialect == 'sqlite':
+        session.execute(insert(Reservation), rows)
+        # The transaction holds SQLite's write lock from its first INSERT, so no other
+        # writer came in between, and a rowid table (no AUTOINCREMENT) gives each row
+        # max(id) + 1: the rows got the newest ids, one after the other
+        last_id = session.execute(select(func.max(Reservation.id))).scalar()
+        ids = range(last_id - len(rows) + 1, last_id + 1)
+    else:
+        raise NotImplementedError(UNSUPPORTED_DATABASE_MESSAGE.format(dialect))
+    session.execute(insert(Event), status_events(
+        ((reservation_id, lounge_id, None) for reservation_id in ids), 'confirmed', utc_now()))
+    session.commit()
+
+
+def import_reservations(session, rows, lounge_id, chunk_size=DEFAULT_CHUNK_SIZE, max_errors=MAX_REPORTED_ERRORS):
+    """Import ``rows`` ((row number, row) pairs, see read_manifest) into the lounge, committing every chunk.
+
+    Returns ``{'imported', 'failed', 'errors': [{'row', 'message'}], 'errors_truncated'}``,
+    with at most ``max_errors`` errors listed. Raises NotImplementedError, before reading
+    any row, on a database other than PostgreSQL or SQLite.
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect not in SUPPORTED_DIALECTS:
+        raise NotImplementedError(UNSUPPORTED_DATABASE_MESSAGE.format(dialect))
+    result = {'imported': 0, 'failed': 0, 'errors': [], 'errors_truncated': False}
+
+    def fail(number, message):
+        result['failed'] += 1
+        if len(result['errors']) < max_errors:
+            result['errors'].append({'row': number, 'message': message})
+        else:
+            result['errors_truncated'] = True
+
+    def flush(chunk):
+        try:
+            _insert_chunk(session, lounge_id, chunk)
+        except Exception as e:
+            session.rollback()
+            for number, _ in chunk:
+                fail(number, f'Not imported: {e}')
+        else:
+            result['imported'] += len(chunk)
+
+    chunk = []
+    number = 0
+    try:
+        for number, row in rows:
+            if row is None:
+                fail(number, 'Not a reservation object.')
+                continue
+            try:
+                chunk.append((number, parse_reservation(row)))
+            except InvalidParameter as e:
+                fail(number, str(e))
+                continue
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+    except ManifestError as e:
+        fail(number + 1, str(e)) # Where reading stopped; the rows before it are still imported
+    if chunk:
+        flush(chunk)
+    return result
@@ -0,0 +1,115 @@
+"""Reservation status transitions in bulk, and the no-show expiry job.
+
+``PUT /reservations/status`` moves many reservations of the lounge to a new
+status at once. It selects them by ``ids``, or by ``reservation_date`` with an
+optional ``flight_number`` and current ``status``. One transaction does:
+
+- a SELECT of the matching reservations not already in the new status (their
+  previous status goes into the event log), locking them on PostgreSQL,
+- set-based UPDATEs by id, up to ``_UPDATE_IDS`` ids per statement,
+- one executemany INSERT of their ``reservation_status`` events.
+
+``flask expire-reservations`` (run it from cron) marks ``confirmed``
+reservations whose day has passed in the lounge's timezone as ``no_show``.
+It works the same way in chunks of ``--chunk-size`` reservations, one
+transaction each, so the write lock is never held for long. Expired
+reservations leave the ``confirmed`` part of ``ix_reservations_lounge_status_date``,
+so the ``upcoming`` listing, which reads only that part, stays small.
+"""
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import insert, select, update
+
+from backend.events import status_events
+from backend.models import Event, Lounge, Reservation
+from backend.queries import InvalidParameter
+from backend.timestamps import get_timezone, local_today, utc_now
+
+ALLOWED_STATUSES = ('confirmed', 'cancelled', 'completed', 'no_show')
+MAX_BATCH_IDS = 1000
+DEFAULT_CHUNK_SIZE = 1000
+
+# Ids per UPDATE ... WHERE id IN (...), below every database's bound parameter limit
+_UPDATE_IDS = 500
+
+
+def check_status(new_status):
+    """Raises InvalidParameter unless ``new_status`` is one a reservation can have."""
+    if not new_status:
+        raise InvalidParameter('New status is required')
+    if new_status not in ALLOWED_STATUSES:
+        raise InvalidParameter(f'Invalid status. Allowed statuses are: {", ".join(ALLOWED_STATUSES)}')
+
+
+def batch_selector(data):
+    """WHERE clauses picking the reservations of a batch request (besides the lounge). Raises InvalidParameter."""
+    ids = data.get('ids')
+    if ids is not None:
+        if data.get('reservation_date') is not None:
+            raise InvalidParameter('Give either ids or reservation_date, not both.')
+        if not isinstance(ids, list) or not ids or not all(type(i) is int for i in ids):
+            raise InvalidParameter('ids must be a non-empty list of reservation ids.')
+        if len(ids) > MAX_BATCH_IDS:
+            raise InvalidParameter(f'At most {MAX_BATCH_IDS} ids per request.')
+        return [Reservation.id.in_(ids)]
+
+    if not data.get('reservation_date'):
+        raise InvalidParameter('Give ids, or a reservation_date (with optional flight_number and status).')
+    try:
+        selector = [Reservation.reservation_date == date.fromisoformat(data['reservation_date'])]
+    except (ValueError, TypeError):
+        raise InvalidParameter('Invalid reservation_date format. Use YYYY-MM-DD.')
+    if data.get('flight_number'):
+        selector.append(Reservation.flight_number == data['flight_number'])
+    if data.get('status'):
+        check_status(data['status'])
+        selector.append(Reservation.status == data['status'])
+    return selector
+
+
+def change_status(session, lounge_id, selector, new_status, limit=None):
+    """Move the lounge's reservations matching ``selector`` to ``new_status`` and commit.
+
+    Returns the ids changed (reservations already in ``new_status`` are left
+    alone). With ``limit``, changes at most that many, lowest ids first.
+    """
+    candidates = select(Reservation.id, Reservation.lounge_id, Reservation.status)\
+        .where(Reservation.lounge_id == lounge_id, *selector, Reservation.status != new_status)\
+        .order_by(Reservation.id).with_for_update()
+    if limit is not None:
+        candidates = candidates.limit(limit)
+    try:
+        changes = session.execute(candidates).all()
+        ids = [reservation_id for reservation_id, _, _ in changes]
+        for start in range(0, len(ids), _UPDATE_IDS):
+            session.execute(
+                update(Reservation).where(Reservation.id.in_(ids[start:start + _UPDATE_IDS]))
+                .values(status=new_status).execution_options(synchronize_session=False))
+        if changes:
+            session.execute(insert(Event), status_events(changes, new_status, utc_now()))
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return ids
+
+
+def expire_no_shows(session, grace_days=0, chunk_size=DEFAULT_CHUNK_SIZE, pause=0):
+    """Mark confirmed reservations more than ``grace_days`` days past as no_show; returns how many.
+
+    Each lounge's days are its own, and each chunk of ``chunk_size`` is one
+    transaction, with ``pause`` seconds between chunks for other writers.
+    """
+    expired = 0
+    for lounge_id, timezone in session.execute(select(Lounge.id, Lounge.timezone)).all():
+        cutoff = local_today(get_timezone(timezone)) - timedelta(days=grace_days)
+        selector = [Reservation.status == 'confirmed', Reservation.reservation_date < cutoff]
+        while True:
+            ids = change_status(session, lounge_id, selector, 'no_show', limit=chunk_size)
+            expired += len(ids)
+            if len(ids) < chunk_size:
+                break
+            if pause:
+                time.sleep(pause)
+    return expired
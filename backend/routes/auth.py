@@ -1,6 +1,6 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_user, logout_user, login_required, current_user
-from backend.models import User
+from backend.models import User, DEFAULT_LOUNGE_ID
 from backend.database import db_session
 from werkzeug.security import generate_password_hash
 
@@ -18,10 +18,13 @@ def register():
     if User.query.filter_by(username=username).first():
         return jsonify({'message': 'Username already exists'}), 400
 
-    new_user = User(username=username)
+    # Anyone can register, so only into the default lounge: staff of other lounges
+    # are created by an administrator (POST /settings/users)
+    new_user = User(username=username, lounge_id=DEFAULT_LOUNGE_ID)
     new_user.set_password(password) # Hash password
     db_session.add(new_user)
     db_session.commit()
+    current_app.extensions['cache'].invalidate('users', lounge_id=DEFAULT_LOUNGE_ID) # The lounge's user list
 
     return jsonify({'message': 'User created successfully'}), 201
 
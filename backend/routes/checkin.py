@@ -1,11 +1,59 @@
-from flask import Blueprint, request, jsonify
+import concurrent.futures
+
+from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required
 from backend.models import Passenger, LoungeEntry
 from backend.database import db_session
-import datetime
+from backend.commit_queue import get_queue
+from backend.aggregates import record_visit
+from backend.events import record_event
+from backend.overstays import ActiveEntry, get_tracker
+from backend.polling import invalidate
+from backend.tenancy import current_lounge_id, current_lounge_timezone
+from backend.timestamps import parse_timestamp, utc_now
 
 checkin_bp = Blueprint('checkin', __name__, url_prefix='/checkin')
 
+def add_lounge_entry(lounge_id, passenger_name, flight_number, entry_time):
+    """Find or create the passenger in the lounge and add an active entry and its event, without committing.
+
+    Returns the serialized entry; the flush assigns its id.
+    """
+    passenger = Passenger.query.filter_by(lounge_id=lounge_id, name=passenger_name, flight_number=flight_number).first()
+    if not passenger:
+        passenger = Passenger(lounge_id=lounge_id, name=passenger_name, flight_number=flight_number)
+        db_session.add(passenger)
+    record_visit(passenger, entry_time)
+
+    lounge_entry = LoungeEntry(
+        passenger=passenger, # Assign the passenger object, passenger_id is set on flush
+        lounge_id=lounge_id,
+        entry_time=entry_time,
+        status='active'
+    )
+    db_session.add(lounge_entry)
+    db_session.flush()
+    record_event('check_in', lounge_id, lounge_entry.id, entry_time, passenger.id, {'flight_number': flight_number})
+
+    return {
+        'id': lounge_entry.id,
+        'passenger_id': passenger.id,
+        'passenger_name': passenger.name,
+        'flight_number': passenger.flight_number,
+        'entry_time': lounge_entry.entry_time.isoformat(),
+        'status': lounge_entry.status
+    }
+
+def entry_committed(lounge_id, timezone, entry_time, lounge_entry):
+    """Once the entry is committed: dashboards polled from now on include it, and so
+    do the usage report's count of its day and the overstay alerts."""
+    invalidate(lounge_id)
+    current_app.extensions['cache'].invalidate('lounge_entries', lounge_id=lounge_id)
+    current_app.extensions['report_cache'].invalidate(lounge_id, timezone, entry_time.astimezone(timezone).date())
+    get_tracker(current_app).checked_in(ActiveEntry(
+        lounge_entry['id'], lounge_id, entry_time, lounge_entry['passenger_id'],
+        lounge_entry['passenger_name'], lounge_entry['flight_number']))
+
 @checkin_bp.route('', methods=['POST']) # Changed to empty string to match /checkin
 @login_required
 def check_in_passenger():
@@ -21,40 +69,41 @@ def check_in_passenger():
         return jsonify({'message': 'Passenger name and flight number are required'}), 400
 
     try:
-        entry_time = datetime.datetime.fromisoformat(entry_time_str) if entry_time_str else datetime.datetime.utcnow()
+        # Stored in UTC; a time without an offset is taken to be UTC
+        entry_time = parse_timestamp(entry_time_str) if entry_time_str else utc_now()
     except ValueError:
         return jsonify({'message': 'Invalid entry_time format. Use ISO format e.g. YYYY-MM-DDTHH:MM:SS'}), 400
 
-    # Find or create passenger
-    passenger = Passenger.query.filter_by(name=passenger_name, flight_number=flight_number).first()
-    if not passenger:
-        passenger = Passenger(name=passenger_name, flight_number=flight_number)
-        db_session.add(passenger)
-        # Committing here to get passenger.id for LoungeEntry, or can use flush
-        # db_session.flush() 
+    # Read while the request's user is loaded; the group commit writer runs without it
+    lounge_id = current_lounge_id()
+    timezone = current_lounge_timezone()
 
-    # Create LoungeEntry
-    lounge_entry = LoungeEntry(
-        # passenger_id=passenger.id, # This will be set by relationship if configured, or after commit
-        passenger=passenger, # Assign the passenger object
-        entry_time=entry_time,
-        status='active'
-    )
-    db_session.add(lounge_entry)
-
-    try:
-        db_session.commit()
-    except Exception as e:
-        db_session.rollback()
-        return jsonify({'message': 'Failed to check-in passenger', 'error': str(e)}), 500
+    if current_app.config.get('CHECKIN_GROUP_COMMIT'):
+        # Hand the write to the group commit writer; the future resolves only
+        # once the batch containing this check-in has been committed, and the
+        # writer runs entry_committed itself even if this request stops waiting
+        future = get_queue(current_app._get_current_object(), 'checkin_group_commit').submit(
+            lambda: add_lounge_entry(lounge_id, passenger_name, flight_number, entry_time),
+            on_commit=lambda lounge_entry: entry_committed(lounge_id, timezone, entry_time, lounge_entry),
+        )
+        try:
+            lounge_entry = future.result(timeout=current_app.config.get('CHECKIN_GROUP_COMMIT_TIMEOUT', 10))
+        except concurrent.futures.TimeoutError:
+            # Still queued: it will most likely be committed, so a retry would check the passenger in twice
+            return jsonify({'message': 'Check-in accepted but not committed yet; its outcome is unknown. '
+                                       'Check the recent entries before retrying.'}), 202
+        except Exception as e:
+            return jsonify({'message': 'Failed to check-in passenger', 'error': str(e)}), 500
+    else:
+        try:
+            lounge_entry = add_lounge_entry(lounge_id, passenger_name, flight_number, entry_time)
+            db_session.commit()
+        except Exception as e:
+            db_session.rollback()
+            return jsonify({'message': 'Failed to check-in passenger', 'error': str(e)}), 500
+        entry_committed(lounge_id, timezone, entry_time, lounge_entry)
 
     return jsonify({
         'message': 'Passenger checked in successfully',
-        'lounge_entry': {
-            'id': lounge_entry.id,
-            'passenger_name': passenger.name,
-            'flight_number': passenger.flight_number,
-            'entry_time': lounge_entry.entry_time.isoformat(),
-            'status': lounge_entry.status
-        }
+        'lounge_entry': lounge_entry
     }), 201
@@ -1,74 +1,72 @@
-from flask import Blueprint, jsonify
+from datetime import timedelta
+from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required
-from backend.models import LoungeEntry, Passenger
 from backend.database import db_session
-from sqlalchemy import func
-from datetime import datetime, date, timedelta
+from backend.serialization import json_response
+from backend.tenancy import current_lounge_id, current_lounge_timezone
+from backend.timestamps import utc_now
+from backend.overstays import overstay_params, overstays_payload, tracked_entries
+from backend.polling import coalesce, polling_endpoint
+from backend.queries import (
+    InvalidParameter, today_bounds, dashboard_stats_statements, dashboard_stats_cache_key, dashboard_stats_payload,
+    recent_entries_statement, recent_entries_payload
+)
 
 dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/dashboard')
 
+# The statements are shared with the async app (backend/asgi.py), see backend/queries.py.
+# Every terminal polls these: they are rate limited per user, and identical requests
+# of a lounge share one computation (backend/polling.py)
+
 @dashboard_bp.route('/stats', methods=['GET'])
 @login_required
+@polling_endpoint
 def get_dashboard_stats():
-    current_occupancy = LoungeEntry.query.filter_by(status='active').count()
-    
-    today_start = datetime.combine(date.today(), datetime.min.time())
-    today_end = datetime.combine(date.today(), datetime.max.time())
-    
-    total_entries_today = LoungeEntry.query.filter(
-        LoungeEntry.entry_time >= today_start,
-        LoungeEntry.entry_time <= today_end
-    ).count()
+    lounge_id = current_lounge_id()
+    timezone = current_lounge_timezone()
 
-    # Average stay duration (simplified: for entries that ended today)
-    completed_entries_today = LoungeEntry.query.filter(
-        LoungeEntry.status == 'exited',
-        LoungeEntry.exit_time >= today_start,
-        LoungeEntry.exit_time <= today_end,
-        LoungeEntry.entry_time.isnot(None), # Ensure entry_time is not null
-        LoungeEntry.exit_time.isnot(None) # Ensure exit_time is not null
-    ).all()
+    def query():
+        occupancy_stmt, entries_today_stmt, average_stay_stmt = dashboard_stats_statements(
+            lounge_id, *today_bounds(timezone))
+        current_occupancy = db_session.execute(occupancy_stmt).scalar()
+        total_entries_today = db_session.execute(entries_today_stmt).scalar()
+        average_stay_seconds = db_session.execute(average_stay_stmt).scalar()
+        return dashboard_stats_payload(current_occupancy, total_entries_today, average_stay_seconds)
 
-    total_duration_seconds = 0
-    count_for_avg = 0
-    if completed_entries_today:
-        for entry in completed_entries_today:
-            if entry.entry_time and entry.exit_time: # Redundant check, but safe
-                duration = entry.exit_time - entry.entry_time
-                total_duration_seconds += duration.total_seconds()
-                count_for_avg +=1
-    
-    average_stay_duration_minutes = (total_duration_seconds / count_for_avg) / 60 if count_for_avg > 0 else 0
+    def compute():
+        # Cached until the lounge's entries change: shared with the other workers by a shared
+        # cache backend, held for at most CACHE_LRU_TTL seconds by the per-worker 'lru'
+        return current_app.extensions['cache'].get_or_set(dashboard_stats_cache_key(timezone), query,
+                                                          tables=('lounge_entries',), lounge_id=lounge_id)
 
-    return jsonify({
-        'current_occupancy': current_occupancy,
-        'total_entries_today': total_entries_today,
-        'average_stay_duration_minutes': round(average_stay_duration_minutes, 2)
-    }), 200
+    return jsonify(coalesce(lounge_id, compute)), 200
 
 @dashboard_bp.route('/recent-entries', methods=['GET'])
 @login_required
+@polling_endpoint
 def get_recent_entries():
-    # Fetch last 10 entries, joining with Passenger to get names
-    recent_entries_data = db_session.query(
-        LoungeEntry.id,
-        Passenger.name.label('passenger_name'),
-        Passenger.flight_number,
-        LoungeEntry.entry_time,
-        LoungeEntry.status
-    ).join(Passenger, LoungeEntry.passenger_id == Passenger.id)\
-    .order_by(LoungeEntry.entry_time.desc())\
-    .limit(10)\
-    .all()
+    lounge_id = current_lounge_id()
+
+    def compute():
+        # Fetch last 10 entries, joining with Passenger to get names
+        recent_entries_data = db_session.execute(recent_entries_statement(lounge_id, limit=10)).all()
+        return recent_entries_payload(recent_entries_data)
 
-    recent_entries_list = [
-        {
-            'id': entry.id,
-            'passenger_name': entry.passenger_name,
-            'flight_number': entry.flight_number,
-            'entry_time': entry.entry_time.isoformat() if entry.entry_time else None,
-            'status': entry.status
-        } for entry in recent_entries_data
-    ]
+    return json_response(coalesce(lounge_id, compute))
+
+@dashboard_bp.route('/overstays', methods=['GET'])
+@login_required
+@polling_endpoint
+def get_overstays():
+    # Active entries in the lounge for more than `minutes` (OVERSTAY_MINUTES by default), longest first.
+    # Served from the in-memory heaps of backend/overstays.py, loaded on first use and
+    # reloaded per lounge when other workers wrote to its entries
+    try:
+        minutes, limit = overstay_params(request.args, current_app.config['OVERSTAY_MINUTES'])
+    except InvalidParameter as e:
+        return jsonify({'message': str(e)}), 400
 
-    return jsonify(recent_entries_list), 200
+    tracker = tracked_entries(current_app, db_session.connection(), current_lounge_id())
+    now = utc_now()
+    entries = tracker.longest_stays(current_lounge_id(), now - timedelta(minutes=minutes), limit)
+    return json_response(overstays_payload(entries, minutes, now))
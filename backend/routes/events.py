@@ -0,0 +1,25 @@
+from flask import Blueprint, request, jsonify, current_app
+from backend.database import db_session
+from backend.events import NDJSON_MIMETYPE, event_line, events_statement, tail_params
+from backend.queries import InvalidParameter
+from backend.routes.settings import admin_required
+from backend.tenancy import current_lounge_id
+
+events_bp = Blueprint('events', __name__, url_prefix='/events')
+
+@events_bp.route('', methods=['GET'])
+@admin_required # Every passenger movement of the lounge, for analytics consumers
+def tail_events():
+    # The lounge's events after ?after=<id>, one JSON object per line (see backend/events.py).
+    # X-Next-After is the cursor for the next call; an empty body means caught up.
+    try:
+        after, limit = tail_params(request.args)
+    except InvalidParameter as e:
+        return jsonify({'message': str(e)}), 400
+
+    statement = events_statement(after, limit, lounge_id=current_lounge_id(),
+                                 settle_seconds=current_app.config.get('EVENTS_SETTLE_SECONDS', 0))
+    rows = db_session.execute(statement).all()
+    response = current_app.response_class(b''.join(event_line(row) for row in rows), mimetype=NDJSON_MIMETYPE)
+    response.headers['X-Next-After'] = str(rows[-1].id if rows else after)
+    return response
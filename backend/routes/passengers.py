@@ -1,9 +1,20 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required
-from backend.models import Passenger, LoungeEntry
+from backend.models import LoungeEntry, Passenger
 from backend.database import db_session
-from sqlalchemy import or_
-import datetime
+from backend.serialization import json_response
+from backend.aggregates import record_stay, stay_seconds
+from backend.events import record_event
+from backend.overstays import get_tracker
+from backend.polling import invalidate
+from backend.tenancy import current_lounge_id
+from backend.timestamps import parse_timestamp, utc_now
+from backend.queries import (
+    InvalidParameter, passenger_search_statements, passenger_search_payload,
+    passenger_summaries_statement, passenger_summaries_payload,
+    passenger_detail_statement, passenger_detail_payload,
+    passenger_entries_page, passenger_entries_statement, passenger_entries_payload
+)
 
 passengers_bp = Blueprint('passengers', __name__, url_prefix='/passengers')
 
@@ -11,40 +22,48 @@ passengers_bp = Blueprint('passengers', __name__, url_prefix='/passengers')
 @login_required
 def get_passengers():
     search_query = request.args.get('search_query')
-    
-    query = db_session.query(Passenger).join(LoungeEntry)
-
-    if search_query:
-        query = query.filter(
-            or_(
-                Passenger.name.ilike(f"%{search_query}%"),
-                Passenger.flight_number.ilike(f"%{search_query}%")
-            )
-        )
-    
-    # To optimize, consider what fields are truly needed.
-    # This currently fetches all passengers matching and then all their entries.
-    passengers_data = query.order_by(Passenger.name).all()
-    
-    result = []
-    for p in passengers_data:
-        entries = []
-        # N+1 query potential here. If performance is an issue, consider joinedload or subqueryload.
-        for entry in p.lounge_entries:
-            entries.append({
-                'id': entry.id,
-                'entry_time': entry.entry_time.isoformat() if entry.entry_time else None,
-                'exit_time': entry.exit_time.isoformat() if entry.exit_time else None,
-                'status': entry.status
-            })
-        result.append({
-            'id': p.id,
-            'name': p.name,
-            'flight_number': p.flight_number,
-            'lounge_entries': sorted(entries, key=lambda x: x['entry_time'] or '', reverse=True) # Sort entries, most recent first
-        })
-        
-    return jsonify(result), 200
+
+    if request.args.get('view') == 'summary':
+        # Slim rows (visit count, last visit, open entry) without the history;
+        # the history is paged from /passengers/<id>/entries on demand
+        summaries = db_session.execute(passenger_summaries_statement(current_lounge_id(), search_query)).all()
+        return json_response(passenger_summaries_payload(summaries))
+
+    # One query for the passengers and one for all of their entries (most recent
+    # first), instead of lazy-loading each passenger's entries (N+1)
+    passengers_stmt, entries_stmt = passenger_search_statements(current_lounge_id(), search_query)
+    passengers_data = db_session.execute(passengers_stmt).all()
+    entries_data = db_session.execute(entries_stmt).all()
+
+    return json_response(passenger_search_payload(passengers_data, entries_data))
+
+@passengers_bp.route('/<int:passenger_id>', methods=['GET'])
+@login_required
+def get_passenger(passenger_id):
+    # Counts and totals come from the passenger's aggregate columns, not from its entries
+    passenger = db_session.execute(passenger_detail_statement(current_lounge_id(), passenger_id)).first()
+    if passenger is None:
+        return jsonify({'message': 'Passenger not found'}), 404
+
+    return json_response(passenger_detail_payload(passenger))
+
+@passengers_bp.route('/<int:passenger_id>/entries', methods=['GET'])
+@login_required
+def get_passenger_entries(passenger_id):
+    # Most recent first, `limit` at a time; pass back `next_cursor` as `cursor` for the next page
+    try:
+        after, limit = passenger_entries_page(request.args)
+    except InvalidParameter as e:
+        return jsonify({'message': str(e)}), 400
+
+    lounge_id = current_lounge_id()
+    rows = db_session.execute(passenger_entries_statement(lounge_id, passenger_id, after, limit)).all()
+    if not rows:
+        passenger = db_session.get(Passenger, passenger_id)
+        if passenger is None or passenger.lounge_id != lounge_id:
+            return jsonify({'message': 'Passenger not found'}), 404
+
+    return json_response(passenger_entries_payload(rows, limit))
 
 @passengers_bp.route('/<int:entry_id>/exit', methods=['POST'])
 @login_required
@@ -54,25 +73,32 @@ def exit_passenger(entry_id):
 
     lounge_entry = LoungeEntry.query.get(entry_id)
 
-    if not lounge_entry:
+    if not lounge_entry or lounge_entry.lounge_id != current_lounge_id(): # Another lounge's entry is not ours to close
         return jsonify({'message': 'Lounge entry not found'}), 404
 
     if lounge_entry.status == 'exited':
         return jsonify({'message': 'Passenger already exited'}), 400
     
     try:
-        exit_time = datetime.datetime.fromisoformat(exit_time_str) if exit_time_str else datetime.datetime.utcnow()
+        exit_time = parse_timestamp(exit_time_str) if exit_time_str else utc_now()
     except ValueError:
         return jsonify({'message': 'Invalid exit_time format. Use ISO format e.g. YYYY-MM-DDTHH:MM:SS'}), 400
 
     lounge_entry.exit_time = exit_time
     lounge_entry.status = 'exited'
+    lounge_entry.stay_seconds = stay_seconds(lounge_entry.entry_time, exit_time)
+    record_stay(lounge_entry.passenger_id, lounge_entry.stay_seconds)
+    record_event('exit', lounge_entry.lounge_id, lounge_entry.id, exit_time, lounge_entry.passenger_id,
+                 {'stay_seconds': lounge_entry.stay_seconds})
     
     try:
         db_session.commit()
     except Exception as e:
         db_session.rollback()
         return jsonify({'message': 'Failed to update lounge entry', 'error': str(e)}), 500
+    invalidate(lounge_entry.lounge_id)
+    current_app.extensions['cache'].invalidate('lounge_entries', lounge_id=lounge_entry.lounge_id)
+    get_tracker(current_app).exited(lounge_entry.id)
 
     return jsonify({
         'message': 'Passenger exited successfully',
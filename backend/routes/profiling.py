@@ -0,0 +1,32 @@
+from flask import Blueprint, request, jsonify
+from backend.routes.settings import admin_required
+from backend.profiling import profile_for, ProfilerBusy, DEFAULT_INTERVAL, MAX_DURATION
+
+profiling_bp = Blueprint('profiling', __name__, url_prefix='/profiling')
+
+@profiling_bp.route('/sample', methods=['POST'])
+@admin_required # Stacks expose code paths and arguments' shape, admins only
+def sample():
+    # Blocks this request for `seconds` while the rest of the process keeps serving,
+    # so it needs a threaded server (e.g. gunicorn --threads or flask run --with-threads)
+    try:
+        seconds = float(request.args.get('seconds', 5))
+        interval_ms = float(request.args.get('interval_ms', DEFAULT_INTERVAL * 1000))
+    except ValueError:
+        return jsonify({'message': 'seconds and interval_ms must be numbers'}), 400
+
+    if not 0 < seconds <= MAX_DURATION:
+        return jsonify({'message': f'seconds must be between 0 and {MAX_DURATION}'}), 400
+    if not 1 <= interval_ms <= 1000:
+        return jsonify({'message': 'interval_ms must be between 1 and 1000'}), 400
+
+    try:
+        profiler = profile_for(seconds, interval=interval_ms / 1000)
+    except ProfilerBusy as e:
+        return jsonify({'message': str(e)}), 409
+
+    # Collapsed stacks, ready for flamegraph.pl or speedscope
+    return profiler.collapsed(), 200, {
+        'Content-Type': 'text/plain; charset=utf-8',
+        'X-Profile-Samples': str(profiler.samples),
+    }
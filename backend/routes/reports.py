@@ -1,91 +1,67 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required
-from backend.models import LoungeEntry
 from backend.database import db_session
-from sqlalchemy import func, cast, Date as SQLDate # Avoid conflict with Python's Date
-from datetime import datetime, timedelta, date
+from backend.serialization import json_response
+from backend.tenancy import current_lounge_id, current_lounge_timezone
+from backend.timestamps import local_range_bounds
+from backend.queries import (
+    InvalidParameter, lounge_usage_range, lounge_usage_statement, lounge_usage_counts, lounge_usage_payload,
+    top_passengers_limit, top_passengers_statement, top_passengers_payload,
+    dwell_bucket_edges, flight_counts_statement, flight_dwell_statement, flight_report_payload
+)
 
 reports_bp = Blueprint('reports', __name__, url_prefix='/reports')
 
 @reports_bp.route('/lounge-usage', methods=['GET'])
 @login_required
 def get_lounge_usage_report():
-    date_range_param = request.args.get('date_range', 'last_7_days') # Default to last 7 days
-    start_date_str = request.args.get('start_date')
-    end_date_str = request.args.get('end_date')
+    # Accepts date_range (last_7_days, last_30_days) or start_date/end_date (YYYY-MM-DD), in lounge-local days
+    timezone = current_lounge_timezone()
+    try:
+        start_date, end_date = lounge_usage_range(request.args, timezone)
+    except InvalidParameter as e:
+        return jsonify({'message': str(e)}), 400
 
-    end_date = datetime.utcnow().date() 
-    if end_date_str:
-        try:
-            end_date = datetime.fromisoformat(end_date_str).date()
-        except ValueError:
-            return jsonify({'message': 'Invalid end_date format. Use YYYY-MM-DD.'}), 400
-    
-    # Ensure end_date includes the entire day by setting time to end of day for comparisons
-    end_datetime_for_query = datetime.combine(end_date, datetime.max.time())
+    # Days counted before come from the cache (backend/report_cache.py); one query covers the rest
+    lounge_id = current_lounge_id()
+    cache = current_app.extensions['report_cache']
+    counts, missing, version = cache.lookup(lounge_id, timezone, start_date, end_date)
+    if missing is not None:
+        start, end = local_range_bounds(timezone, *missing)
+        usage_data = db_session.execute(lounge_usage_statement(lounge_id, start, end)).all()
+        computed = lounge_usage_counts(usage_data, timezone)
+        cache.store(lounge_id, timezone, *missing, computed, version)
+        counts.update(computed)
 
+    # Missing dates are filled with 0 entries so the frontend chart is consistent
+    return json_response(lounge_usage_payload(start_date, end_date, counts))
 
-    if start_date_str:
-        try:
-            start_date = datetime.fromisoformat(start_date_str).date()
-        except ValueError:
-            return jsonify({'message': 'Invalid start_date format. Use YYYY-MM-DD.'}), 400
-    elif date_range_param == 'last_7_days':
-        start_date = end_date - timedelta(days=6) # 7 days including today
-    elif date_range_param == 'last_30_days':
-        start_date = end_date - timedelta(days=29) # 30 days including today
-    elif date_range_param == 'specific_month': # Example, you might need year and month params
-        # This would need year and month parameters. For simplicity, not fully implemented.
-        # For now, specific_month will just default to last 30 days.
-        # start_date = datetime(end_date.year, end_date.month, 1).date()
-        return jsonify({'message': 'Specific month not fully implemented, use start/end dates or other ranges.'}), 400
-    else: # Default to last 7 days if invalid range_param and no start_date
-        start_date = end_date - timedelta(days=6)
-
-    # Ensure start_date has time at the beginning of the day for comparisons
-    start_datetime_for_query = datetime.combine(start_date, datetime.min.time())
+@reports_bp.route('/top-passengers', methods=['GET'])
+@login_required
+def get_top_passengers_report():
+    # Most frequent visitors (ties broken by total time in the lounge), `limit` rows
+    try:
+        limit = top_passengers_limit(request.args)
+    except InvalidParameter as e:
+        return jsonify({'message': str(e)}), 400
 
-    # Query to group entries by date and count them
-    # Using cast to SQLDate to group by date part of datetime field
-    usage_data = db_session.query(
-            cast(LoungeEntry.entry_time, SQLDate).label('entry_date'),
-            func.count(LoungeEntry.id).label('total_entries')
-        ).filter(
-            LoungeEntry.entry_time >= start_datetime_for_query,
-            LoungeEntry.entry_time <= end_datetime_for_query
-        ).group_by(
-            cast(LoungeEntry.entry_time, SQLDate)
-        ).order_by(
-            cast(LoungeEntry.entry_time, SQLDate)
-        ).all()
+    rows = db_session.execute(top_passengers_statement(current_lounge_id(), limit)).all()
+    return json_response(top_passengers_payload(rows))
 
-    # Format data for response
-    report_data = [
-        {
-            'date': entry.entry_date.isoformat(), 
-            'total_entries': entry.total_entries
-        } for entry in usage_data
-    ]
-    
-    # Fill in missing dates with 0 entries
-    # This makes the chart on the frontend more consistent.
-    # Create a dictionary from the report_data for quick lookups
-    data_map = {item['date']: item['total_entries'] for item in report_data}
-    
-    # Iterate from start_date to end_date
-    current_date = start_date
-    final_report = []
-    while current_date <= end_date:
-        iso_date = current_date.isoformat()
-        final_report.append({
-            'date': iso_date,
-            'total_entries': data_map.get(iso_date, 0) # Get count or 0 if not present
-        })
-        current_date += timedelta(days=1)
+@reports_bp.route('/flights', methods=['GET'])
+@login_required
+def get_flights_report():
+    # Same date parameters as /lounge-usage; `buckets=15,30,60` sets the histogram bounds (minutes)
+    timezone = current_lounge_timezone()
+    try:
+        start_date, end_date = lounge_usage_range(request.args, timezone)
+        edges = dwell_bucket_edges(request.args)
+    except InvalidParameter as e:
+        return jsonify({'message': str(e)}), 400
 
-    return jsonify({
-        'report_name': 'Lounge Usage Over Time',
-        'start_date': start_date.isoformat(),
-        'end_date': end_date.isoformat(),
-        'data': final_report
-    }), 200
+    # Counts come from one grouped query; dwell times are bucketed in bulk (backend/analytics.py)
+    lounge_id = current_lounge_id()
+    start, end = local_range_bounds(timezone, start_date, end_date)
+    count_rows = db_session.execute(flight_counts_statement(lounge_id, start, end)).all()
+    dwell_rows = db_session.execute(flight_dwell_statement(lounge_id, start, end)).all()
+    return json_response(flight_report_payload(start_date, end_date, count_rows, dwell_rows, edges))
@@ -1,8 +1,15 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required
+from sqlalchemy import select
 from backend.models import Reservation
 from backend.database import db_session
-from datetime import datetime, date, time # Ensure time is imported
+from backend.events import record_event
+from backend.queries import InvalidParameter
+from backend.reservation_import import import_reservations, manifest_format, parse_reservation, read_manifest
+from backend.serialization import RowSerializer, json_response
+from backend.reservation_status import batch_selector, change_status, check_status
+from backend.tenancy import current_lounge_id, current_lounge_timezone
+from backend.timestamps import local_today, utc_now
 
 reservations_bp = Blueprint('reservations', __name__, url_prefix='/reservations')
 
@@ -10,33 +17,17 @@ reservations_bp = Blueprint('reservations', __name__, url_prefix='/reservations'
 @login_required
 def create_reservation():
     data = request.get_json()
-    passenger_name = data.get('passenger_name')
-    flight_number = data.get('flight_number')
-    reservation_date_str = data.get('reservation_date')
-    reservation_time_str = data.get('reservation_time')
-    number_of_guests = data.get('number_of_guests', 1) # Default to 1 guest
-
-    if not all([passenger_name, flight_number, reservation_date_str, reservation_time_str]):
-        return jsonify({'message': 'Missing required fields (passenger_name, flight_number, reservation_date, reservation_time)'}), 400
-
     try:
-        reservation_date = date.fromisoformat(reservation_date_str)
-        # Correctly parse time string that might include HH:MM or HH:MM:SS
-        hour, minute = map(int, reservation_time_str.split(':')[:2]) # Take only HH:MM part
-        reservation_time = time(hour, minute)
-    except ValueError:
-        return jsonify({'message': 'Invalid date or time format. Use YYYY-MM-DD for date and HH:MM for time.'}), 400
-
-    new_reservation = Reservation(
-        passenger_name=passenger_name,
-        flight_number=flight_number,
-        reservation_date=reservation_date,
-        reservation_time=reservation_time,
-        number_of_guests=number_of_guests,
-        status='confirmed'
-    )
+        values = parse_reservation(data)
+    except InvalidParameter as e:
+        return jsonify({'message': str(e)}), 400
+
+    new_reservation = Reservation(**values, status='confirmed', lounge_id=current_lounge_id())
     db_session.add(new_reservation)
     try:
+        db_session.flush() # Assigns the id the event refers to
+        record_event('reservation_status', new_reservation.lounge_id, new_reservation.id, utc_now(),
+                     data={'from': None, 'to': new_reservation.status})
         db_session.commit()
     except Exception as e:
         db_session.rollback()
@@ -55,62 +46,105 @@ def create_reservation():
         }
     }), 201
 
+@reservations_bp.route('/import', methods=['POST'])
+@login_required
+def import_reservations_manifest():
+    # The manifest is the request body, or the `file` of a multipart upload (see backend/reservation_import.py)
+    upload = request.files.get('file') if request.mimetype == 'multipart/form-data' else None
+    if request.mimetype == 'multipart/form-data' and upload is None:
+        return jsonify({'message': 'Upload the manifest as the file field'}), 400
+    try:
+        manifest = manifest_format(request.args.get('format'), request.mimetype, upload.filename if upload else None)
+    except InvalidParameter as e:
+        return jsonify({'message': str(e)}), 400
+
+    try:
+        result = import_reservations(
+            db_session, read_manifest(upload.stream if upload else request.stream, manifest), current_lounge_id(),
+            chunk_size=current_app.config.get('RESERVATION_IMPORT_CHUNK_SIZE', 5000)
+        )
+    except NotImplementedError as e:
+        return jsonify({'message': str(e)}), 501
+    return json_response(result)
+
+@reservations_bp.route('/status', methods=['PUT'])
+@login_required
+def update_reservation_statuses():
+    # Many reservations at once, by ids or by date (+ flight, + current status); see backend/reservation_status.py
+    data = request.get_json() or {}
+    new_status = data.get('new_status')
+    try:
+        check_status(new_status)
+        selector = batch_selector(data)
+    except InvalidParameter as e:
+        return jsonify({'message': str(e)}), 400
+
+    try:
+        ids = change_status(db_session, current_lounge_id(), selector, new_status)
+    except Exception as e:
+        return jsonify({'message': 'Failed to update reservation statuses', 'error': str(e)}), 500
+
+    return jsonify({
+        'message': f'{len(ids)} reservations updated',
+        'new_status': new_status,
+        'updated_ids': ids
+    }), 200
+
 @reservations_bp.route('', methods=['GET']) # Changed to empty string to match /reservations
 @login_required
 def get_reservations():
     status_filter = request.args.get('status_filter') # e.g., 'upcoming', 'past', 'cancelled'
     
-    query = Reservation.query
-    today = date.today()
+    # Plain columns instead of ORM objects: the rows go straight to the JSON encoder
+    query = select(
+        Reservation.id,
+        Reservation.passenger_name,
+        Reservation.flight_number,
+        Reservation.reservation_date,
+        Reservation.reservation_time,
+        Reservation.number_of_guests,
+        Reservation.status
+    ).where(Reservation.lounge_id == current_lounge_id()) # Leading column of ix_reservations_lounge_date
+    today = local_today(current_lounge_timezone()) # Reservation dates are the lounge's local days
 
     if status_filter == 'upcoming':
-        query = query.filter(
+        # ix_reservations_lounge_status_date: only the confirmed ones, which the no-show expiry keeps current
+        query = query.where(
             Reservation.reservation_date >= today,
             Reservation.status == 'confirmed'
         )
     elif status_filter == 'past':
-        query = query.filter(
+        query = query.where(
             Reservation.reservation_date < today,
             # Or include 'completed' and 'confirmed' from past dates
             # (Reservation.status == 'completed') | ((Reservation.status == 'confirmed') & (Reservation.reservation_date < today))
         )
     elif status_filter == 'cancelled':
-        query = query.filter(Reservation.status == 'cancelled')
+        query = query.where(Reservation.status == 'cancelled')
     # No filter or unknown filter returns all reservations
     
-    reservations_data = query.order_by(Reservation.reservation_date.desc(), Reservation.reservation_time.desc()).all()
-
-    result = [
-        {
-            'id': r.id,
-            'passenger_name': r.passenger_name,
-            'flight_number': r.flight_number,
-            'reservation_date': r.reservation_date.isoformat(),
-            'reservation_time': r.reservation_time.isoformat(),
-            'number_of_guests': r.number_of_guests,
-            'status': r.status
-        } for r in reservations_data
-    ]
-    return jsonify(result), 200
+    query = query.order_by(Reservation.reservation_date.desc(), Reservation.reservation_time.desc())
+    reservations_data = db_session.execute(query).all()
+
+    return json_response(RowSerializer.for_statement(query)(reservations_data))
 
 @reservations_bp.route('/<int:reservation_id>/status', methods=['PUT'])
 @login_required
 def update_reservation_status(reservation_id):
     data = request.get_json()
     new_status = data.get('new_status')
-
-    if not new_status:
-        return jsonify({'message': 'New status is required'}), 400
-    
-    # Validate new_status if necessary (e.g., against a list of allowed statuses)
-    allowed_statuses = ['confirmed', 'cancelled', 'completed']
-    if new_status not in allowed_statuses:
-        return jsonify({'message': f'Invalid status. Allowed statuses are: {", ".join(allowed_statuses)}'}), 400
+    try:
+        check_status(new_status)
+    except InvalidParameter as e:
+        return jsonify({'message': str(e)}), 400
 
     reservation = Reservation.query.get(reservation_id)
-    if not reservation:
+    if not reservation or reservation.lounge_id != current_lounge_id():
         return jsonify({'message': 'Reservation not found'}), 404
 
+    if reservation.status != new_status:
+        record_event('reservation_status', reservation.lounge_id, reservation.id, utc_now(),
+                     data={'from': reservation.status, 'to': new_status})
     reservation.status = new_status
     try:
         db_session.commit()
@@ -1,7 +1,10 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required, current_user # current_user for role checks
-from backend.models import LoungeSetting, User
+from backend.models import DEFAULT_LOUNGE_ID, Lounge, LoungeSetting, User
 from backend.database import db_session
+from backend.tenancy import current_lounge_id
+from backend.polling import invalidate
+from backend.timestamps import DEFAULT_TIMEZONE, get_timezone
 from werkzeug.security import generate_password_hash
 
 settings_bp = Blueprint('settings', __name__, url_prefix='/settings')
@@ -16,33 +19,55 @@ def admin_required(fn):
     wrapper.__name__ = fn.__name__ # Preserve original function name for Flask
     return wrapper
 
+# Reads go through the app's cache (backend/cache.py), keyed on the versions of the
+# tables they read; every write below bumps the version of the table it changed
+
 @settings_bp.route('/lounge', methods=['GET'])
 @login_required # All settings routes should require login
 def get_lounge_settings():
-    settings = LoungeSetting.query.first()
-    if not settings:
-        # Return default settings if none are in the DB
-        return jsonify({
-            'lounge_name': 'Prima Vista Lounge',
-            'lounge_address': '',
-            'lounge_capacity': 0,
-            'entry_tracking_method': 'manual'
-        }), 200
-    return jsonify({
-        'id': settings.id,
-        'lounge_name': settings.lounge_name,
-        'lounge_address': settings.lounge_address,
-        'lounge_capacity': settings.lounge_capacity,
-        'entry_tracking_method': settings.entry_tracking_method
-    }), 200
+    lounge_id = current_lounge_id()
+    timezone = current_user.lounge.timezone if current_user.lounge else DEFAULT_TIMEZONE
+
+    def compute():
+        settings = LoungeSetting.query.filter_by(lounge_id=lounge_id).first()
+        if not settings:
+            # Return default settings if none are in the DB
+            return {
+                'lounge_name': 'Prima Vista Lounge',
+                'lounge_address': '',
+                'lounge_capacity': 0,
+                'entry_tracking_method': 'manual',
+                'timezone': timezone
+            }
+        return {
+            'id': settings.id,
+            'lounge_name': settings.lounge_name,
+            'lounge_address': settings.lounge_address,
+            'lounge_capacity': settings.lounge_capacity,
+            'entry_tracking_method': settings.entry_tracking_method,
+            'timezone': timezone
+        }
+
+    cache = current_app.extensions['cache']
+    return jsonify(cache.get_or_set('settings.lounge', compute, tables=('lounge_settings', 'lounges'),
+                                    lounge_id=lounge_id)), 200
 
 @settings_bp.route('/lounge', methods=['POST'])
 @admin_required # Modifying settings should be admin-only
 def update_lounge_settings():
     data = request.get_json()
-    settings = LoungeSetting.query.first()
+    lounge_id = current_lounge_id()
+    if 'timezone' in data:
+        # The lounge's timezone decides what "today" and report days mean
+        try:
+            get_timezone(data['timezone'])
+        except (TypeError, ValueError):
+            return jsonify({'message': 'Invalid timezone. Use an IANA name such as Europe/Rome.'}), 400
+        current_user.lounge.timezone = data['timezone']
+
+    settings = LoungeSetting.query.filter_by(lounge_id=lounge_id).first()
     if not settings:
-        settings = LoungeSetting() # Create new if none exist
+        settings = LoungeSetting(lounge_id=lounge_id) # Create new if none exist
         db_session.add(settings)
 
     settings.lounge_name = data.get('lounge_name', settings.lounge_name)
@@ -55,19 +80,28 @@ def update_lounge_settings():
     except Exception as e:
         db_session.rollback()
         return jsonify({'message': 'Failed to update lounge settings', 'error': str(e)}), 500
+    current_app.extensions['cache'].invalidate('lounge_settings', 'lounges', lounge_id=lounge_id)
+    if 'timezone' in data:
+        invalidate(lounge_id) # "Today" on the dashboard has moved
     return jsonify({'message': 'Lounge settings updated successfully'}), 200
 
 @settings_bp.route('/users', methods=['GET'])
 @admin_required # Viewing all users should be admin-only
 def get_users():
-    users = User.query.all()
-    users_data = [{
-        'id': user.id, 
-        'username': user.username, 
-        'role': user.role
-        # Add 'is_active' if implemented in User model
-        # 'is_active': user.is_active 
-    } for user in users]
+    lounge_id = current_lounge_id()
+
+    def compute():
+        users = User.query.filter_by(lounge_id=lounge_id).all()
+        return [{
+            'id': user.id, 
+            'username': user.username, 
+            'role': user.role
+            # Add 'is_active' if implemented in User model
+            # 'is_active': user.is_active 
+        } for user in users]
+
+    users_data = current_app.extensions['cache'].get_or_set('settings.users', compute, tables=('users',),
+                                                            lounge_id=lounge_id)
     return jsonify(users_data), 200
 
 @settings_bp.route('/users', methods=['POST'])
@@ -77,13 +111,20 @@ def create_user():
     username = data.get('username')
     password = data.get('password')
     role = data.get('role', 'staff') # Default role to 'staff'
+    lounge_id = data.get('lounge_id', current_lounge_id()) # Staff of the admin's own lounge by default
 
     if not username or not password:
         return jsonify({'message': 'Username and password are required'}), 400
+    if lounge_id != current_lounge_id():
+        # Only the deployment's own administrators (of the default lounge) staff other lounges
+        if current_lounge_id() != DEFAULT_LOUNGE_ID:
+            return jsonify({'message': 'Admin access to the default lounge required'}), 403
+        if not isinstance(lounge_id, int) or db_session.get(Lounge, lounge_id) is None:
+            return jsonify({'message': 'Unknown lounge'}), 400
     if User.query.filter_by(username=username).first():
         return jsonify({'message': 'Username already exists'}), 400
 
-    new_user = User(username=username, role=role)
+    new_user = User(username=username, role=role, lounge_id=lounge_id)
     new_user.set_password(password) # Hashes the password
     # If User model has 'is_active', set it here: new_user.is_active = True
     
@@ -93,6 +134,7 @@ def create_user():
     except Exception as e:
         db_session.rollback()
         return jsonify({'message': 'Failed to create user', 'error': str(e)}), 500
+    current_app.extensions['cache'].invalidate('users', lounge_id=new_user.lounge_id)
         
     return jsonify({
         'message': 'User created successfully',
@@ -103,7 +145,7 @@ def create_user():
 @admin_required # Updating users should be admin-only
 def update_user(user_id):
     user = User.query.get(user_id)
-    if not user:
+    if not user or user.lounge_id != current_lounge_id():
         return jsonify({'message': 'User not found'}), 404
 
     data = request.get_json()
@@ -120,6 +162,7 @@ def update_user(user_id):
     except Exception as e:
         db_session.rollback()
         return jsonify({'message': 'Failed to update user', 'error': str(e)}), 500
+    current_app.extensions['cache'].invalidate('users', lounge_id=user.lounge_id)
 
     return jsonify({
         'message': 'User updated successfully',
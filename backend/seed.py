@@ -0,0 +1,204 @@
+"""Bulk generation of synthetic lounge data.
+
+Rows are built as plain dicts and written with Core ``insert()`` executemany
+in fixed-size chunks, one transaction per chunk. This bypasses the ORM unit of
+work entirely, which is what makes seeding millions of rows practical.
+"""
+import datetime
+import math
+import random
+
+from sqlalchemy import func, insert, select
+
+from backend.aggregates import rebuild_passenger_aggregates, stay_seconds
+from backend.events import log_entries, log_reservations
+from backend.models import DEFAULT_LOUNGE_ID, Lounge, LoungeEntry, Passenger, Reservation
+from backend.tenancy import ensure_default_lounge
+
+DEFAULT_CHUNK_SIZE = 10000
+
+FIRST_NAMES = [
+    'Anna', 'Marco', 'Giulia', 'Luca', 'Sofia', 'Matteo', 'Elena', 'Davide',
+    'Chiara', 'Paolo', 'Sara', 'Andrea', 'Laura', 'Stefano', 'Martina', 'John',
+    'Emma', 'Oliver', 'Mia', 'Noah', 'Lea', 'Hans', 'Ingrid', 'Pierre', 'Amelie',
+]
+LAST_NAMES = [
+    'Rossi', 'Russo', 'Ferrari', 'Esposito', 'Bianchi', 'Romano', 'Colombo',
+    'Ricci', 'Marino', 'Greco', 'Bruno', 'Gallo', 'Conti', 'De Luca', 'Smith',
+    'Johnson', 'Brown', 'Muller', 'Schmidt', 'Martin', 'Bernard', 'Dubois',
+]
+AIRLINE_CODES = ['AZ', 'LH', 'AF', 'BA', 'KL', 'IB', 'LX', 'OS', 'SN', 'TP']
+
+# Departure banks (local minutes after midnight) and their share of the day's traffic.
+# Lounge traffic follows these waves rather than being spread evenly over the day.
+DEPARTURE_WAVES = [(6 * 60 + 30, 0.22), (9 * 60, 0.18), (12 * 60 + 30, 0.17), (16 * 60, 0.18), (19 * 60 + 30, 0.25)]
+WAVE_SPREAD_MINUTES = 35
+# Guests arrive roughly this long before departure; stays are log-normal around ~75 minutes
+ARRIVAL_LEAD_MINUTES = 110
+STAY_MEDIAN_MINUTES = 75
+STAY_SIGMA = 0.45
+MIN_STAY_MINUTES, MAX_STAY_MINUTES = 10, 360
+FLIGHTS_PER_WAVE = 40
+
+
+def _chunked_insert(connection, table, rows, chunk_size):
+    # executemany with a list of dicts -> a single prepared statement per chunk
+    buffer = []
+    total = 0
+    for row in rows:
+        buffer.append(row)
+        if len(buffer) >= chunk_size:
+            with connection.begin():
+                connection.execute(insert(table), buffer)
+            total += len(buffer)
+            buffer = []
+    if buffer:
+        with connection.begin():
+            connection.execute(insert(table), buffer)
+        total += len(buffer)
+    return total
+
+
+def _next_id(connection, model):
+    return connection.execute(select(func.coalesce(func.max(model.id), 0))).scalar() + 1
+
+
+def build_schedule(rng):
+    """A fixed set of flight numbers per departure wave, so flights repeat day to day."""
+    return [
+        [f'{rng.choice(AIRLINE_CODES)}{rng.randint(100, 9999)}' for _ in range(FLIGHTS_PER_WAVE)]
+        for _ in DEPARTURE_WAVES
+    ]
+
+
+def _pick_wave(rng):
+    roll = rng.random()
+    for index, (_, share) in enumerate(DEPARTURE_WAVES):
+        roll -= share
+        if roll <= 0:
+            return index
+    return len(DEPARTURE_WAVES) - 1
+
+
+def _stay_minutes(rng):
+    minutes = rng.lognormvariate(math.log(STAY_MEDIAN_MINUTES), STAY_SIGMA)
+    return min(MAX_STAY_MINUTES, max(MIN_STAY_MINUTES, minutes))
+
+
+def ensure_lounges(connection, count):
+    """Make sure lounges 1..count exist (the default lounge plus generated ones); returns their ids."""
+    ensure_default_lounge(connection)
+    existing = set(connection.execute(select(Lounge.id)).scalars())
+    missing = [
+        {'id': lounge_id, 'code': f'LNG-{lounge_id}', 'name': f'Lounge {lounge_id}'}
+        for lounge_id in range(DEFAULT_LOUNGE_ID, DEFAULT_LOUNGE_ID + count) if lounge_id not in existing
+    ]
+    if missing:
+        connection.execute(insert(Lounge), missing)
+    return list(range(DEFAULT_LOUNGE_ID, DEFAULT_LOUNGE_ID + count))
+
+
+def generate_passengers(count, rng, schedule, lounge_ids=(DEFAULT_LOUNGE_ID,)):
+    for index in range(count):
+        yield {
+            'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+            'flight_number': rng.choice(rng.choice(schedule)),
+            'lounge_id': lounge_ids[index % len(lounge_ids)], # Round robin, so ids map back to lounges
+        }
+
+
+def generate_entries(count, passengers, rng, days=365, now=None):
+    """Entries for ``passengers``, a sequence of (passenger id, lounge id) pairs."""
+    now = now or datetime.datetime.utcnow()
+    first_day = datetime.datetime.combine(now.date(), datetime.time.min) - datetime.timedelta(days=days - 1)
+    passenger_count = len(passengers)
+    for _ in range(count):
+        departure_minute = DEPARTURE_WAVES[_pick_wave(rng)][0] + rng.gauss(0, WAVE_SPREAD_MINUTES)
+        arrival_minute = departure_minute - ARRIVAL_LEAD_MINUTES + rng.gauss(0, 20)
+        entry_time = first_day + datetime.timedelta(days=rng.randrange(days), minutes=arrival_minute)
+        if entry_time > now:
+            # Today's later waves have not happened yet; fold them back a day
+            entry_time -= datetime.timedelta(days=1)
+        exit_time = entry_time + datetime.timedelta(minutes=_stay_minutes(rng))
+        exited = exit_time <= now
+        # Squaring skews visits towards low ids: a minority of frequent flyers
+        # accounts for most of the entries, as in a real lounge.
+        passenger_id, lounge_id = passengers[int(passenger_count * rng.random() ** 2)]
+        yield {
+            'passenger_id': passenger_id,
+            'lounge_id': lounge_id, # An entry belongs to its passenger's lounge
+            'entry_time': entry_time,
+            'exit_time': exit_time if exited else None,
+            'stay_seconds': stay_seconds(entry_time, exit_time) if exited else None,
+            'status': 'exited' if exited else 'active',
+        }
+
+
+def generate_reservations(count, rng, schedule, days=60, today=None, lounge_ids=(DEFAULT_LOUNGE_ID,)):
+    today = today or datetime.date.today()
+    for _ in range(count):
+        wave = _pick_wave(rng)
+        reservation_date = today + datetime.timedelta(days=rng.randint(-days, days))
+        if reservation_date < today:
+            status = rng.choice(['completed', 'completed', 'completed', 'cancelled'])
+        else:
+            status = rng.choice(['confirmed', 'confirmed', 'confirmed', 'cancelled'])
+        # Reservations are booked on the quarter hour ahead of the flight's wave
+        arrival_minute = int(DEPARTURE_WAVES[wave][0] - ARRIVAL_LEAD_MINUTES) // 15 * 15
+        yield {
+            'passenger_name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+            'flight_number': rng.choice(schedule[wave]),
+            'reservation_date': reservation_date,
+            'reservation_time': datetime.time(arrival_minute // 60, arrival_minute % 60),
+            'number_of_guests': rng.choice([1, 1, 1, 2, 2, 3, 4]),
+            'status': status,
+            'lounge_id': rng.choice(lounge_ids),
+        }
+
+
+def seed_database(engine, entries=0, passengers=0, reservations=0,
+                  chunk_size=DEFAULT_CHUNK_SIZE, days=365, seed=None, lounges=1):
+    """Append synthetic rows to an existing schema and return the row counts written.
+
+    Entries are spread over the last ``days`` days following the departure waves
+    above; passing the same ``seed`` reproduces the same dataset. New passengers
+    and reservations are spread over ``lounges`` lounges (created if missing).
+    """
+    if lounges < 1:
+        raise ValueError('At least one lounge is required')
+    rng = random.Random(seed)
+    schedule = build_schedule(rng)
+    counts = {'passengers': 0, 'lounge_entries': 0, 'reservations': 0}
+
+    with engine.connect() as connection:
+        with connection.begin():
+            lounge_ids = ensure_lounges(connection, lounges)
+
+        # Entries reference passengers, so either create some or reuse what is there
+        first_id = _next_id(connection, Passenger)
+        counts['passengers'] = _chunked_insert(
+            connection, Passenger.__table__, generate_passengers(passengers, rng, schedule, lounge_ids), chunk_size)
+
+        if entries:
+            if counts['passengers']:
+                passenger_lounges = [
+                    (first_id + index, lounge_ids[index % len(lounge_ids)]) for index in range(counts['passengers'])
+                ]
+            else:
+                passenger_lounges = connection.execute(select(Passenger.id, Passenger.lounge_id)).all()
+            if not passenger_lounges:
+                raise ValueError('Cannot seed lounge entries without any passengers')
+            first_entry_id = _next_id(connection, LoungeEntry)
+            counts['lounge_entries'] = _chunked_insert(
+                connection, LoungeEntry.__table__, generate_entries(entries, passenger_lounges, rng, days=days), chunk_size)
+            # Bulk inserts skip check-in, which maintains the per-passenger aggregates and the event log
+            rebuild_passenger_aggregates(connection, chunk_size)
+            log_entries(connection, first_entry_id, _next_id(connection, LoungeEntry) - 1, chunk_size)
+
+        first_reservation_id = _next_id(connection, Reservation)
+        counts['reservations'] = _chunked_insert(
+            connection, Reservation.__table__, generate_reservations(reservations, rng, schedule, lounge_ids=lounge_ids), chunk_size)
+        if counts['reservations']:
+            log_reservations(connection, first_reservation_id, _next_id(connection, Reservation) - 1, chunk_size)
+
+    return counts
@@ -0,0 +1,93 @@
+"""JSON encoding for API responses.
+
+Large list responses (passenger search, reservations, reports) used to build a
+dict per row, call ``isoformat()`` on every date field and hand the result to
+``jsonify``. Most of that CPU went on Python-level formatting. Here the views
+pass native values (``datetime``, ``date``, ``time``) straight to a JSON
+provider that encodes them itself:
+
+- ``orjson`` (when installed) encodes datetimes natively in C,
+- ``stdlib`` falls back to ``json`` with a ``default`` hook.
+
+Both produce the same ISO 8601 strings the views used to build by hand. The
+provider is chosen by ``JSON_PROVIDER`` in the app config (``'auto'`` picks
+orjson if it is importable) and lives in ``app.extensions['json_provider']``.
+"""
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from flask import current_app
+
+try:
+    import orjson
+except ImportError: # Optional dependency, see requirements.txt
+    orjson = None
+
+
+def _default(value):
+    # Types neither encoder handles on its own (orjson already covers datetimes)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+class StdlibJSONProvider:
+    name = 'stdlib'
+
+    def dumps(self, obj):
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class OrjsonProvider:
+    name = 'orjson'
+
+    def dumps(self, obj):
+        return orjson.dumps(obj, default=_default)
+
+
+def make_provider(name='auto'):
+    if name == 'auto':
+        name = 'orjson' if orjson is not None else 'stdlib'
+    if name == 'orjson':
+        if orjson is None:
+            raise ValueError('JSON_PROVIDER is "orjson" but orjson is not installed')
+        return OrjsonProvider()
+    if name == 'stdlib':
+        return StdlibJSONProvider()
+    raise ValueError(f'Unknown JSON_PROVIDER {name!r} (expected "auto", "orjson" or "stdlib")')
+
+
+def dumps(obj):
+    """Encode ``obj`` with the current app's provider (bytes)."""
+    return current_app.extensions['json_provider'].dumps(obj)
+
+
+def json_response(payload, status=200):
+    """Like ``jsonify(payload), status`` but encoded by the app's JSON provider."""
+    return current_app.response_class(dumps(payload), status=status, mimetype='application/json')
+
+
+class RowSerializer:
+    """Turn SQLAlchemy Core rows into the list-of-objects shape the API returns.
+
+    ``fields`` are the output keys, in the order of the selected columns. Values
+    are passed through untouched (dates included) for the JSON provider to
+    encode, so a row costs one ``dict(zip())`` instead of a hand-built dict
+    with a formatting call per field.
+    """
+
+    def __init__(self, fields):
+        # Exact str keys: orjson rejects str subclasses such as SQLAlchemy's quoted_name
+        self.fields = tuple(str(field) for field in fields)
+
+    @classmethod
+    def for_statement(cls, statement):
+        """A serializer keyed by the statement's column labels."""
+        return cls(column.key for column in statement.selected_columns)
+
+    def __call__(self, rows):
+        fields = self.fields
+        return [dict(zip(fields, row)) for row in rows]
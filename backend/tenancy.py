@@ -0,0 +1,37 @@
+"""Multi-lounge tenancy.
+
+One deployment serves several lounges. Every tenant-owned table (users,
+passengers, lounge_entries, reservations, lounge_settings) carries a
+``lounge_id`` and the indexes behind the hot queries lead on it, so each
+lounge's dashboard, searches and reports only touch that lounge's slice of the
+index. Staff belong to exactly one lounge; views scope every read and write to
+``current_lounge_id()`` and answer 404 for another lounge's rows. Days (the
+dashboard's "today", report dates) are in the lounge's own timezone.
+"""
+from flask_login import current_user
+from sqlalchemy import insert, select
+
+from backend.models import DEFAULT_LOUNGE_ID, Lounge
+from backend.timestamps import DEFAULT_TIMEZONE, get_timezone
+
+DEFAULT_LOUNGE_CODE = 'DEFAULT'
+DEFAULT_LOUNGE_NAME = 'Prima Vista Lounge'
+
+
+def current_lounge_id():
+    """The lounge of the logged-in user."""
+    return current_user.lounge_id
+
+
+def current_lounge_timezone():
+    """The timezone of the logged-in user's lounge (loaded along with the user)."""
+    lounge = current_user.lounge
+    return get_timezone(lounge.timezone if lounge is not None else DEFAULT_TIMEZONE)
+
+
+def ensure_default_lounge(connection):
+    """Create the lounge that rows without an explicit lounge_id belong to."""
+    exists = connection.execute(select(Lounge.id).where(Lounge.id == DEFAULT_LOUNGE_ID)).first()
+    if exists is None:
+        connection.execute(insert(Lounge).values(
+            id=DEFAULT_LOUNGE_ID, code=DEFAULT_LOUNGE_CODE, name=DEFAULT_LOUNGE_NAME))
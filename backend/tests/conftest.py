@@ -1,38 +1,203 @@
 import pytest
-import tempfile
-import os
-from backend.app import app as flask_app # Renamed to avoid conflict
+from flask.testing import FlaskClient
+from sqlalchemy import event
+from werkzeug.urls import url_parse
+from werkzeug.exceptions import HTTPException
+from backend.app import create_app
 from backend.database import init_db as init_db_function, db_session # Renamed to avoid conflict
 
+# Maximum number of SQL statements a single request to each endpoint may execute.
+# The counts must not depend on how much data is in the database: an endpoint that
+# needs more statements as rows are added (e.g. lazy-loading each passenger's
+# lounge_entries) has an N+1 problem. Authenticated endpoints include the user lookup.
+# A test can override these with @pytest.mark.query_budget({'endpoint': n}).
+QUERY_BUDGETS = {
+    'auth.register': 2,
+    'auth.login': 1,
+    'auth.logout': 1,
+    'auth.status': 1,
+    'checkin.check_in_passenger': 6,
+    'metrics': 0,
+    'dashboard.get_dashboard_stats': 4,
+    'dashboard.get_recent_entries': 2,
+    'dashboard.get_overstays': 2, # Includes loading the active entries on first use
+    'passengers.get_passengers': 3,
+    'passengers.get_passenger': 2,
+    'passengers.get_passenger_entries': 3,
+    'profiling.sample': 1,
+    'events.tail_events': 2,
+    'passengers.exit_passenger': 6, # Includes the exit's event
+    'reports.get_lounge_usage_report': 2,
+    'reports.get_top_passengers_report': 2,
+    'reports.get_flights_report': 3,
+    'reservations.create_reservation': 4, # Includes the status event
+    'reservations.get_reservations': 2,
+    'reservations.update_reservation_status': 5, # Includes the status event
+    'reservations.update_reservation_statuses': 4, # SELECT, UPDATE, events
+    'reservations.import_reservations_manifest': 4, # Per chunk: INSERT, its ids on SQLite, the events
+    'settings.get_lounge_settings': 2,
+    'settings.update_lounge_settings': 4, # Includes the lounge row when the timezone changes
+    'settings.get_users': 2,
+    'settings.create_user': 5, # Includes the lounge lookup when another lounge_id is given
+    'settings.update_user': 4,
+}
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "query_budget(budgets): override QUERY_BUDGETS for the endpoints given in the dict"
+    )
+
+
+class QueryCounter:
+    """Records every statement executed on the engine while installed."""
+
+    def __init__(self):
+        self.statements = []
+
+    # Transaction control emitted by the `app` fixture's savepoints, not by the code under test
+    IGNORED_PREFIXES = ('BEGIN', 'SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if not statement.startswith(self.IGNORED_PREFIXES):
+            self.statements.append(statement)
+
+
+class QueryBudgetClient(FlaskClient):
+    """Test client that fails the test when a request exceeds its endpoint's query budget."""
+
+    query_counter = None
+    query_budgets = QUERY_BUDGETS
+
+    def open(self, *args, **kwargs):
+        if self.query_counter is None or not args or not isinstance(args[0], str):
+            return super().open(*args, **kwargs)
+
+        method = kwargs.get('method', 'GET')
+        start = len(self.query_counter.statements)
+        response = super().open(*args, **kwargs)
+        statements = self.query_counter.statements[start:]
+
+        try:
+            endpoint, _ = self.application.url_map.bind('localhost').match(url_parse(args[0]).path, method=method)
+        except HTTPException: # 404/405 etc. have no budget
+            return response
+
+        budget = self.query_budgets.get(endpoint)
+        if budget is not None and len(statements) > budget:
+            pytest.fail(
+                f"{method} {args[0]} ({endpoint}) executed {len(statements)} SQL statements, "
+                f"budget is {budget}:\n" + "\n".join(statements),
+                pytrace=False
+            )
+        return response
+
+
 @pytest.fixture
-def app():
-    """Create and configure a new app instance for each test."""
-    # Create a new temporary database file for each test
-    db_fd, db_path = tempfile.mkstemp()
+def query_counter(app):
+    """Counts the SQL statements executed on the app's engine during the test."""
+    engine = app.extensions['sqlalchemy_engine']
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+    yield counter
+    event.remove(engine, 'before_cursor_execute', counter)
+
+def enable_sqlite_savepoints(engine):
+    # pysqlite's own transaction handling breaks SAVEPOINT; let SQLAlchemy
+    # emit BEGIN itself so nested transactions work
+    @event.listens_for(engine, 'connect')
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, 'begin')
+    def _emit_begin(conn):
+        conn.exec_driver_sql('BEGIN')
 
-    # Update Flask app config for testing
-    flask_app.config.update({
+
+@pytest.fixture(scope='session', autouse=True)
+def fast_password_hashing():
+    """Hash test passwords with a single PBKDF2 round instead of 260k; hashing dominated suite runtime."""
+    import backend.models
+    from werkzeug.security import generate_password_hash
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(backend.models, 'generate_password_hash',
+                   lambda password: generate_password_hash(password, method='pbkdf2:sha256:1'))
+        yield
+
+
+@pytest.fixture(scope='session')
+def worker_app():
+    """One app and one in-memory database per test process (i.e. per pytest-xdist worker).
+
+    The schema is created once; the function-scoped `app` fixture rolls back
+    whatever each test writes, so every test still starts from an empty database.
+    """
+    flask_app = create_app({
         "TESTING": True,
-        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}", # Use the temp database
-        "DATABASE": db_path, # For compatibility if some parts use app.config['DATABASE'] directly
+        "SQLALCHEMY_DATABASE_URI": "sqlite://", # In-memory, one shared connection (StaticPool)
         "SECRET_KEY": "test_secret_key" # Consistent secret key for tests
     })
+    engine = flask_app.extensions['sqlalchemy_engine']
+    enable_sqlite_savepoints(engine)
 
-    # Initialize the database for the app context
     with flask_app.app_context():
         init_db_function()
 
     yield flask_app
 
-    # Clean up: close and remove the temporary database file
-    os.close(db_fd)
-    os.unlink(db_path)
+    engine.dispose()
 
 
 @pytest.fixture
-def client(app):
-    """A test client for the app."""
-    return app.test_client()
+def app(worker_app):
+    """The worker's app, with every database change made by the test rolled back afterwards."""
+    engine = worker_app.extensions['sqlalchemy_engine']
+    original_config = dict(worker_app.config)
+
+    # Run the whole test inside one outer transaction on the worker's connection.
+    # Routes commit and roll back freely: they only ever end a SAVEPOINT, which
+    # is restarted straight away, so the outer transaction survives until teardown.
+    connection = engine.connect()
+    transaction = connection.begin()
+    savepoint = {'current': connection.begin_nested()}
+
+    def restart_savepoint(session, session_transaction):
+        if not savepoint['current'].is_active:
+            savepoint['current'] = connection.begin_nested()
+
+    db_session.configure(bind=connection)
+    event.listen(db_session, 'after_transaction_end', restart_savepoint)
+
+    yield worker_app
+
+    event.remove(db_session, 'after_transaction_end', restart_savepoint)
+    db_session.remove()
+    db_session.configure(bind=None)
+    transaction.rollback()
+    connection.close()
+    # In-memory state built from the rolled-back rows (overstay heaps, shared poll results)
+    worker_app.extensions.pop('overstays', None)
+    worker_app.extensions['single_flight'].reset()
+    worker_app.extensions['rate_limiter'].reset()
+    worker_app.extensions['report_cache'].clear()
+    worker_app.extensions['cache'].clear()
+
+    worker_app.config.clear()
+    worker_app.config.update(original_config)
+
+
+@pytest.fixture
+def client(app, query_counter, request):
+    """A test client for the app that enforces QUERY_BUDGETS on every request."""
+    budgets = dict(QUERY_BUDGETS)
+    for marker in reversed(list(request.node.iter_markers('query_budget'))): # Closest marker wins
+        budgets.update(marker.args[0])
+
+    app.test_client_class = QueryBudgetClient
+    client = app.test_client()
+    client.query_counter = query_counter
+    client.query_budgets = budgets
+    return client
 
 
 @pytest.fixture
@@ -43,17 +208,14 @@ def runner(app):
 @pytest.fixture
 def init_db(app):
     """
-    Fixture to initialize the database. 
-    This is useful if you want to ensure a clean db state for a module or specific tests,
-    although the main `app` fixture already initializes it for each test.
-    This can be called explicitly if a test somehow corrupts the db and needs a reset mid-test,
-    or if tests are structured to run against a shared, pre-populated db for a module.
+    Kept for the tests that request it: the `app` fixture already gives every
+    test an empty database with the schema in place (created once per worker,
+    changes rolled back after each test), so there is nothing left to do here.
+    Calling init_db() against the engine here would commit behind the test's
+    outer transaction.
     """
-    with app.app_context():
-        init_db_function()
-        # You might also populate some initial common data here if needed for many tests
-    yield 
-    # Teardown can be added here if needed, but `app` fixture handles temp db cleanup.
+    yield
+
 
 @pytest.fixture
 def auth_client(client, app):
@@ -0,0 +1,131 @@
+import pytest
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+pytest.importorskip('asgiref')
+pytest.importorskip('aiosqlite')
+
+from backend.app import create_app
+from backend.asgi import create_asgi_app, async_database_url
+from backend.database import init_db
+
+# The async engine needs a database it can open itself, so these tests use a
+# file-backed app of their own instead of the worker's in-memory database.
+@pytest.fixture
+def file_app(tmp_path):
+    flask_app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'asgi.db'}",
+        "SECRET_KEY": "test_secret_key"
+    })
+    with flask_app.app_context():
+        init_db()
+    yield flask_app
+    flask_app.extensions['sqlalchemy_engine'].dispose()
+
+@pytest.fixture
+def logged_in(file_app):
+    """A logged-in Flask test client with some data, plus its session cookie header."""
+    client = file_app.test_client()
+    client.post('/auth/register', json={'username': 'staff_asgi', 'password': 'password'})
+    assert client.post('/auth/login', json={'username': 'staff_asgi', 'password': 'password'}).status_code == 200
+
+    client.post('/checkin', json={'passenger_name': 'Async One', 'flight_number': 'AS1'})
+    entry = client.post('/checkin', json={
+        'passenger_name': 'Async Two', 'flight_number': 'AS2',
+        'entry_time': (datetime.utcnow() - timedelta(hours=1)).isoformat()
+    }).get_json()['lounge_entry']
+    client.post(f"/passengers/{entry['id']}/exit", json={})
+
+    session_cookie = next(cookie for cookie in client.cookie_jar if cookie.name == 'session')
+    return client, f'session={session_cookie.value}'
+
+def asgi_get(asgi_app, path, query_string='', cookie=None):
+    """Run one GET through the ASGI app and return (status, headers, body)."""
+    headers = [(b'host', b'localhost')]
+    if cookie:
+        headers.append((b'cookie', cookie.encode('latin-1')))
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': query_string.encode(), 'root_path': '', 'headers': headers,
+        'server': ('localhost', 80), 'client': ('127.0.0.1', 1234),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    async def run():
+        await asgi_app(scope, receive, send)
+        await asgi_app.dispose()
+
+    asyncio.run(run())
+    start = next(m for m in messages if m['type'] == 'http.response.start')
+    body = b''.join(m.get('body', b'') for m in messages if m['type'] == 'http.response.body')
+    return start['status'], dict(start['headers']), body
+
+def test_async_database_url():
+    assert async_database_url('sqlite:///lounge.db') == 'sqlite+aiosqlite:///lounge.db'
+    assert async_database_url('postgresql://u:p@db/lounge') == 'postgresql+asyncpg://u:p@db/lounge'
+    assert async_database_url('postgresql+psycopg2://db/lounge') == 'postgresql+asyncpg://db/lounge'
+    with pytest.raises(ValueError):
+        async_database_url('oracle://db')
+
+def test_async_endpoint_requires_session(file_app):
+    asgi_app = create_asgi_app(flask_app=file_app)
+    status, _, body = asgi_get(asgi_app, '/dashboard/stats')
+    assert status == 401
+    status, _, _ = asgi_get(asgi_app, '/dashboard/stats', cookie='session=forged.value.here')
+    assert status == 401
+
+@pytest.mark.parametrize('path, query_string', [
+    ('/dashboard/stats', ''),
+    ('/dashboard/recent-entries', ''),
+    ('/passengers', ''),
+    ('/passengers', 'search_query=AS2'),
+    ('/passengers', 'view=summary'),
+])
+def test_async_endpoints_match_flask(file_app, logged_in, path, query_string):
+    client, cookie = logged_in
+    asgi_app = create_asgi_app(flask_app=file_app)
+
+    status, headers, body = asgi_get(asgi_app, path, query_string, cookie=cookie)
+    assert status == 200
+    assert headers[b'content-type'] == b'application/json'
+
+    flask_response = client.get(f'{path}?{query_string}' if query_string else path)
+    assert json.loads(body) == flask_response.get_json()
+
+def test_async_report_invalid_parameter(file_app, logged_in):
+    _, cookie = logged_in
+    asgi_app = create_asgi_app(flask_app=file_app)
+    status, _, body = asgi_get(asgi_app, '/reports/lounge-usage', 'start_date=not-a-date', cookie=cookie)
+    assert status == 400
+    assert 'Invalid start_date format' in json.loads(body)['message']
+
+def test_other_paths_fall_through_to_flask(file_app, logged_in):
+    _, cookie = logged_in
+    asgi_app = create_asgi_app(flask_app=file_app)
+    status, _, body = asgi_get(asgi_app, '/auth/status', cookie=cookie)
+    assert status == 200
+    assert json.loads(body)['user']['username'] == 'staff_asgi'
+
+def test_async_polls_are_rate_limited(file_app, logged_in):
+    from backend.polling import RateLimiter
+    _, cookie = logged_in
+    file_app.extensions['rate_limiter'] = RateLimiter(rate=1 / 60, burst=1)
+    asgi_app = create_asgi_app(flask_app=file_app)
+
+    status, _, _ = asgi_get(asgi_app, '/dashboard/stats', cookie=cookie)
+    assert status == 200
+    status, headers, body = asgi_get(asgi_app, '/dashboard/stats', cookie=cookie)
+    assert status == 429
+    assert int(headers[b'retry-after']) >= 1
+    # Not a polled endpoint
+    status, _, _ = asgi_get(asgi_app, '/passengers', cookie=cookie)
+    assert status == 200
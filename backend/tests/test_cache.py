@@ -0,0 +1,149 @@
+import pytest
+import fnmatch
+import socketserver
+import threading
+import time
+from backend.cache import Cache, LRUCache, SQLiteCache, RedisCache, make_backend
+
+
+class RedisStandIn(socketserver.ThreadingTCPServer):
+    """A local stand-in for a Redis server: the commands RedisCache uses, kept in a dict."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), RedisStandInHandler)
+        self.data = {} # key -> (value, expires)
+        self.lock = threading.Lock()
+
+    def live(self, key):
+        value, expires = self.data.get(key, (None, None))
+        if expires is not None and expires <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+
+class RedisStandInHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = [self.rfile.read(int(self.rfile.readline()[1:]) + 2)[:-2] for _ in range(int(line[1:]))]
+            with self.server.lock:
+                reply = self.execute(command[0].upper().decode(), command[1:])
+            self.wfile.write(reply)
+
+    def execute(self, name, args):
+        server = self.server
+        if name in ('PING', 'SELECT', 'AUTH'):
+            return b'+OK\r\n'
+        if name == 'MGET':
+            values = [server.live(key) for key in args]
+            return b'*%d\r\n' % len(values) + b''.join(
+                b'$-1\r\n' if value is None else b'$%d\r\n%s\r\n' % (len(value), value) for value in values)
+        if name == 'SET':
+            expires = time.monotonic() + int(args[3]) / 1000 if len(args) > 2 and args[2].upper() == b'PX' else None
+            server.data[args[0]] = (args[1], expires)
+            return b'+OK\r\n'
+        if name == 'DEL':
+            return b':%d\r\n' % sum(server.data.pop(key, None) is not None for key in args)
+        if name == 'INCR':
+            value = int(server.live(args[0]) or 0) + 1
+            server.data[args[0]] = (str(value).encode(), None)
+            return b':%d\r\n' % value
+        if name == 'SCAN': # Everything in one page
+            keys = [key for key in list(server.data) if server.live(key) is not None
+                    and fnmatch.fnmatchcase(key.decode(), args[2].decode())]
+            return b'*2\r\n$1\r\n0\r\n*%d\r\n' % len(keys) + b''.join(b'$%d\r\n%s\r\n' % (len(k), k) for k in keys)
+        return b'-ERR unknown command\r\n'
+
+
+@pytest.fixture
+def redis_stand_in():
+    server = RedisStandIn()
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=['lru', 'sqlite', 'redis'])
+def backend(request, tmp_path):
+    if request.param == 'lru':
+        return LRUCache()
+    if request.param == 'sqlite':
+        return SQLiteCache(str(tmp_path / 'cache.db'))
+    server = request.getfixturevalue('redis_stand_in')
+    return RedisCache('redis://127.0.0.1:%d/1' % server.server_address[1])
+
+
+def test_backend_get_set_delete(backend):
+    backend.set_many({'a': {'count': 1}, 'b': [1, 2], 'c': 'short lived'})
+    backend.set_many({'c': 'short lived'}, ttl=0.05)
+    assert backend.get_many(['a', 'b', 'missing']) == {'a': {'count': 1}, 'b': [1, 2]}
+    time.sleep(0.1)
+    assert backend.get_many(['c']) == {}
+
+    backend.delete_many(['a'])
+    assert backend.get_many(['a', 'b']) == {'b': [1, 2]}
+    backend.clear()
+    assert backend.get_many(['b']) == {}
+
+def test_backend_versions(backend):
+    assert backend.versions(['users:1', 'users:2']) == {'users:1': 0, 'users:2': 0}
+    backend.bump('users:1')
+    backend.bump('users:1')
+    assert backend.versions(['users:1', 'users:2']) == {'users:1': 2, 'users:2': 0}
+
+def test_cache_invalidates_by_table_version(backend):
+    cache = Cache(backend)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {'users': len(calls)}
+
+    assert cache.get_or_set('settings.users', compute, tables=('users',), lounge_id=1) == {'users': 1}
+    assert cache.get_or_set('settings.users', compute, tables=('users',), lounge_id=1) == {'users': 1}
+    cache.invalidate('users', lounge_id=2) # Another lounge
+    assert cache.get_or_set('settings.users', compute, tables=('users',), lounge_id=1) == {'users': 1}
+    cache.invalidate('users', lounge_id=1)
+    assert cache.get_or_set('settings.users', compute, tables=('users',), lounge_id=1) == {'users': 2}
+
+def test_lru_cache_keeps_values_briefly(monkeypatch):
+    # Another worker's write never bumps this worker's versions: the value has to expire
+    import backend.cache
+    clock = [1000.0]
+    monkeypatch.setattr(backend.cache.time, 'monotonic', lambda: clock[0])
+    cache = Cache(LRUCache(), default_ttl=300, local_ttl=2)
+    assert cache.get_or_set('settings.lounge', lambda: 'old', tables=('lounge_settings',), lounge_id=1) == 'old'
+    clock[0] += 1
+    assert cache.get_or_set('settings.lounge', lambda: 'new', tables=('lounge_settings',), lounge_id=1) == 'old'
+    clock[0] += 2
+    assert cache.get_or_set('settings.lounge', lambda: 'new', tables=('lounge_settings',), lounge_id=1) == 'new'
+
+def test_workers_share_sqlite_and_redis_backends(tmp_path, redis_stand_in):
+    for make in (lambda: SQLiteCache(str(tmp_path / 'shared.db')),
+                 lambda: RedisCache('redis://127.0.0.1:%d/0' % redis_stand_in.server_address[1])):
+        worker_one, worker_two = Cache(make()), Cache(make())
+        assert worker_one.get_or_set('stats', lambda: 'computed once', tables=('lounge_entries',)) == 'computed once'
+        assert worker_two.get_or_set('stats', lambda: 'recomputed', tables=('lounge_entries',)) == 'computed once'
+        worker_two.invalidate('lounge_entries') # A write handled by the second worker
+        assert worker_one.get_or_set('stats', lambda: 'recomputed', tables=('lounge_entries',)) == 'recomputed'
+
+def test_unreachable_redis_is_a_miss(redis_stand_in):
+    port = redis_stand_in.server_address[1]
+    redis_stand_in.shutdown()
+    redis_stand_in.server_close()
+    cache = Cache(RedisCache('redis://127.0.0.1:%d/0' % port, timeout=0.2))
+    assert cache.get_or_set('stats', lambda: 'computed', tables=('lounge_entries',)) == 'computed'
+    cache.invalidate('lounge_entries') # Logged, not raised
+
+def test_make_backend():
+    assert isinstance(make_backend({}), LRUCache)
+    assert isinstance(make_backend({'CACHE_BACKEND': 'redis', 'CACHE_URL': 'redis://cache:6380/2'}), RedisCache)
+    with pytest.raises(ValueError):
+        make_backend({'CACHE_BACKEND': 'memcached'})
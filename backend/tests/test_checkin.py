@@ -153,3 +153,92 @@ def test_check_in_passenger_no_entry_time(client, app):
         assert passenger.flight_number == flight_number
         assert len(passenger.lounge_entries) == 1 # First entry for this passenger
         assert passenger.lounge_entries[0].id == json_data['lounge_entry']['id']
+
+@pytest.fixture
+def group_commit_app(app):
+    app.config['CHECKIN_GROUP_COMMIT'] = True
+    yield app
+    commit_queue = app.extensions.pop('group_commit.checkin_group_commit', None)
+    if commit_queue is not None:
+        commit_queue.close()
+
+def test_check_in_passenger_group_commit(client, group_commit_app):
+    login_staff_user(client, "staff_group_commit", "password")
+
+    response = client.post('/checkin', json={'passenger_name': 'Batched Passenger', 'flight_number': 'GC1'})
+    assert response.status_code == 201
+    lounge_entry = response.get_json()['lounge_entry']
+    assert lounge_entry['id'] is not None
+    assert lounge_entry['status'] == 'active'
+
+    # Acknowledged only after the writer committed, so it is visible right away
+    with group_commit_app.app_context():
+        entry = LoungeEntry.query.get(lounge_entry['id'])
+        assert entry is not None
+        assert entry.passenger.name == 'Batched Passenger'
+
+def test_group_commit_timeout_leaves_outcome_unknown(client, group_commit_app):
+    from backend.overstays import get_tracker
+    from backend.timestamps import utc_now
+    login_staff_user(client, "staff_group_commit_slow", "password")
+    tracker = get_tracker(group_commit_app)
+    tracker.load(db_session.connection())
+    # The writer waits out its window before committing, long after the request gave up
+    group_commit_app.config.update(CHECKIN_GROUP_COMMIT_WINDOW_MS=300, CHECKIN_GROUP_COMMIT_TIMEOUT=0.01)
+
+    response = client.post('/checkin', json={'passenger_name': 'Slow Batch', 'flight_number': 'GC4',
+                                             'entry_time': '2024-05-01T10:00:00Z'})
+    assert response.status_code == 202
+    assert 'outcome is unknown' in response.get_json()['message']
+
+    group_commit_app.extensions.pop('group_commit.checkin_group_commit').close() # Waits for the batch
+    passenger = Passenger.query.filter_by(name='Slow Batch', flight_number='GC4').first()
+    assert len(passenger.lounge_entries) == 1
+    # The writer still did the post-commit work the request skipped
+    assert [entry.passenger_name for entry in tracker.longest_stays(1, utc_now(), 10)] == ['Slow Batch']
+
+def test_group_commit_queue_coalesces_jobs(app):
+    from backend.commit_queue import GroupCommitQueue
+    commit_queue = GroupCommitQueue(app, window=0.2, max_batch=50)
+    try:
+        def make_job(i):
+            def job():
+                passenger = Passenger(name=f'Wave Passenger {i}', flight_number='GC2')
+                db_session.add(passenger)
+                db_session.flush()
+                return passenger.id
+            return job
+
+        futures = [commit_queue.submit(make_job(i)) for i in range(5)]
+        ids = [future.result(timeout=5) for future in futures]
+    finally:
+        commit_queue.close()
+
+    assert len(set(ids)) == 5
+    assert commit_queue.batches_committed == 1 # All five arrived within one window
+    with app.app_context():
+        assert Passenger.query.filter_by(flight_number='GC2').count() == 5
+
+def test_group_commit_queue_isolates_failing_job(app):
+    from backend.commit_queue import GroupCommitQueue
+    commit_queue = GroupCommitQueue(app, window=0.2, max_batch=50)
+
+    def good_job():
+        db_session.add(Passenger(name='Good Passenger', flight_number='GC3'))
+        return 'ok'
+
+    def bad_job():
+        db_session.add(Passenger(name=None, flight_number='GC3')) # name is NOT NULL
+        db_session.flush()
+
+    try:
+        futures = [commit_queue.submit(good_job), commit_queue.submit(bad_job), commit_queue.submit(good_job)]
+        assert futures[0].result(timeout=5) == 'ok'
+        assert futures[2].result(timeout=5) == 'ok'
+        with pytest.raises(Exception):
+            futures[1].result(timeout=5)
+    finally:
+        commit_queue.close()
+
+    with app.app_context():
+        assert Passenger.query.filter_by(flight_number='GC3').count() == 2
@@ -0,0 +1,99 @@
+import pytest
+import gzip
+import json
+import zlib
+from flask import Response
+from backend.app import create_app
+from backend.compression import choose_encoding, compress_stream, no_compression, brotli
+
+# Helper to register and login a staff user
+def login_staff_user(client, username="staff_gzip", password="password"):
+    reg_response = client.post('/auth/register', json={'username': username, 'password': password})
+    assert reg_response.status_code in [201, 400]
+    login_response = client.post('/auth/login', json={'username': username, 'password': password})
+    assert login_response.status_code == 200
+    return login_response
+
+def test_choose_encoding():
+    preferred = 'br' if brotli is not None else 'gzip'
+    assert choose_encoding('gzip, deflate, br') == preferred
+    assert choose_encoding('gzip') == 'gzip'
+    assert choose_encoding('gzip;q=0, identity') is None
+    assert choose_encoding('*') == preferred
+    assert choose_encoding('br;q=0, *;q=0.5') == 'gzip'
+    assert choose_encoding('') is None
+    assert choose_encoding(None) is None
+
+def test_large_json_response_is_gzipped(client, app, init_db):
+    login_staff_user(client)
+    for i in range(20):
+        client.post('/reservations', json={
+            'passenger_name': f'Gzip Guest {i}', 'flight_number': f'GZ{i}',
+            'reservation_date': '2030-02-01', 'reservation_time': '09:00'
+        })
+
+    plain = client.get('/reservations')
+    assert 'Content-Encoding' not in plain.headers
+    assert len(plain.get_data()) >= app.config['COMPRESS_MIN_SIZE']
+
+    response = client.get('/reservations', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert int(response.headers['Content-Length']) == len(response.get_data())
+    assert len(response.get_data()) < len(plain.get_data())
+    assert json.loads(gzip.decompress(response.get_data())) == plain.get_json()
+
+def test_small_response_not_compressed(client, app, init_db):
+    login_staff_user(client, "staff_gzip_small", "password")
+    response = client.get('/auth/status', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_json()['user']['username'] == 'staff_gzip_small'
+
+@pytest.fixture
+def compression_app():
+    # Its own app so test-only routes can be added before the first request
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True, 'BLUEPRINTS': []})
+    body = 'lounge,' * 1000
+
+    @app.route('/big')
+    def big():
+        return Response(body, mimetype='text/plain')
+
+    @app.route('/big-raw')
+    @no_compression
+    def big_raw():
+        return Response(body, mimetype='text/plain')
+
+    @app.route('/export')
+    def export():
+        return Response((f'row {i}\n' for i in range(5)), mimetype='text/csv')
+
+    return app
+
+def test_no_compression_opt_out(compression_app):
+    client = compression_app.test_client()
+    assert client.get('/big', headers={'Accept-Encoding': 'gzip'}).headers['Content-Encoding'] == 'gzip'
+    response = client.get('/big-raw', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data(as_text=True).startswith('lounge,')
+
+def test_streamed_response_compressed_without_length(compression_app):
+    client = compression_app.test_client()
+    response = client.get('/export', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert gzip.decompress(response.get_data()).decode() == ''.join(f'row {i}\n' for i in range(5))
+
+def test_compress_stream_flushes_each_chunk():
+    decompressor = zlib.decompressobj(31)
+    stream = compress_stream(iter([b'first chunk', b'second chunk']), 'gzip')
+    # Each compressed piece decodes to its chunk on its own, without waiting for the end
+    assert decompressor.decompress(next(stream)) == b'first chunk'
+    assert decompressor.decompress(next(stream)) == b'second chunk'
+
+@pytest.mark.skipif(brotli is None, reason='brotli not installed')
+def test_brotli_preferred(compression_app):
+    response = compression_app.test_client().get('/big', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(response.get_data()).decode().startswith('lounge,')
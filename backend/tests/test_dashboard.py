@@ -1,4 +1,5 @@
 import pytest
+import time
 from datetime import datetime, timedelta
 
 # Helper to register and login a staff user
@@ -124,3 +125,196 @@ def test_get_recent_entries_with_data(client, app, init_db):
     assert json_data_limited[0]['passenger_name'] == 'Extra11'
     # The last one of the 10 would be 'Extra2'
     assert json_data_limited[9]['passenger_name'] == 'Extra2'
+
+def test_get_overstays_unauthenticated(client):
+    response = client.get('/dashboard/overstays')
+    assert response.status_code in (302, 401) # Redirected to the login view
+
+def test_get_overstays(client, app, init_db):
+    login_staff_user(client, "staff_overstays", "password")
+    now = datetime.utcnow()
+    # Checked in before the tracker is loaded: read from the database on the first request
+    client.post('/checkin', json={'passenger_name': 'Five Hours', 'flight_number': 'OS1',
+                                  'entry_time': (now - timedelta(hours=5)).isoformat()})
+    client.post('/checkin', json={'passenger_name': 'One Hour', 'flight_number': 'OS2',
+                                  'entry_time': (now - timedelta(hours=1)).isoformat()})
+
+    response = client.get('/dashboard/overstays')
+    assert response.status_code == 200
+    json_data = response.get_json()
+    assert json_data['threshold_minutes'] == 180
+    assert [row['passenger_name'] for row in json_data['data']] == ['Five Hours']
+    assert 299 <= json_data['data'][0]['minutes_in_lounge'] <= 300
+
+    # Checked in and exited after the load: kept up to date without reloading
+    response = client.post('/checkin', json={'passenger_name': 'Four Hours', 'flight_number': 'OS3',
+                                             'entry_time': (now - timedelta(hours=4)).isoformat()})
+    four_hours_id = response.get_json()['lounge_entry']['id']
+    response = client.get('/dashboard/overstays?minutes=30')
+    assert [row['passenger_name'] for row in response.get_json()['data']] == ['Five Hours', 'Four Hours', 'One Hour']
+    response = client.get('/dashboard/overstays?minutes=30&limit=1')
+    assert [row['passenger_name'] for row in response.get_json()['data']] == ['Five Hours']
+
+    client.post(f'/passengers/{four_hours_id}/exit', json={})
+    response = client.get('/dashboard/overstays?minutes=30')
+    assert [row['passenger_name'] for row in response.get_json()['data']] == ['Five Hours', 'One Hour']
+
+    # A restarted process rebuilds the same list from the active entries
+    app.extensions.pop('overstays')
+    response = client.get('/dashboard/overstays?minutes=30')
+    assert [row['passenger_name'] for row in response.get_json()['data']] == ['Five Hours', 'One Hour']
+
+    assert client.get('/dashboard/overstays?minutes=abc').status_code == 400
+    assert client.get('/dashboard/overstays?limit=0').status_code == 400
+
+def test_overstays_follow_other_workers_writes(client, app, init_db, monkeypatch, tmp_path):
+    from backend.cache import Cache, SQLiteCache
+    from backend.database import db_session
+    from backend.models import LoungeEntry, Passenger
+    from backend.timestamps import utc_now
+    cache = Cache(SQLiteCache(str(tmp_path / 'cache.db'))) # Shared by every worker
+    monkeypatch.setitem(app.extensions, 'cache', cache)
+    login_staff_user(client, "staff_overstays_workers", "password")
+    now = utc_now()
+    response = client.post('/checkin', json={'passenger_name': 'Exits Elsewhere', 'flight_number': 'OS4',
+                                             'entry_time': (now - timedelta(hours=5)).isoformat()})
+    entry_id = response.get_json()['lounge_entry']['id']
+    assert [row['passenger_name'] for row in client.get('/dashboard/overstays').get_json()['data']] == ['Exits Elsewhere']
+
+    # Another worker commits an exit and a check-in, bumping the lounge's version as views do
+    entry = db_session.get(LoungeEntry, entry_id)
+    entry.status, entry.exit_time = 'exited', now
+    passenger = Passenger(lounge_id=1, name='Entered Elsewhere', flight_number='OS5')
+    db_session.add(LoungeEntry(passenger=passenger, lounge_id=1, entry_time=now - timedelta(hours=4), status='active'))
+    db_session.commit()
+    cache.invalidate('lounge_entries', lounge_id=1)
+
+    assert [row['passenger_name'] for row in client.get('/dashboard/overstays').get_json()['data']] == ['Entered Elsewhere']
+
+def test_overstays_follow_other_workers_without_shared_cache(tmp_path):
+    # Two workers on one database, each with its own in-process cache (the default)
+    from backend.app import create_app
+    from backend.database import init_db as create_schema
+    from backend.timestamps import utc_now
+    url = f"sqlite:///{tmp_path / 'workers.db'}"
+    worker_one = create_app({'SQLALCHEMY_DATABASE_URI': url, 'OVERSTAYS_RELOAD_SECONDS': 0.2})
+    worker_two = create_app({'SQLALCHEMY_DATABASE_URI': url})
+    with worker_one.app_context():
+        create_schema()
+    one, two = worker_one.test_client(), worker_two.test_client()
+    login_staff_user(one, "staff_overstays_one", "password")
+    login_staff_user(two, "staff_overstays_two", "password")
+
+    def overstays():
+        return [row['passenger_name'] for row in one.get('/dashboard/overstays').get_json()['data']]
+
+    assert overstays() == []
+    entry_time = (utc_now() - timedelta(hours=5)).isoformat()
+    entry = two.post('/checkin', json={'passenger_name': 'Other Worker', 'flight_number': 'OS6',
+                                       'entry_time': entry_time}).get_json()['lounge_entry']
+    time.sleep(0.25)
+    assert overstays() == ['Other Worker']
+    two.post(f"/passengers/{entry['id']}/exit", json={})
+    time.sleep(0.25)
+    assert overstays() == []
+    for app in (worker_one, worker_two):
+        app.extensions['sqlalchemy_engine'].dispose()
+
+def test_overstay_tracker_skips_and_compacts_exited_entries():
+    from datetime import timezone
+    from backend.overstays import ActiveEntry, OverstayTracker
+
+    class NoActiveEntries:
+        def execute(self, statement):
+            return self
+        def all(self):
+            return []
+
+    tracker = OverstayTracker()
+    tracker.load(NoActiveEntries())
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for i in range(200):
+        tracker.checked_in(ActiveEntry(i, 1, start + timedelta(minutes=i), i, f'P{i}', 'F1'))
+    tracker.checked_in(ActiveEntry(1000, 2, start, 1000, 'Other lounge', 'F2'))
+    for i in range(150):
+        if i not in (1, 3, 5, 7, 9):
+            tracker.exited(i)
+
+    stays = tracker.longest_stays(1, start + timedelta(minutes=10), limit=100)
+    assert [entry.id for entry in stays] == [1, 3, 5, 7, 9]
+    assert [entry.id for entry in tracker.longest_stays(1, start + timedelta(days=1), limit=3)] == [1, 3, 5]
+    assert len(tracker._heaps[1]) <= 100 # Compacted once half of it had exited
+
+def test_dashboard_polls_share_results_until_a_write(client, app, query_counter, monkeypatch, init_db):
+    from backend.polling import SingleFlight
+    monkeypatch.setitem(app.extensions, 'single_flight', SingleFlight(window=60))
+    login_staff_user(client, "staff_poll_share", "password")
+    client.post('/checkin', json={'passenger_name': 'Poll One', 'flight_number': 'PS1'})
+
+    first = client.get('/dashboard/stats').get_json()
+    start = len(query_counter.statements)
+    assert client.get('/dashboard/stats').get_json() == first
+    assert len(query_counter.statements) - start == 1 # Only the user lookup; the stats were shared
+
+    # A check-in invalidates the lounge's shared results
+    client.post('/checkin', json={'passenger_name': 'Poll Two', 'flight_number': 'PS2'})
+    assert client.get('/dashboard/stats').get_json()['current_occupancy'] == 2
+
+def test_dashboard_polls_are_rate_limited_per_user(client, app, monkeypatch, init_db):
+    from backend.polling import RateLimiter
+    monkeypatch.setitem(app.extensions, 'rate_limiter', RateLimiter(rate=1 / 60, burst=2))
+    login_staff_user(client, "staff_poll_limit", "password")
+
+    assert client.get('/dashboard/recent-entries').status_code == 200
+    assert client.get('/dashboard/recent-entries').status_code == 200
+    response = client.get('/dashboard/recent-entries')
+    assert response.status_code == 429
+    assert 1 <= int(response.headers['Retry-After']) <= 60
+    # Buckets are per endpoint
+    assert client.get('/dashboard/stats').status_code == 200
+
+def test_single_flight_shares_concurrent_calls():
+    import threading
+    from backend.polling import SingleFlight
+
+    single_flight = SingleFlight(window=0)
+    release = threading.Event()
+    results = []
+
+    def compute():
+        release.wait(5)
+        return {'computed': True}
+
+    def poll():
+        results.append(single_flight.do(1, 'stats', compute))
+
+    threads = [threading.Thread(target=poll) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while single_flight.computations + single_flight.shared < 5: # Everyone has joined
+        release.wait(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert single_flight.computations == 1
+    assert len(results) == 5 and all(result is results[0] for result in results)
+    # Finished with no window: the next call computes again, as does another lounge's
+    single_flight.do(1, 'stats', lambda: {})
+    single_flight.do(2, 'stats', lambda: {})
+    assert single_flight.computations == 3
+
+def test_single_flight_window_and_invalidate():
+    from backend.polling import SingleFlight
+
+    single_flight = SingleFlight(window=60)
+    assert single_flight.do(1, 'stats', lambda: 'first') == 'first'
+    assert single_flight.do(1, 'stats', lambda: 'second') == 'first' # Within the window
+    single_flight.invalidate(1)
+    assert single_flight.do(1, 'stats', lambda: 'third') == 'third'
+
+    def fail():
+        raise RuntimeError('database down')
+    with pytest.raises(RuntimeError):
+        single_flight.do(1, 'recent', fail)
+    assert single_flight.do(1, 'recent', lambda: 'recovered') == 'recovered' # Failures are not kept
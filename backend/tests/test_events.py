@@ -0,0 +1,123 @@
+import json
+import os
+from collections import Counter
+from datetime import timedelta
+from backend.models import User
+from backend.database import db_session
+
+def login_staff_user(client, username="staffuser_events", password="password", role='staff'):
+    client.post('/auth/register', json={'username': username, 'password': password})
+    if role != 'staff':
+        with client.application.app_context():
+            User.query.filter_by(username=username).first().role = role
+            db_session.commit()
+    login_response = client.post('/auth/login', json={'username': username, 'password': password})
+    assert login_response.status_code == 200
+    return login_response
+
+def read_events(response):
+    return [json.loads(line) for line in response.get_data().splitlines()]
+
+def test_tail_events_unauthenticated(client):
+    response = client.get('/events')
+    assert response.status_code in (302, 401)
+
+def test_tail_events_admin_only(client, app, init_db):
+    login_staff_user(client)
+    assert client.get('/events').status_code == 403
+
+def test_writes_are_logged_in_order(client, app, init_db):
+    app.config['EVENTS_SETTLE_SECONDS'] = 0
+    login_staff_user(client, 'admin_events', role='admin')
+
+    first = client.post('/checkin', json={'passenger_name': 'Ada', 'flight_number': 'AZ1',
+                                          'entry_time': '2024-05-01T10:00:00Z'}).get_json()['lounge_entry']
+    client.post('/checkin', json={'passenger_name': 'Bob', 'flight_number': 'AZ2'})
+    assert client.post(f"/passengers/{first['id']}/exit", json={'exit_time': '2024-05-01T11:30:00Z'}).status_code == 200
+    assert client.post(f"/passengers/{first['id']}/exit", json={}).status_code == 400 # Refused: nothing logged
+    reservation = client.post('/reservations', json={'passenger_name': 'Cy', 'flight_number': 'AZ3',
+                                                     'reservation_date': '2024-05-02', 'reservation_time': '09:00'})
+    reservation_id = reservation.get_json()['reservation']['id']
+    client.put(f'/reservations/{reservation_id}/status', json={'new_status': 'cancelled'})
+    client.put(f'/reservations/{reservation_id}/status', json={'new_status': 'cancelled'}) # Unchanged: nothing logged
+
+    response = client.get('/events')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    events = read_events(response)
+    assert [event['type'] for event in events] == ['check_in', 'check_in', 'exit', 'reservation_status', 'reservation_status']
+    assert [event['id'] for event in events] == sorted(event['id'] for event in events)
+    assert events[0]['entity_id'] == first['id']
+    assert events[0]['passenger_id'] == first['passenger_id']
+    assert events[0]['occurred_at'] == 1714557600000
+    assert events[0]['data'] == {'flight_number': 'AZ1'}
+    assert events[2]['data'] == {'stay_seconds': 5400}
+    assert [event['data'] for event in events[3:]] == [{'from': None, 'to': 'confirmed'}, {'from': 'confirmed', 'to': 'cancelled'}]
+    assert response.headers['X-Next-After'] == str(events[-1]['id'])
+
+    # Paging with the cursor, then caught up
+    page = client.get(f"/events?after={events[0]['id']}&limit=2")
+    assert [event['id'] for event in read_events(page)] == [events[1]['id'], events[2]['id']]
+    assert page.headers['X-Next-After'] == str(events[2]['id'])
+    caught_up = client.get(f"/events?after={events[-1]['id']}")
+    assert caught_up.get_data() == b''
+    assert caught_up.headers['X-Next-After'] == str(events[-1]['id'])
+
+    # Events recorded within the settle window are held back
+    app.config['EVENTS_SETTLE_SECONDS'] = 60
+    assert client.get('/events').get_data() == b''
+
+    assert client.get('/events?limit=0').status_code == 400
+    assert client.get('/events?after=last').status_code == 400
+
+def test_export_and_replay_rebuild_from_the_log(tmp_path):
+    from sqlalchemy import select, update
+    from backend.app import create_app
+    from backend.cache import LRUCache
+    from backend.database import init_db as create_schema
+    from backend.events import export_segments, iter_events, read_segments, replay_events, segments
+    from backend.models import Event, LoungeEntry, Passenger
+    from backend.report_cache import LoungeUsageCache
+    from backend.seed import seed_database
+    from backend.timestamps import get_timezone, local_today
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'events.db'}"})
+    engine = app.extensions['sqlalchemy_engine']
+    with app.app_context():
+        create_schema()
+    seed_database(engine, passengers=40, entries=400, reservations=20, seed=5)
+    directory = str(tmp_path / 'segments')
+
+    with engine.connect() as connection:
+        logged = connection.execute(select(Event.id)).all()
+        written, exported = export_segments(connection, directory, segment_size=300)
+        assert exported == len(logged)
+        assert written == -(-len(logged) // 300)
+        assert export_segments(connection, directory, segment_size=300) == (0, 0) # Nothing new
+        assert not [name for name in os.listdir(directory) if name.endswith('.tmp')]
+
+        from_files = list(read_segments(directory))
+        assert from_files == list(iter_events(connection))
+        assert [event['id'] for event in read_segments(directory, after_id=from_files[-2]['id'])] == [from_files[-1]['id']]
+        assert len(segments(directory, after_id=from_files[299]['id'])) == written - 1
+
+        expected = {row.id: (row.visit_count, row.total_stay_seconds, row.first_visit_at, row.last_visit_at)
+                    for row in connection.execute(select(Passenger))}
+        utc = get_timezone('UTC')
+        entry_days = Counter(entry_time.date()
+                             for entry_time in connection.execute(select(LoungeEntry.entry_time)).scalars())
+        connection.execute(update(Passenger).values(visit_count=0, total_stay_seconds=0))
+
+        report_cache = LoungeUsageCache(LRUCache(10000))
+        replay, days = replay_events(connection, read_segments(directory), report_cache)
+        actual = {row.id: (row.visit_count, row.total_stay_seconds, row.first_visit_at, row.last_visit_at)
+                  for row in connection.execute(select(Passenger))}
+    engine.dispose()
+
+    assert replay.count == len(logged)
+    assert actual == expected
+    yesterday = local_today(utc) - timedelta(days=1)
+    counts, missing, _ = report_cache.lookup(1, utc, yesterday - timedelta(days=30), yesterday)
+    assert missing is None
+    assert counts == {day: entry_days.get(day, 0) for day in counts}
+    assert days >= 31
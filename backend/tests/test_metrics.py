@@ -0,0 +1,68 @@
+import pytest
+import logging
+
+# Helper to register and login a staff user
+def login_staff_user(client, username="staff_metrics", password="password"):
+    reg_response = client.post('/auth/register', json={'username': username, 'password': password})
+    assert reg_response.status_code in [201, 400]
+    login_response = client.post('/auth/login', json={'username': username, 'password': password})
+    assert login_response.status_code == 200
+    return login_response
+
+def test_server_timing_header(client, app, init_db):
+    login_staff_user(client)
+    response = client.get('/dashboard/stats')
+    assert response.status_code == 200
+
+    server_timing = response.headers.getlist('Server-Timing')
+    assert len(server_timing) == 2
+    db_timing = next(value for value in server_timing if value.startswith('db;'))
+    assert 'queries"' in db_timing
+    # At least the user lookup and the dashboard queries
+    query_count = int(db_timing.split('desc="')[1].split(' ')[0])
+    assert query_count >= 2
+    assert any(value.startswith('total;dur=') for value in server_timing)
+
+def test_metrics_endpoint_prometheus_format(client, app, init_db):
+    app.extensions['metrics'].reset()
+    login_staff_user(client, "staff_metrics_prom", "password")
+    client.get('/dashboard/recent-entries')
+    client.get('/dashboard/recent-entries')
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    body = response.get_data(as_text=True)
+
+    assert '# TYPE lounge_http_requests_total counter' in body
+    assert 'lounge_http_requests_total{endpoint="dashboard.get_recent_entries",method="GET",status="200"} 2' in body
+    assert 'lounge_http_request_duration_seconds_count{endpoint="dashboard.get_recent_entries"} 2' in body
+    assert 'lounge_http_request_duration_seconds_bucket{endpoint="dashboard.get_recent_entries",le="+Inf"} 2' in body
+    assert 'lounge_db_queries_total{endpoint="dashboard.get_recent_entries"}' in body
+    assert 'lounge_db_duration_seconds_total{endpoint="dashboard.get_recent_entries"}' in body
+
+def test_slow_query_log(client, app, init_db, caplog):
+    login_staff_user(client, "staff_metrics_slow", "password")
+    app.config['SLOW_QUERY_MS'] = 0 # Every statement counts as slow
+    try:
+        with caplog.at_level(logging.WARNING):
+            client.get('/dashboard/recent-entries')
+    finally:
+        app.config['SLOW_QUERY_MS'] = None
+
+    slow_logs = [record.getMessage() for record in caplog.records if 'Slow query' in record.getMessage()]
+    assert slow_logs
+    assert any('lounge_entries' in message for message in slow_logs)
+
+def test_slow_query_log_disabled_by_default(client, app, init_db, caplog):
+    login_staff_user(client, "staff_metrics_quiet", "password")
+    with caplog.at_level(logging.WARNING):
+        client.get('/dashboard/recent-entries')
+    assert not any('Slow query' in record.getMessage() for record in caplog.records)
+
+@pytest.mark.query_budget({'dashboard.get_recent_entries': 1})
+def test_query_budget_exceeded_fails_test(client, app, init_db):
+    login_staff_user(client, "staff_metrics_budget", "password")
+    # User lookup + recent entries query = 2 statements, over the budget of 1
+    with pytest.raises(pytest.fail.Exception, match='dashboard.get_recent_entries'):
+        client.get('/dashboard/recent-entries')
@@ -0,0 +1,106 @@
+import pytest
+import importlib
+from sqlalchemy import create_engine, inspect, select
+from backend.app import create_app
+from backend.database import init_db
+from backend.migrations import MigrationContext, current_revision, head_revision, load_revisions, upgrade
+
+baseline = importlib.import_module('backend.migrations.versions.0001_baseline')
+
+def schema_of(engine):
+    inspector = inspect(engine)
+    return {
+        table: ({column['name'] for column in inspector.get_columns(table)},
+                {index['name'] for index in inspector.get_indexes(table)})
+        for table in inspector.get_table_names()
+    }
+
+@pytest.fixture
+def legacy_engine(tmp_path):
+    """A database as created before migrations existed, with a little data."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as connection:
+        for table in baseline.TABLES:
+            table.create(connection)
+        connection.exec_driver_sql("INSERT INTO passengers (id, name, flight_number) VALUES "
+                                   "(1, 'Old Timer', 'AZ1'), (2, 'Never Came', 'AZ2'), (3, 'Once', 'AZ3')")
+        connection.exec_driver_sql(
+            "INSERT INTO lounge_entries (passenger_id, entry_time, exit_time, status) VALUES "
+            "(1, '2024-01-01 10:00:00.000000', '2024-01-01 11:00:00.000000', 'exited'), "
+            "(1, '2024-01-02 10:00:00.000000', NULL, 'active'), "
+            "(3, '2024-01-03 10:00:00.000000', '2024-01-03 10:30:00.000000', 'exited')")
+    yield engine
+    engine.dispose()
+
+def test_upgraded_database_matches_models(legacy_engine, tmp_path):
+    # Every column and index the models declare must be reachable by `flask db upgrade`
+    assert upgrade(legacy_engine, batch_size=2, pause=0) == [module.revision for module in load_revisions()]
+    assert current_revision(legacy_engine) == head_revision()
+
+    fresh = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'fresh.db'}"})
+    with fresh.app_context():
+        init_db()
+    assert schema_of(legacy_engine) == schema_of(fresh.extensions['sqlalchemy_engine'])
+    fresh.extensions['sqlalchemy_engine'].dispose()
+
+def test_upgrade_backfills_existing_rows(legacy_engine):
+    upgrade(legacy_engine, batch_size=2, pause=0)
+    with legacy_engine.connect() as connection:
+        rows = connection.exec_driver_sql(
+            "SELECT id, visit_count, total_stay_seconds, lounge_id FROM passengers ORDER BY id").all()
+        entries = connection.exec_driver_sql("SELECT entry_time, stay_seconds FROM lounge_entries ORDER BY id").all()
+    assert [tuple(row) for row in rows] == [(1, 2, 3600, 1), (2, 0, 0, 1), (3, 1, 1800, 1)]
+    # Text timestamps converted to epoch ms, durations of completed stays filled in
+    assert [tuple(row) for row in entries] == [(1704103200000, 3600), (1704189600000, None), (1704276000000, 1800)]
+    assert upgrade(legacy_engine) == [] # Nothing left to apply
+
+def test_upgrade_logs_existing_history(legacy_engine):
+    upgrade(legacy_engine, batch_size=2, pause=0)
+    with legacy_engine.connect() as connection:
+        events = connection.exec_driver_sql("SELECT type, entity_id, passenger_id, data FROM events ORDER BY id").all()
+    # Each batch logs its check-ins before its exits
+    assert [tuple(row) for row in events] == [
+        ('check_in', 1, 1, '{"flight_number":"AZ1"}'), ('check_in', 2, 1, '{"flight_number":"AZ1"}'),
+        ('exit', 1, 1, '{"stay_seconds":3600}'),
+        ('check_in', 3, 3, '{"flight_number":"AZ3"}'), ('exit', 3, 3, '{"stay_seconds":1800}'),
+    ]
+
+def test_init_db_marks_revisions_applied(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'new.db'}"})
+    engine = app.extensions['sqlalchemy_engine']
+    with app.app_context():
+        init_db()
+    assert upgrade(engine) == []
+    engine.dispose()
+
+def test_init_db_upgrades_an_existing_database(legacy_engine):
+    # Recording the revisions as applied would leave the old schema unupgradable
+    init_db(legacy_engine)
+    assert current_revision(legacy_engine) == head_revision()
+    with legacy_engine.connect() as connection:
+        assert tuple(connection.exec_driver_sql(
+            "SELECT lounge_id, visit_count FROM passengers WHERE id = 1").one()) == (1, 2)
+
+def test_seed_refuses_a_database_with_pending_revisions(legacy_engine, tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'legacy.db'}"})
+    result = app.test_cli_runner().invoke(args=['seed', '--passengers', '1'])
+    assert result.exit_code != 0
+    assert 'flask db upgrade' in result.output
+    assert current_revision(legacy_engine) is None
+    app.extensions['sqlalchemy_engine'].dispose()
+
+def test_interrupted_backfill_resumes_after_last_batch(legacy_engine):
+    upgrade(legacy_engine, target='0003', pause=0)
+    passengers = baseline.TABLES[1]
+    context = MigrationContext(legacy_engine, 'test', batch_size=1, pause=0)
+    batches = []
+
+    def fail_on_second_batch(connection, first_key, last_key):
+        if len(batches) == 1:
+            raise RuntimeError('interrupted')
+        batches.append((first_key, last_key))
+
+    with pytest.raises(RuntimeError):
+        context.backfill('step', passengers.c.id, fail_on_second_batch)
+    assert context.backfill('step', passengers.c.id, lambda c, first, last: batches.append((first, last))) == 2
+    assert batches == [(1, 1), (2, 2), (3, 3)]
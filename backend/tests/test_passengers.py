@@ -119,6 +119,7 @@ def test_exit_passenger_success(client, app, init_db):
         assert entry is not None
         assert entry.status == 'exited'
         assert entry.exit_time is not None
+        assert entry.stay_seconds == int((entry.exit_time - entry.entry_time).total_seconds())
         # Ensure exit_time is close to what was sent (may need dateutil.parser for precision)
         # parsed_exit_time_db = entry.exit_time
         # parsed_exit_time_sent = datetime.fromisoformat(exit_time.replace('Z', '+00:00'))
@@ -158,3 +159,71 @@ def test_exit_passenger_unauthenticated(client, app):
     # If it was a GET route, Flask-Login might redirect to login page (302)
     # but for POST, it often returns 401 directly.
     # Verify based on your Flask-Login unauthorized handler.
+
+def test_get_passengers_query_count_independent_of_data_size(client, app, init_db, query_counter):
+    login_staff_user(client, "staff_pass_n_plus_one", "password")
+    for i in range(15):
+        client.post('/checkin', json={'passenger_name': f'Bulk Passenger {i}', 'flight_number': f'BK{i}'})
+
+    start = len(query_counter.statements)
+    response = client.get('/passengers') # Also enforced by the client's QUERY_BUDGETS
+    assert response.status_code == 200
+    assert len(response.get_json()) >= 15
+    # User lookup, passengers, and one batched load of all their lounge entries
+    assert len(query_counter.statements) - start <= 3
+
+def test_get_passenger_detail_summary(client, app, init_db):
+    login_staff_user(client, "staff_pass_detail", "password")
+    setup_passenger_data(client)
+    john_doe = next(p for p in client.get('/passengers?view=summary').get_json() if p['name'] == 'John Doe')
+    assert 'lounge_entries' not in john_doe
+    assert john_doe['visit_count'] == 2
+    assert john_doe['active_entry_id'] is not None
+
+    response = client.get(f"/passengers/{john_doe['id']}")
+    assert response.status_code == 200
+    json_data = response.get_json()
+    assert json_data['name'] == 'John Doe'
+    assert json_data['visit_count'] == 2
+    assert json_data['last_visit'] == john_doe['last_visit']
+    assert datetime.fromisoformat(json_data['first_visit']) < datetime.fromisoformat(json_data['last_visit'])
+    assert json_data['total_stay_seconds'] == 3600 # The one exited stay lasted an hour
+
+def test_get_passenger_detail_not_found(client, app, init_db):
+    login_staff_user(client, "staff_pass_detail_404", "password")
+    assert client.get('/passengers/9999').status_code == 404
+    assert client.get('/passengers/9999/entries').status_code == 404
+
+def test_get_passenger_entries_pages_with_cursor(client, app, init_db):
+    login_staff_user(client, "staff_pass_pages", "password")
+    base_time = datetime.utcnow() - timedelta(days=10)
+    for hours in range(5):
+        client.post('/checkin', json={'passenger_name': 'Page Flyer', 'flight_number': 'PF1',
+                                      'entry_time': (base_time + timedelta(hours=hours)).isoformat()})
+    passenger_id = client.get('/passengers?search_query=Page Flyer&view=summary').get_json()[0]['id']
+
+    first_page = client.get(f'/passengers/{passenger_id}/entries?limit=2').get_json()
+    assert len(first_page['entries']) == 2
+    assert first_page['next_cursor']
+
+    seen = list(first_page['entries'])
+    cursor = first_page['next_cursor']
+    while cursor:
+        page = client.get(f'/passengers/{passenger_id}/entries?limit=2&cursor={cursor}').get_json()
+        seen.extend(page['entries'])
+        cursor = page['next_cursor']
+
+    assert len(seen) == 5
+    assert len({entry['id'] for entry in seen}) == 5
+    entry_times = [entry['entry_time'] for entry in seen]
+    assert entry_times == sorted(entry_times, reverse=True) # Most recent first
+
+def test_get_passenger_entries_invalid_params(client, app, init_db):
+    login_staff_user(client, "staff_pass_bad_cursor", "password")
+    setup_passenger_data(client)
+    passenger_id = client.get('/passengers?view=summary').get_json()[0]['id']
+    response = client.get(f'/passengers/{passenger_id}/entries?cursor=not-a-cursor')
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Invalid cursor.'
+    assert client.get(f'/passengers/{passenger_id}/entries?limit=0').status_code == 400
+    assert client.get(f'/passengers/{passenger_id}/entries?limit=abc').status_code == 400
@@ -0,0 +1,70 @@
+import pytest
+import threading
+from backend.models import User
+from backend.database import db_session
+
+# Helper to register and login a user with a specific role
+def login_user_with_role(client, app, username, password, role):
+    reg_response = client.post('/auth/register', json={'username': username, 'password': password})
+    assert reg_response.status_code in [201, 400]
+    with app.app_context():
+        user = User.query.filter_by(username=username).first()
+        user.role = role
+        db_session.commit()
+    login_response = client.post('/auth/login', json={'username': username, 'password': password})
+    assert login_response.status_code == 200
+    return login_response
+
+def busy_loop_for_profiler(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+def test_sample_requires_admin(client, app, init_db):
+    login_user_with_role(client, app, "staff_profiling", "password", "staff")
+    response = client.post('/profiling/sample?seconds=0.1')
+    assert response.status_code == 403
+
+def test_sample_invalid_parameters(client, app, init_db):
+    login_user_with_role(client, app, "admin_profiling_invalid", "password", "admin")
+    assert client.post('/profiling/sample?seconds=abc').status_code == 400
+    assert client.post('/profiling/sample?seconds=0').status_code == 400
+    assert client.post('/profiling/sample?seconds=1000').status_code == 400
+    assert client.post('/profiling/sample?seconds=1&interval_ms=0').status_code == 400
+
+def test_sample_returns_collapsed_stacks(client, app, init_db):
+    login_user_with_role(client, app, "admin_profiling", "password", "admin")
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop_for_profiler, args=(stop,))
+    worker.start()
+    try:
+        response = client.post('/profiling/sample?seconds=0.2&interval_ms=2')
+    finally:
+        stop.set()
+        worker.join()
+
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    assert int(response.headers['X-Profile-Samples']) > 0
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines
+    # Every line is "frame;frame;... count"
+    for line in lines:
+        stack, count = line.rsplit(' ', 1)
+        assert int(count) > 0
+    assert any('busy_loop_for_profiler' in line for line in lines)
+
+def test_profile_single_request_with_header(client, app, init_db):
+    login_user_with_role(client, app, "admin_profiling_header", "password", "admin")
+    response = client.get('/dashboard/stats', headers={'X-Profile': '1'})
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    assert response.headers['X-Profile-Status'] == '200'
+    assert int(response.headers['X-Profile-Samples']) >= 1
+    assert 'wsgi_app' in response.get_data(as_text=True)
+
+def test_profile_header_ignored_for_staff(client, app, init_db):
+    login_user_with_role(client, app, "staff_profiling_header", "password", "staff")
+    response = client.get('/dashboard/stats', headers={'X-Profile': '1'})
+    assert response.status_code == 200
+    assert 'X-Profile-Status' not in response.headers
+    assert 'current_occupancy' in response.get_json()
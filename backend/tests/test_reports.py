@@ -1,5 +1,7 @@
 import pytest
-from datetime import datetime, date, timedelta
+from datetime import datetime, date, timedelta, timezone
+from backend.database import db_session
+from backend.models import Lounge
 
 # Helper to register and login a staff user
 def login_staff_user(client, username="staff_reports", password="password"):
@@ -129,3 +131,213 @@ def test_get_lounge_usage_report_no_data_in_range(client, app, init_db):
     assert len(json_data['data']) == 11 # 50 days ago to 40 days ago inclusive
     total_entries_in_report = sum(item['total_entries'] for item in json_data['data'])
     assert total_entries_in_report == 0
+
+def test_lounge_usage_report_counts_lounge_local_days(client, app, init_db):
+    login_staff_user(client, "staff_reports_tz", "password")
+    db_session.get(Lounge, 1).timezone = 'Asia/Kolkata' # UTC+05:30
+    db_session.commit()
+
+    day = date.today() - timedelta(days=3)
+    local_midnight = datetime(day.year, day.month, day.day, tzinfo=timezone.utc) - timedelta(hours=5, minutes=30)
+    for minutes in (-1, 1, 60):
+        client.post('/checkin', json={'passenger_name': f'Midnight Guest {minutes}', 'flight_number': 'TZ1',
+                                      'entry_time': (local_midnight + timedelta(minutes=minutes)).isoformat()})
+
+    response = client.get(f'/reports/lounge-usage?start_date={day - timedelta(days=1)}&end_date={day}')
+    assert response.status_code == 200
+    assert [item['total_entries'] for item in response.get_json()['data']] == [1, 2]
+
+def test_lounge_usage_report_caches_days(client, app, query_counter, init_db):
+    login_staff_user(client, "staff_reports_cache", "password")
+    now = datetime.now(timezone.utc)
+    for days_ago in (3, 2, 0):
+        client.post('/checkin', json={'passenger_name': f'Cached {days_ago}', 'flight_number': 'CCH1',
+                                      'entry_time': (now - timedelta(days=days_ago)).isoformat()})
+    past = f'start_date={(now - timedelta(days=4)).date()}&end_date={(now - timedelta(days=1)).date()}'
+
+    def report(query_string):
+        start = len(query_counter.statements)
+        response = client.get(f'/reports/lounge-usage?{query_string}')
+        return [item['total_entries'] for item in response.get_json()['data']], len(query_counter.statements) - start
+
+    assert report(past) == ([0, 1, 1, 0], 2)
+    assert report(past) == ([0, 1, 1, 0], 1) # Closed days: only the user lookup
+    # Overlapping range: only the days not cached yet are queried
+    assert report('date_range=last_7_days') == ([0, 0, 0, 1, 1, 0, 1], 2)
+
+    # Today's check-in leaves the closed days cached; a back-dated one invalidates its day
+    client.post('/checkin', json={'passenger_name': 'Cached Today', 'flight_number': 'CCH2'})
+    client.post('/checkin', json={'passenger_name': 'Cached Late', 'flight_number': 'CCH3',
+                                  'entry_time': (now - timedelta(days=2)).isoformat()})
+    assert report(past) == ([0, 1, 2, 0], 2)
+    assert report('date_range=last_7_days') == ([0, 0, 0, 1, 2, 0, 2], 2) # Today was invalidated too
+
+def test_lounge_usage_cache_shared_store(tmp_path):
+    from zoneinfo import ZoneInfo
+    from backend.cache import LRUCache, SQLiteCache
+    from backend.report_cache import LoungeUsageCache
+
+    rome = ZoneInfo('Europe/Rome')
+    first_day, last_day = date(2024, 3, 1), date(2024, 3, 3)
+    worker_one = LoungeUsageCache(LRUCache(), SQLiteCache(str(tmp_path / 'reports.db')))
+    worker_two = LoungeUsageCache(LRUCache(), SQLiteCache(str(tmp_path / 'reports.db')))
+
+    assert worker_one.lookup(1, rome, first_day, last_day) == ({}, (first_day, last_day), 0)
+    worker_one.store(1, rome, first_day, last_day, {date(2024, 3, 2): 7}, 0)
+    # Another worker finds every day in the shared store, empty days included
+    expected = {date(2024, 3, 1): 0, date(2024, 3, 2): 7, date(2024, 3, 3): 0}
+    assert worker_two.lookup(1, rome, first_day, last_day) == (expected, None, 0)
+    assert worker_two.lookup(2, rome, first_day, last_day)[1] == (first_day, last_day) # Per lounge
+
+    # A back-dated check-in through one worker reaches the other's LRU copy at once
+    worker_one.invalidate(1, rome, date(2024, 3, 2))
+    counts, missing, version = worker_two.lookup(1, rome, first_day, last_day)
+    assert (counts, missing, version) == ({}, (first_day, last_day), 1)
+
+    # A report that looked its days up before the invalidation cannot store them back
+    worker_one.store(1, rome, first_day, last_day, {date(2024, 3, 2): 7}, 0)
+    assert worker_two.lookup(1, rome, first_day, last_day)[1] == (first_day, last_day)
+
+def test_get_top_passengers_report(client, app, init_db):
+    login_staff_user(client, "staff_reports_top", "password")
+    # Timestamps come back in UTC with millisecond precision
+    start = (datetime.utcnow() - timedelta(days=3)).replace(microsecond=0, tzinfo=timezone.utc)
+    visits = {'Frequent Flyer': 3, 'Occasional Flyer': 2, 'One Time Flyer': 1}
+    for name, count in visits.items():
+        for i in range(count):
+            entry = client.post('/checkin', json={'passenger_name': name, 'flight_number': 'TOP1',
+                                                  'entry_time': (start + timedelta(hours=i)).isoformat()}).get_json()['lounge_entry']
+            client.post(f"/passengers/{entry['id']}/exit",
+                        json={'exit_time': (start + timedelta(hours=i, minutes=30)).isoformat()})
+
+    response = client.get('/reports/top-passengers?limit=2')
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert [row['name'] for row in data] == ['Frequent Flyer', 'Occasional Flyer']
+    assert data[0]['visit_count'] == 3
+    assert data[0]['total_stay_minutes'] == 90
+    assert datetime.fromisoformat(data[0]['first_visit']) == start
+    assert datetime.fromisoformat(data[0]['last_visit']) == start + timedelta(hours=2)
+
+    assert client.get('/reports/top-passengers?limit=0').status_code == 400
+    assert client.get('/reports/top-passengers?limit=many').status_code == 400
+
+def test_lounge_usage_report_follows_other_workers_without_shared_cache(tmp_path):
+    # Two workers on one database, each with its own in-process cache (the default)
+    import time
+    from backend.app import create_app
+    from backend.database import init_db as create_schema
+    url = f"sqlite:///{tmp_path / 'workers.db'}"
+    worker_one = create_app({'SQLALCHEMY_DATABASE_URI': url, 'REPORT_CACHE_CLOSED_DAY_TTL': 0.2})
+    worker_two = create_app({'SQLALCHEMY_DATABASE_URI': url})
+    with worker_one.app_context():
+        create_schema()
+    one, two = worker_one.test_client(), worker_two.test_client()
+    login_staff_user(one, "staff_reports_one", "password")
+    login_staff_user(two, "staff_reports_two", "password")
+    now = datetime.now(timezone.utc)
+    past = f'start_date={(now - timedelta(days=3)).date()}&end_date={(now - timedelta(days=1)).date()}'
+
+    def report():
+        return [item['total_entries'] for item in one.get(f'/reports/lounge-usage?{past}').get_json()['data']]
+
+    assert report() == [0, 0, 0]
+    two.post('/checkin', json={'passenger_name': 'Other Worker', 'flight_number': 'RW1',
+                               'entry_time': (now - timedelta(days=2)).isoformat()})
+    time.sleep(0.25)
+    assert report() == [0, 1, 0]
+    for app in (worker_one, worker_two):
+        app.extensions['sqlalchemy_engine'].dispose()
+
+def test_rebuild_passenger_aggregates_matches_entries(tmp_path):
+    # Bulk seeding bypasses check-in; the rebuild must give what check-in/exit would have
+    from backend.app import create_app
+    from backend.database import init_db as create_schema
+    from backend.seed import seed_database
+    from backend.models import Passenger, LoungeEntry
+    from sqlalchemy import select
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'aggregates.db'}"})
+    engine = app.extensions['sqlalchemy_engine']
+    with app.app_context():
+        create_schema()
+    seed_database(engine, passengers=50, entries=500, seed=3)
+
+    with engine.connect() as connection:
+        expected = {}
+        for passenger_id, entry_time, exit_time in connection.execute(
+                select(LoungeEntry.passenger_id, LoungeEntry.entry_time, LoungeEntry.exit_time)):
+            visits, total, first, last = expected.get(passenger_id, (0, 0, entry_time, entry_time))
+            if exit_time is not None:
+                total += int((exit_time - entry_time).total_seconds())
+            expected[passenger_id] = (visits + 1, total, min(first, entry_time), max(last, entry_time))
+
+        actual = {
+            row.id: (row.visit_count, row.total_stay_seconds, row.first_visit_at, row.last_visit_at)
+            for row in connection.execute(select(Passenger)) if row.visit_count
+        }
+    engine.dispose()
+    assert actual == expected
+
+def test_get_flights_report_dwell_histograms(client, app, init_db):
+    login_staff_user(client, "staff_reports_flights", "password")
+    start = datetime.utcnow() - timedelta(days=1)
+    stays = [('FL100', 'Flight Guest A', 10), ('FL100', 'Flight Guest B', 50), ('FL100', 'Flight Guest A', 200),
+             ('FL200', 'Flight Guest C', 20)]
+    for i, (flight, name, minutes) in enumerate(stays):
+        entry = client.post('/checkin', json={'passenger_name': name, 'flight_number': flight,
+                                              'entry_time': (start + timedelta(minutes=i)).isoformat()}).get_json()['lounge_entry']
+        client.post(f"/passengers/{entry['id']}/exit",
+                    json={'exit_time': (start + timedelta(minutes=i + minutes)).isoformat()})
+    client.post('/checkin', json={'passenger_name': 'Flight Guest D', 'flight_number': 'FL200'}) # Still in the lounge
+
+    response = client.get('/reports/flights?buckets=30,60,120')
+    assert response.status_code == 200
+    report = response.get_json()
+    assert report['buckets'] == ['0-30', '30-60', '60-120', '120+']
+
+    flights = {row['flight_number']: row for row in report['data']}
+    assert flights['FL100']['passengers'] == 2
+    assert flights['FL100']['entries'] == 3
+    assert flights['FL100']['completed_entries'] == 3
+    assert flights['FL100']['histogram'] == [1, 1, 0, 1]
+    assert flights['FL100']['median_dwell_minutes'] == 50
+    assert flights['FL100']['average_dwell_minutes'] == round(260 / 3, 1)
+    assert flights['FL200']['entries'] == 2
+    assert flights['FL200']['completed_entries'] == 1
+    assert flights['FL200']['histogram'] == [1, 0, 0, 0]
+
+    assert client.get('/reports/flights?buckets=0,30').status_code == 400
+    assert client.get('/reports/flights?buckets=soon').status_code == 400
+
+def test_dwell_distributions_numpy_matches_python():
+    from backend import analytics
+    if analytics.np is None:
+        pytest.skip('numpy not installed')
+    flights = ['AZ1'] * 4 + ['LH2'] * 3
+    minutes = [5, 95, 30, 600, 45, 45, 16]
+    assert analytics._numpy_distributions(flights, minutes, analytics.DWELL_BUCKET_MINUTES) == \
+        analytics._python_distributions(flights, minutes, analytics.DWELL_BUCKET_MINUTES)
+
+def test_get_flights_report_with_numpy(client, app, init_db, monkeypatch):
+    # NumPy scalars must not reach the JSON provider (orjson rejects np.float64)
+    from backend import analytics
+    from backend.serialization import make_provider, orjson
+    if analytics.np is None:
+        pytest.skip('numpy not installed')
+    if orjson is not None:
+        monkeypatch.setitem(app.extensions, 'json_provider', make_provider('orjson'))
+    login_staff_user(client, "staff_reports_flights_numpy", "password")
+    start = datetime.utcnow() - timedelta(days=1)
+    for i, minutes in enumerate((10, 50, 200)):
+        entry = client.post('/checkin', json={'passenger_name': f'Numpy Guest {i}', 'flight_number': 'NP100',
+                                              'entry_time': (start + timedelta(minutes=i)).isoformat()}).get_json()['lounge_entry']
+        client.post(f"/passengers/{entry['id']}/exit",
+                    json={'exit_time': (start + timedelta(minutes=i + minutes)).isoformat()})
+
+    response = client.get('/reports/flights')
+    assert response.status_code == 200
+    flight = {row['flight_number']: row for row in response.get_json()['data']}['NP100']
+    assert flight['completed_entries'] == 3
+    assert flight['average_dwell_minutes'] == round(260 / 3, 1)
+    assert flight['median_dwell_minutes'] == 50
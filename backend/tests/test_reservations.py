@@ -218,3 +218,167 @@ def test_update_reservation_status_invalid_status(client, app, init_db):
     response = client.put(f'/reservations/{res_id}/status', json={'new_status': 'invalid_status_value'})
     assert response.status_code == 400
     assert 'Invalid status' in response.get_json()['message']
+
+# --- Manifest import ---
+
+MANIFEST_CSV = (
+    'passenger_name,flight_number,reservation_date,reservation_time,number_of_guests\n'
+    'Ana Lima,AZ610,2030-03-01,07:45,2\n'
+    'Ben Ito,AZ610,2030-03-01,07:45,\n'
+    'No Flight,,2030-03-01,07:45,1\n'
+    'Bad Date,AZ610,2030-02-30,07:45,1\n'
+    'Cleo Ruiz,AZ611,2030-03-02,21:05:00,3\n'
+    'Zero Guests,AZ611,2030-03-02,21:05,0\n'
+)
+
+def test_import_reservations_csv(client, app, init_db):
+    from backend.models import Event
+    login_staff_user(client)
+    response = client.post('/reservations/import', data=MANIFEST_CSV.encode(), content_type='text/csv')
+    assert response.status_code == 200
+    result = response.get_json()
+    assert (result['imported'], result['failed'], result['errors_truncated']) == (3, 3, False)
+    assert [error['row'] for error in result['errors']] == [3, 4, 6]
+    assert 'Missing required fields' in result['errors'][0]['message']
+    assert 'Invalid date or time format' in result['errors'][1]['message']
+    assert 'number_of_guests' in result['errors'][2]['message']
+
+    listed = {r['passenger_name']: r for r in client.get('/reservations').get_json()}
+    assert set(listed) == {'Ana Lima', 'Ben Ito', 'Cleo Ruiz'}
+    assert listed['Ana Lima']['number_of_guests'] == 2
+    assert listed['Ben Ito']['number_of_guests'] == 1
+    assert listed['Cleo Ruiz']['reservation_time'] == '21:05:00'
+    assert all(r['status'] == 'confirmed' for r in listed.values())
+
+    # Each imported reservation has its creation event
+    with app.app_context():
+        logged = {event.entity_id for event in Event.query.filter_by(type='reservation_status')}
+    assert logged == {r['id'] for r in listed.values()}
+
+@pytest.mark.query_budget({'reservations.import_reservations_manifest': 7}) # Two chunks of 2
+def test_import_reservations_ndjson_upload_in_chunks(client, app, init_db):
+    import io
+    import json
+    app.config['RESERVATION_IMPORT_CHUNK_SIZE'] = 2
+    login_staff_user(client)
+    lines = [json.dumps({'passenger_name': f'P{i}', 'flight_number': 'LH100', 'reservation_date': '2030-04-01',
+                         'reservation_time': '12:00', 'number_of_guests': 1}) for i in range(4)]
+    lines.insert(2, '[1, 2]')
+    lines.insert(3, 'not json')
+    manifest = io.BytesIO('\n'.join(lines).encode())
+    response = client.post('/reservations/import', data={'file': (manifest, 'LH100.ndjson')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    result = response.get_json()
+    assert (result['imported'], result['failed']) == (4, 2)
+    assert result['errors'] == [{'row': 3, 'message': 'Not a reservation object.'},
+                                {'row': 4, 'message': 'Not a reservation object.'}]
+    assert sorted(r['passenger_name'] for r in client.get('/reservations').get_json()) == ['P0', 'P1', 'P2', 'P3']
+
+def test_import_reservations_rejects_unreadable_manifests(client, app, init_db):
+    login_staff_user(client)
+    assert client.post('/reservations/import', data=b'x', content_type='application/octet-stream').status_code == 400
+    assert client.post('/reservations/import?format=xml', data=b'<r/>', content_type='text/csv').status_code == 400
+
+    response = client.post('/reservations/import', data=b'{"passenger_name": "Not an array"}', content_type='application/json')
+    assert response.status_code == 200
+    assert response.get_json()['errors'] == [{'row': 1, 'message': 'A JSON manifest must be an array of reservations.'}]
+    assert response.get_json()['imported'] == 0
+
+def test_import_reservations_command(runner, app, init_db, tmp_path):
+    manifest = tmp_path / 'manifest.csv'
+    manifest.write_text(MANIFEST_CSV)
+    result = runner.invoke(args=['import-reservations', str(manifest)])
+    assert result.exit_code == 0
+    assert 'Imported 3 reservations' in result.output
+    assert 'Row 4: Invalid date or time format' in result.output
+    assert Reservation.query.count() == 3
+
+    assert runner.invoke(args=['import-reservations', str(manifest), '--lounge-id', '999']).exit_code != 0
+
+def test_import_reservations_refuses_databases_without_known_ids(app):
+    from sqlalchemy import create_mock_engine
+    from sqlalchemy.orm import Session
+    from backend.reservation_import import import_reservations
+    # Ids are read back with RETURNING or max(id) under SQLite's write lock; nothing safe elsewhere
+    session = Session(bind=create_mock_engine('mysql://', executor=lambda *args: None))
+    rows = iter([(1, {'passenger_name': 'Never Read'})])
+    with pytest.raises(NotImplementedError, match='mysql'):
+        import_reservations(session, rows, 1)
+    assert next(rows) == (1, {'passenger_name': 'Never Read'}) # Refused before reading the manifest
+
+# --- Batch status changes and no-show expiry ---
+
+def create_reservations(client, *rows):
+    return [client.post('/reservations', json={
+        'passenger_name': name, 'flight_number': flight,
+        'reservation_date': day.isoformat(), 'reservation_time': '10:00'
+    }).get_json()['reservation']['id'] for name, flight, day in rows]
+
+def test_update_reservation_statuses_by_ids(client, app, init_db):
+    from backend.models import Event
+    login_staff_user(client)
+    day = date.today() + timedelta(days=3)
+    first, second, third = create_reservations(client, ('A', 'AZ1', day), ('B', 'AZ1', day), ('C', 'AZ2', day))
+
+    response = client.put('/reservations/status', json={'new_status': 'cancelled', 'ids': [first, second, 99999]})
+    assert response.status_code == 200
+    assert response.get_json()['updated_ids'] == [first, second]
+    # Already cancelled: nothing to change, nothing logged
+    assert client.put('/reservations/status', json={'new_status': 'cancelled', 'ids': [first]}).get_json()['updated_ids'] == []
+
+    statuses = {r['id']: r['status'] for r in client.get('/reservations').get_json()}
+    assert statuses == {first: 'cancelled', second: 'cancelled', third: 'confirmed'}
+    with app.app_context():
+        changes = [(event.entity_id, event.data) for event in Event.query.filter(Event.data.like('%"from":"confirmed"%'))]
+    assert sorted(changes) == [(first, '{"from":"confirmed","to":"cancelled"}'), (second, '{"from":"confirmed","to":"cancelled"}')]
+
+def test_update_reservation_statuses_by_date_and_flight(client, app, init_db):
+    login_staff_user(client)
+    day = date.today() + timedelta(days=3)
+    ids = create_reservations(client, ('A', 'AZ1', day), ('B', 'AZ1', day), ('C', 'AZ2', day),
+                              ('D', 'AZ1', day + timedelta(days=1)))
+    client.put(f'/reservations/{ids[1]}/status', json={'new_status': 'completed'})
+
+    response = client.put('/reservations/status', json={
+        'new_status': 'cancelled', 'reservation_date': day.isoformat(), 'flight_number': 'AZ1', 'status': 'confirmed'})
+    assert response.status_code == 200
+    assert response.get_json()['updated_ids'] == [ids[0]]
+
+    response = client.put('/reservations/status', json={'new_status': 'cancelled', 'reservation_date': day.isoformat()})
+    assert response.get_json()['updated_ids'] == [ids[1], ids[2]]
+
+def test_update_reservation_statuses_invalid_requests(client, app, init_db):
+    login_staff_user(client)
+    for body in (
+        {'ids': [1]}, # No new_status
+        {'new_status': 'lost', 'ids': [1]},
+        {'new_status': 'cancelled'}, # Nothing selected
+        {'new_status': 'cancelled', 'ids': [1], 'reservation_date': '2030-01-01'},
+        {'new_status': 'cancelled', 'ids': []},
+        {'new_status': 'cancelled', 'ids': ['1']},
+        {'new_status': 'cancelled', 'ids': list(range(1001))},
+        {'new_status': 'cancelled', 'reservation_date': '01/01/2030'},
+        {'new_status': 'cancelled', 'reservation_date': '2030-01-01', 'status': 'lost'},
+    ):
+        assert client.put('/reservations/status', json=body).status_code == 400, body
+
+def test_expire_reservations_command(client, app, runner, init_db):
+    login_staff_user(client)
+    today = date.today()
+    past, past_cancelled, older, current, future = create_reservations(
+        client, ('Past', 'AZ1', today - timedelta(days=1)), ('Cancelled', 'AZ1', today - timedelta(days=1)),
+        ('Older', 'AZ1', today - timedelta(days=30)), ('Today', 'AZ1', today), ('Future', 'AZ1', today + timedelta(days=1)))
+    client.put(f'/reservations/{past_cancelled}/status', json={'new_status': 'cancelled'})
+
+    result = runner.invoke(args=['expire-reservations', '--grace-days', '7'])
+    assert 'Marked 1 reservations as no_show' in result.output
+    result = runner.invoke(args=['expire-reservations', '--chunk-size', '1'])
+    assert result.exit_code == 0
+    assert 'Marked 1 reservations as no_show' in result.output
+
+    statuses = {r['id']: r['status'] for r in client.get('/reservations').get_json()}
+    assert statuses == {past: 'no_show', past_cancelled: 'cancelled', older: 'no_show', current: 'confirmed', future: 'confirmed'}
+    upcoming = client.get('/reservations?status_filter=upcoming').get_json()
+    assert sorted(r['id'] for r in upcoming) == [current, future]
+    assert client.put(f'/reservations/{current}/status', json={'new_status': 'no_show'}).status_code == 200
@@ -0,0 +1,73 @@
+import pytest
+import json
+from datetime import datetime, date, time
+from sqlalchemy import select, literal
+from backend.serialization import StdlibJSONProvider, OrjsonProvider, RowSerializer, make_provider, orjson
+
+# Helper to register and login a staff user
+def login_staff_user(client, username="staff_json", password="password"):
+    reg_response = client.post('/auth/register', json={'username': username, 'password': password})
+    assert reg_response.status_code in [201, 400]
+    login_response = client.post('/auth/login', json={'username': username, 'password': password})
+    assert login_response.status_code == 200
+    return login_response
+
+PAYLOAD = {
+    'entry_time': datetime(2026, 3, 1, 9, 5, 7, 120000),
+    'exit_time': None,
+    'reservation_date': date(2026, 3, 1),
+    'reservation_time': time(10, 30),
+    'name': 'Zoë Ångström',
+    'count': 3,
+}
+
+def test_stdlib_provider_encodes_dates_as_iso():
+    decoded = json.loads(StdlibJSONProvider().dumps(PAYLOAD))
+    assert decoded == {
+        'entry_time': '2026-03-01T09:05:07.120000',
+        'exit_time': None,
+        'reservation_date': '2026-03-01',
+        'reservation_time': '10:30:00',
+        'name': 'Zoë Ångström',
+        'count': 3,
+    }
+
+@pytest.mark.skipif(orjson is None, reason='orjson not installed')
+def test_orjson_provider_matches_stdlib():
+    assert json.loads(OrjsonProvider().dumps(PAYLOAD)) == json.loads(StdlibJSONProvider().dumps(PAYLOAD))
+
+def test_make_provider():
+    assert make_provider('stdlib').name == 'stdlib'
+    assert make_provider('auto').name == ('orjson' if orjson is not None else 'stdlib')
+    with pytest.raises(ValueError):
+        make_provider('msgpack')
+
+def test_row_serializer_uses_statement_labels(app):
+    from backend.database import db_session
+    stmt = select(literal(1).label('id'), literal('AZ1').label('flight_number'))
+    rows = db_session.execute(stmt).all()
+    assert RowSerializer.for_statement(stmt)(rows) == [{'id': 1, 'flight_number': 'AZ1'}]
+
+@pytest.mark.parametrize('provider', ['stdlib', 'orjson'])
+def test_list_endpoints_same_json_with_each_provider(client, app, init_db, monkeypatch, provider):
+    if provider == 'orjson' and orjson is None:
+        pytest.skip('orjson not installed')
+    monkeypatch.setitem(app.extensions, 'json_provider', make_provider(provider))
+    login_staff_user(client)
+    client.post('/reservations', json={
+        'passenger_name': 'Json Guest', 'flight_number': 'JS1',
+        'reservation_date': '2030-01-15', 'reservation_time': '08:45'
+    })
+    client.post('/checkin', json={'passenger_name': 'Json Passenger', 'flight_number': 'JS2'})
+
+    response = client.get('/reservations')
+    assert response.content_type == 'application/json'
+    reservation = response.get_json()[0]
+    assert reservation['reservation_date'] == '2030-01-15'
+    assert reservation['reservation_time'] == '08:45:00'
+    assert reservation['number_of_guests'] == 1
+
+    passengers = client.get('/passengers?search_query=JS2').get_json()
+    entry = passengers[0]['lounge_entries'][0]
+    assert datetime.fromisoformat(entry['entry_time'])
+    assert entry['exit_time'] is None
@@ -84,6 +84,14 @@ def test_update_lounge_settings_as_admin_success(admin_client, app):
         assert settings.lounge_capacity == new_settings['lounge_capacity']
         assert settings.entry_tracking_method == new_settings['entry_tracking_method']
 
+def test_update_lounge_timezone(admin_client, app):
+    response = admin_client.post('/settings/lounge', json={'timezone': 'Mars/Olympus_Mons'})
+    assert response.status_code == 400
+
+    response = admin_client.post('/settings/lounge', json={'timezone': 'Europe/Rome'})
+    assert response.status_code == 200
+    assert admin_client.get('/settings/lounge').get_json()['timezone'] == 'Europe/Rome'
+
 def test_update_lounge_settings_partial_update(admin_client, app):
     # First, ensure some settings exist
     admin_client.post('/settings/lounge', json={'lounge_name': 'Initial Name', 'lounge_capacity': 100})
@@ -131,6 +139,21 @@ def test_create_user_as_admin_success(admin_client, app):
         assert user is not None
         assert user.role == new_user_data['role']
 
+def test_users_list_is_cached_until_users_change(admin_client, app, query_counter):
+    usernames = lambda: sorted(user['username'] for user in admin_client.get('/settings/users').get_json())
+    assert usernames() == ['admin_settings']
+
+    start = len(query_counter.statements)
+    assert usernames() == ['admin_settings']
+    assert len(query_counter.statements) - start == 1 # Only the user lookup
+
+    # Writes through the API bump the users table's version
+    admin_client.post('/settings/users', json={'username': 'cached_staff', 'password': 'password123'})
+    assert usernames() == ['admin_settings', 'cached_staff']
+    user_id = next(user['id'] for user in admin_client.get('/settings/users').get_json() if user['username'] == 'cached_staff')
+    admin_client.put(f'/settings/users/{user_id}', json={'username': 'renamed_staff'})
+    assert usernames() == ['admin_settings', 'renamed_staff']
+
 def test_create_user_as_admin_existing_username(admin_client):
     client.post('/auth/register', json={'username': 'existing_for_admin_test', 'password': 'pw'}) # Pre-register
     
@@ -0,0 +1,93 @@
+import pytest
+from backend.models import Lounge, LoungeEntry, User
+from backend.database import db_session
+from datetime import date, datetime, timedelta
+
+def login_admin_user(client, username="admin_tenancy", password="password"):
+    client.post('/auth/register', json={'username': username, 'password': password})
+    User.query.filter_by(username=username).first().role = 'admin'
+    db_session.commit()
+    login_response = client.post('/auth/login', json={'username': username, 'password': password})
+    assert login_response.status_code == 200
+    return login_response
+
+# Helper to login a staff user of the given lounge; staff of another lounge than
+# the default one are created by an administrator of the default lounge
+def login_staff_user(client, username="staff_tenancy", password="password", lounge_id=None):
+    if lounge_id is None:
+        reg_response = client.post('/auth/register', json={'username': username, 'password': password})
+    else:
+        login_admin_user(client)
+        reg_response = client.post('/settings/users', json={'username': username, 'password': password,
+                                                             'lounge_id': lounge_id})
+        client.post('/auth/logout')
+    assert reg_response.status_code in [201, 400]
+    login_response = client.post('/auth/login', json={'username': username, 'password': password})
+    assert login_response.status_code == 200
+    return login_response
+
+@pytest.fixture
+def second_lounge(app):
+    lounge = Lounge(code='MXP-T2', name='Second Lounge')
+    db_session.add(lounge)
+    db_session.commit()
+    return lounge.id
+
+def test_register_always_joins_the_default_lounge(client, app, init_db, second_lounge):
+    response = client.post('/auth/register', json={'username': 'intruder', 'password': 'password',
+                                                   'lounge_id': second_lounge})
+    assert response.status_code == 201
+    assert User.query.filter_by(username='intruder').first().lounge_id == 1
+
+def test_create_user_in_another_lounge(client, app, init_db, second_lounge):
+    login_admin_user(client)
+    response = client.post('/settings/users', json={'username': 'nolounge', 'password': 'password', 'lounge_id': 999})
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Unknown lounge'
+    response = client.post('/settings/users', json={'username': 'second_admin', 'password': 'password',
+                                                    'role': 'admin', 'lounge_id': second_lounge})
+    assert response.status_code == 201
+    client.post('/auth/logout')
+
+    # An administrator of another lounge only staffs their own
+    client.post('/auth/login', json={'username': 'second_admin', 'password': 'password'})
+    response = client.post('/settings/users', json={'username': 'elsewhere', 'password': 'password', 'lounge_id': 1})
+    assert response.status_code == 403
+    assert client.post('/settings/users', json={'username': 'second_staff', 'password': 'password'}).status_code == 201
+    assert User.query.filter_by(username='second_staff').first().lounge_id == second_lounge
+
+def test_lounges_do_not_see_each_others_data(client, app, init_db, second_lounge):
+    login_staff_user(client, 'staff_lounge_one')
+    entry = client.post('/checkin', json={'passenger_name': 'Only One', 'flight_number': 'AZ1'}).get_json()['lounge_entry']
+    client.post('/reservations', json={
+        'passenger_name': 'Only One', 'flight_number': 'AZ1',
+        'reservation_date': (date.today() + timedelta(days=1)).isoformat(), 'reservation_time': '10:00'
+    })
+    client.post('/auth/logout')
+
+    login_staff_user(client, 'staff_lounge_two', lounge_id=second_lounge)
+    client.post('/checkin', json={'passenger_name': 'Only Two', 'flight_number': 'LH2',
+                                  'entry_time': (datetime.utcnow() - timedelta(hours=1)).isoformat()})
+
+    stats = client.get('/dashboard/stats').get_json()
+    assert stats['current_occupancy'] == 1
+    assert [e['passenger_name'] for e in client.get('/dashboard/recent-entries').get_json()] == ['Only Two']
+    assert [p['name'] for p in client.get('/passengers').get_json()] == ['Only Two']
+    assert client.get('/reservations').get_json() == []
+
+    # Another lounge's rows are not found rather than forbidden
+    assert client.post(f"/passengers/{entry['id']}/exit", json={}).status_code == 404
+    passenger_id = db_session.get(LoungeEntry, entry['id']).passenger_id
+    assert client.get(f'/passengers/{passenger_id}').status_code == 404
+    assert client.get(f'/passengers/{passenger_id}/entries').status_code == 404
+
+def test_same_passenger_checks_in_separately_per_lounge(client, app, init_db, second_lounge):
+    login_staff_user(client, 'staff_split_one')
+    client.post('/checkin', json={'passenger_name': 'Frequent Flyer', 'flight_number': 'AF3'})
+    client.post('/auth/logout')
+
+    login_staff_user(client, 'staff_split_two', lounge_id=second_lounge)
+    client.post('/checkin', json={'passenger_name': 'Frequent Flyer', 'flight_number': 'AF3'})
+
+    report = client.get('/reports/top-passengers').get_json()['data']
+    assert [(p['name'], p['visit_count']) for p in report] == [('Frequent Flyer', 1)]
@@ -0,0 +1,136 @@
+"""UTC timestamps and lounge-local days.
+
+Entry and exit times used to be naive ``DateTime`` columns holding a mix of
+``utcnow()`` and whatever the client sent, stored by SQLite as text. Range
+filters then compared strings, and grouping by day meant ``cast(..., Date)``
+on text. Now:
+
+- ``UTCDateTime`` columns hold timezone-aware UTC datetimes. On SQLite they are
+  stored as integer epoch milliseconds, so range filters and durations are
+  integer comparisons and subtractions; elsewhere they are ``timestamptz``.
+  Naive values coming in (old clients, seed data) are taken to be UTC.
+- Days are lounge-local. Each lounge has a timezone; a view turns "today" or a
+  report's date range into a UTC instant range once per request
+  (``local_day_bounds`` / ``local_range_bounds``) and the queries compare
+  instants only.
+"""
+import datetime
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import BigInteger, DateTime
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.types import TypeDecorator
+
+UTC = datetime.timezone.utc
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=UTC)
+DEFAULT_TIMEZONE = 'UTC'
+
+# Every UTC offset in use is a whole number of quarter hours, so entries counted
+# per quarter hour can be summed into the local days of any timezone
+LOCAL_DAY_BUCKET_MS = 15 * 60 * 1000
+
+
+def utc_now():
+    return datetime.datetime.now(UTC)
+
+
+def to_utc(value):
+    """An aware UTC datetime; naive values are taken to be UTC already."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=UTC)
+    return value.astimezone(UTC)
+
+
+def parse_timestamp(text):
+    """Parse an ISO 8601 timestamp from a request into UTC (naive means UTC). Raises ValueError."""
+    if text.endswith(('Z', 'z')):
+        text = text[:-1] + '+00:00'
+    return to_utc(datetime.datetime.fromisoformat(text))
+
+
+def epoch_ms(value):
+    return (to_utc(value) - EPOCH) // datetime.timedelta(milliseconds=1)
+
+
+def from_epoch_ms(value):
+    return EPOCH + datetime.timedelta(milliseconds=value)
+
+
+@lru_cache(maxsize=None)
+def get_timezone(name):
+    """ZoneInfo for an IANA name such as 'Europe/Rome'. Raises ValueError for unknown names."""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f'Unknown timezone {name!r}')
+
+
+def local_today(timezone):
+    return datetime.datetime.now(timezone).date()
+
+
+def local_range_bounds(timezone, start_date, end_date):
+    """[start, end) in UTC covering the local days start_date..end_date inclusive."""
+    start = datetime.datetime.combine(start_date, datetime.time.min, tzinfo=timezone)
+    end = datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min, tzinfo=timezone)
+    return start.astimezone(UTC), end.astimezone(UTC)
+
+
+def local_day_bounds(timezone, day=None):
+    """[start, end) in UTC of a local day (today by default)."""
+    day = day or local_today(timezone)
+    return local_range_bounds(timezone, day, day)
+
+
+def local_date_of_bucket(bucket, timezone):
+    """The local date of a LOCAL_DAY_BUCKET_MS bucket number (see epoch_bucket)."""
+    return from_epoch_ms(bucket * LOCAL_DAY_BUCKET_MS).astimezone(timezone).date()
+
+
+class UTCDateTime(TypeDecorator):
+    """Timezone-aware UTC datetime: integer epoch milliseconds on SQLite, timestamptz elsewhere."""
+
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'sqlite':
+            return dialect.type_descriptor(BigInteger())
+        return dialect.type_descriptor(DateTime(timezone=True))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if dialect.name == 'sqlite':
+            return epoch_ms(value)
+        return to_utc(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if dialect.name == 'sqlite':
+            return from_epoch_ms(value)
+        return to_utc(value)
+
+
+# --- SQL expressions over UTCDateTime columns ---
+
+class epoch_bucket(FunctionElement):
+    """Number of the LOCAL_DAY_BUCKET_MS interval (counted from the epoch) a timestamp falls in."""
+    type = BigInteger()
+    name = 'epoch_bucket'
+    inherit_cache = True
+
+
+@compiles(epoch_bucket, 'sqlite')
+def _sqlite_epoch_bucket(element, compiler, **kw):
+    # Integer division of the stored epoch milliseconds
+    return f'({compiler.process(element.clauses, **kw)} / {LOCAL_DAY_BUCKET_MS})'
+
+
+@compiles(epoch_bucket)
+def _epoch_bucket(element, compiler, **kw):
+    return f'floor(extract(epoch from {compiler.process(element.clauses, **kw)}) * 1000 / {LOCAL_DAY_BUCKET_MS})'
+